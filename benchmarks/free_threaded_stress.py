@@ -0,0 +1,111 @@
+"""
+Stress tests calling a single shared pipeline from many threads at once,
+checking every result against those of a single-threaded run and reporting
+the throughput achieved.
+
+The benchmark is intended for free-threaded builds of CPython 3.13+, run with
+the GIL disabled, where it exercises the concurrency contract documented on
+rightshift.Transformer. It runs on any build, although with the GIL enabled
+no speed-up from additional threads is expected.
+
+Usage:
+
+python benchmarks/free_threaded_stress.py [threads] [records] [repeat]
+"""
+from __future__ import print_function
+
+import sys
+from threading import Barrier, Thread
+import time
+
+from rightshift import WrapBatch, record, Value, Wrap
+from rightshift.chains import default
+from rightshift.conditionals import when
+from rightshift.cse import cse
+from rightshift.extractors import item, PatternGroup
+from rightshift.lookups import lookup
+from rightshift.matchers import Must, Should, value_is
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+COUNTRIES = dict(('c{}'.format(i), 'Country {}'.format(i)) for i in range(100))
+
+
+def build_pipeline():
+    """
+    Build a pipeline using the Transformers that hold internal state, such as
+    Lookup and WrapBatch, alongside conditions and shared sub-expressions.
+    """
+    email = item.email >> PatternGroup(r'@(.+)$')
+    is_adult = Must([item.age >> (value_is >= 18)])
+    return cse(record(
+        ('id', item.id),
+        ('domain', email),
+        ('is_example', Should([email >> (value_is == 'example.com')])),
+        ('country', lookup(COUNTRIES, key=item.country, cache_size=50) >>
+         default(None)),
+        ('group', when(is_adult).then(Value('adult')).otherwise(
+            Value('minor'))),
+        ('score', item.age >> WrapBatch(
+            lambda ages: [age * 2 for age in ages])),
+        ('name', item.name >> Wrap(str.upper)),
+        output='tuple'))
+
+
+def make_records(count):
+    return [
+        {
+            'id': i,
+            'name': 'user{}'.format(i),
+            'email': 'user{}@{}'.format(
+                i, 'example.com' if i % 3 else 'example.org'),
+            'age': i % 90,
+            'country': 'c{}'.format(i % 120),
+        }
+        for i in range(count)
+    ]
+
+
+def run_threads(pipeline, records, threads):
+    """
+    :return: The elapsed time and the results of each thread
+    """
+    results = [None] * threads
+    barrier = Barrier(threads + 1)
+
+    def work(index):
+        barrier.wait()
+        results[index] = [pipeline(value) for value in records]
+
+    workers = [Thread(target=work, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.time()
+    for worker in workers:
+        worker.join()
+    return time.time() - start, results
+
+
+def main(threads=8, records=20000, number=3):
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('Python {} with the GIL {}'.format(
+        sys.version.split()[0], 'enabled' if gil else 'disabled'))
+    pipeline = build_pipeline()
+    values = make_records(records)
+    expected = [pipeline(value) for value in values]
+    for count in sorted(set([1, threads])):
+        best = None
+        for _ in range(number):
+            elapsed, results = run_threads(pipeline, values, count)
+            for result in results:
+                if result != expected:
+                    raise AssertionError('Results differ from those of a '
+                                         'single-threaded run')
+            best = elapsed if best is None else min(best, elapsed)
+        print('{} threads: {} calls in {:.3f}s ({:.0f} calls/s)'.format(
+            count, count * records, best, count * records / best))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:4]])
@@ -0,0 +1,40 @@
+"""
+Benchmarks the construction of a large rule set built from value_is
+comparisons, which dominates the time taken to load rule files.
+
+Usage:
+
+python benchmarks/rule_set_construction.py [rules] [repeat]
+"""
+from __future__ import print_function
+
+import sys
+from timeit import repeat
+
+from rightshift.matchers import Should, attr, item
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+def build_rule_set(rules):
+    """
+    Build a Should matcher containing a number of item and attribute based
+    comparisons roughly equal to the rules parameter.
+    """
+    matchers = []
+    for i in range(rules // 4):
+        matchers.append(item['x{}'.format(i)].value_is >= i)
+        matchers.append(item.y.value_is != i)
+        matchers.append(attr.size.value_is < i)
+        matchers.append(attr.size.value_is == i)
+    return Should(matchers)
+
+
+def main(rules=10000, number=5):
+    timings = repeat(lambda: build_rule_set(rules), number=1, repeat=number)
+    print('Constructed {} rules: best {:.4f}s, worst {:.4f}s'.format(
+        rules, min(timings), max(timings)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,57 @@
+"""
+Compares json.load against rightshift.streaming.transform_json when only a
+small part of a large JSON document is required, reporting time and peak
+memory allocated for each.
+
+Usage:
+
+python benchmarks/stream_json.py [records]
+"""
+from __future__ import print_function
+
+import io
+import json
+import sys
+import time
+import tracemalloc
+
+from rightshift.extractors import item
+from rightshift.streaming import transform_json
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+def build_document(records):
+    return json.dumps({
+        'meta': {'id': 'benchmark', 'records': records},
+        'records': [
+            {'id': i, 'name': 'record {}'.format(i), 'tags': ['a', 'b', 'c'],
+             'values': [i * 0.5] * 10}
+            for i in range(records)
+        ],
+    }).encode('utf-8')
+
+
+def measure(label, function):
+    start = time.time()
+    function()
+    elapsed = time.time() - start
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('{:>16}: {:.3f}s, peak {:.1f} MiB'.format(
+        label, elapsed, peak / 1048576.0))
+
+
+def main(records=200000):
+    document = build_document(records)
+    transformer = item.meta.id & item.records[0].name
+    print('Document size: {:.1f} MiB'.format(len(document) / 1048576.0))
+    measure('json.load', lambda: transformer(json.load(io.BytesIO(document))))
+    measure('transform_json',
+            lambda: transform_json(transformer, io.BytesIO(document)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -1,4 +1,7 @@
+from collections import namedtuple
 from copy import copy
+from threading import Event, Lock
+from types import MethodType
 
 from future.utils import raise_from
 
@@ -20,6 +23,58 @@ class TransformationException(RightShiftException):
     pass
 
 
+class LazyMessage(object):
+    """
+    A LazyMessage defers formatting an exception message until the exception
+    is converted to a string, avoiding the cost of formatting potentially
+    large values for exceptions that are caught and discarded.
+    """
+    __slots__ = ('template', 'args')
+
+    def __init__(self, template, *args):
+        self.template = template
+        self.args = args
+
+    def __str__(self):
+        return self.template.format(*self.args)
+
+    def __repr__(self):
+        return repr(str(self))
+
+
+def fail(exception_class, flags, template=None, args=(), cause=None):
+    """
+    fail raises an exception of exception_class on behalf of a Transformer
+    that has been called with flags.
+
+    By default the message is formatted from template and args immediately
+    and the exception is chained to cause, if one is supplied.
+
+    If the errors flag is set to 'fast' then formatting of the message is
+    deferred using a LazyMessage and no cause is attached. This is useful when
+    failures are expected and discarded, such as by Detupling or Default:
+
+    flags(errors='fast') > item.x | item.y
+
+    :param exception_class: The RightShiftException sub-class to raise
+    :param flags: The flags the Transformer was called with
+    :param template: An optional message template for str.format
+    :param args: The arguments for template
+    :param cause: An optional exception that caused the failure
+    """
+    if flags.get('errors') == 'fast':
+        if template is None:
+            raise exception_class()
+        raise exception_class(LazyMessage(template, *args))
+    if template is None:
+        exception = exception_class
+    else:
+        exception = exception_class(template.format(*args))
+    if cause is None:
+        raise exception
+    raise_from(exception, cause)
+
+
 class ChainTransformer(object):
     """
     The ChainTransformer class is handled specially by the implementation of the
@@ -39,6 +94,31 @@ class ChainTransformer(object):
         raise NotImplementedError
 
 
+def _freeze(value):
+    """
+    Convert value into a hashable form for use in the structure of a
+    Transformer. Values are tagged with their type so that, for example,
+    Value(1) and Value(True) are not considered equal. Values that cannot be
+    converted are compared by identity.
+    """
+    if isinstance(value, Transformer):
+        return value
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return dict, frozenset((key, _freeze(item))
+                               for key, item in value.items())
+    if isinstance(value, (set, frozenset)):
+        return type(value), frozenset(_freeze(item) for item in value)
+    if isinstance(value, slice):
+        return slice, value.start, value.stop, value.step
+    try:
+        hash(value)
+    except TypeError:
+        return id, id(value)
+    return type(value), value
+
+
 class Transformer(object):
     """
     A Transform is an object which can be called with a single input value.
@@ -57,8 +137,99 @@ class Transformer(object):
     which this behaves depends greatly on the type of Transforms and some types
     may not be compatible with others with regards to AND/OR. In such a case,
     an Exception will be raised if incompatible types are AND/ORed together.
+
+    Transformers are compared and hashed structurally: two Transformers are
+    equal if they are of the same type and their public attributes are
+    equal. This allows equivalent sub-graphs to be detected, such as by
+    rightshift.cse.eliminate_common_subexpressions. As Transformers are
+    immutable the hash is computed once, on first use, and cached.
+
+    Transformers are immutable once constructed: each public attribute may be
+    bound once, during construction, and methods that derive a Transformer
+    from another, such as BooleanCondition.then, return a new instance rather
+    than modifying the original. Combined with the following contract this
+    allows a single Transformer to be shared by any number of threads without
+    locking or copying, including on free-threaded builds of Python:
+
+    1. Calling a Transformer has no side effects on the Transformer itself.
+       Any internal state, such as the cache of a Lookup or the pending batch
+       of a WrapBatch, is synchronized by the Transformer.
+    2. Values and flags passed to a Transformer are never modified by it.
+    3. Callables wrapped by Wrap, WrapBatch and similar Transformers must
+       themselves be safe to call concurrently.
     """
 
+    def __setattr__(self, name, value):
+        if not name.startswith('_') and name in self.__dict__:
+            raise AttributeError('{} is immutable, {} cannot be '
+                                 'rebound'.format(type(self).__name__, name))
+        object.__setattr__(self, name, value)
+
+    def __getstate__(self):
+        # The cached hash is not pickled as string hashes differ between
+        # processes
+        state = self.__dict__.copy()
+        state.pop('_hash', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def _replace(self, **attributes):
+        """
+        The copy is built from the state the Transformer would be pickled
+        with, so private state such as locks, caches and statistics is
+        created afresh by __setstate__ rather than shared with the original.
+
+        :return: A copy of the Transformer with the given attributes replaced
+        """
+        replaced = object.__new__(type(self))
+        state = self.__getstate__()
+        state.update(attributes)
+        replaced.__setstate__(state)
+        return replaced
+
+    def _structure(self):
+        """
+        :return: A hashable representation of the Transformer consisting of
+                 its type and the values of its public attributes
+        """
+        attributes = getattr(self, '__dict__', {})
+        structure = [type(self)]
+        for name in sorted(attributes):
+            if name.startswith('_'):
+                continue
+            value = attributes[name]
+            if isinstance(value, MethodType) and value.__self__ is self:
+                # Such as the comparator of a MethodComparison. Bound methods
+                # compare their instances by identity.
+                structure.append((name, (MethodType, value.__func__)))
+            else:
+                structure.append((name, _freeze(value)))
+        return tuple(structure)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, Transformer):
+            return NotImplemented
+        if hash(self) != hash(other):
+            return False
+        return self._structure() == other._structure()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        # Looked up in __dict__ directly: a getattr miss would be routed to
+        # IndexOrAccessToChainMixin.__getattr__ and build a chain
+        try:
+            return self.__dict__['_hash']
+        except KeyError:
+            result = self.__dict__['_hash'] = hash(self._structure())
+            return result
+
     def __call__(self, value, **flags):
         """
         __call__ is used to implement the transformation process
@@ -68,6 +239,26 @@ class Transformer(object):
         """
         raise NotImplementedError
 
+    def batch(self, values, **flags):
+        """
+        batch is used to transform a number of values at once, returning a
+        list containing the result for each value in order.
+
+        The default implementation simply calls the Transformer with each
+        value. Transformers that can process values more efficiently in bulk,
+        such as WrapBatch, override this method while composite Transformers
+        pass batches through to the Transformers they are composed of.
+
+        If transforming any of the values fails then a TransformationException
+        is raised for the batch as a whole. Callers needing to identify the
+        failing value should fall back to calling the Transformer with each
+        value.
+
+        :param values: An iterable of values
+        :return: A list of results
+        """
+        return [self(value, **flags) for value in values]
+
     def __rshift__(self, other):
         """
         __rshift__ is used to implement >> chaining of Transformers.
@@ -175,6 +366,14 @@ class Chain(Transformer):
         """
         return self.right(self.left(value, **flags), **flags)
 
+    def batch(self, values, **flags):
+        """
+        The whole batch is transformed by the left side of the Chain and the
+        results are then transformed by the right side as a batch, allowing
+        batch-aware Transformers on either side to operate in bulk.
+        """
+        return self.right.batch(self.left.batch(values, **flags), **flags)
+
     def __lshift__(self, other):
         """
         TODO: Document
@@ -193,7 +392,7 @@ class Detupling(Transformer):
         :param transformers:
         :return:
         """
-        self.transformers = transformers
+        self.transformers = tuple(transformers)
 
     def __call__(self, value, **flags):
         """
@@ -204,7 +403,7 @@ class Detupling(Transformer):
                 return transformer(value, **flags)
             except TransformationException:
                 pass
-        raise TransformationException('Failed to detuple {}'.format(value))
+        fail(TransformationException, flags, 'Failed to detuple {}', (value,))
 
     def __or__(self, other):
         """
@@ -245,7 +444,7 @@ class Tupling(Transformer):
         """
         TODO: Document
         """
-        self.transformers = transformers
+        self.transformers = tuple(transformers)
         self.generator = generator
 
     def __call__(self, value, **flags):
@@ -263,6 +462,20 @@ class Tupling(Transformer):
                 for transformer in self.transformers
             ]
 
+    def batch(self, values, **flags):
+        """
+        Each of the Tupling's transformers is called with the whole batch and
+        the results are then regrouped per value.
+        """
+        values = list(values)
+        columns = [
+            transformer.batch(values, **flags)
+            for transformer in self.transformers
+        ]
+        if flags.get('tupling__generator', self.generator):
+            return [(result for result in row) for row in zip(*columns)]
+        return [list(row) for row in zip(*columns)]
+
     def __and__(self, other):
         """
         TODO: Document
@@ -312,6 +525,128 @@ def lazy_tupling(*transformers):
     return Tupling(transformers, True)
 
 
+class Record(Transformer):
+    """
+    A Record calls each of a number of named transformers with the value it
+    is called with and returns the results as a record, avoiding the
+    intermediate list of a Tupling when building output documents.
+
+    The output parameter determines the type of record produced:
+
+    'dict' produces a dictionary mapping each name to its result.
+
+    'namedtuple' produces an instance of a namedtuple class created once per
+    Record and available as record_class. namedtuple instances hold no
+    per-instance dictionary, greatly reducing the memory used when a large
+    number of results are retained.
+
+    'tuple' produces a plain tuple ordered as names, the schema being shared
+    by all the results.
+    """
+    OUTPUTS = ('dict', 'namedtuple', 'tuple')
+
+    def __init__(self, fields, output='dict'):
+        """
+        :param fields: An iterable of (name, transformer) pairs or a mapping
+                       of names to transformers. Values that are not
+                       Transformers are wrapped using Value.
+        :param output: One of 'dict', 'namedtuple' or 'tuple'
+        """
+        if output not in self.OUTPUTS:
+            raise TransformationException('output must be one of {}'.format(
+                ', '.join(self.OUTPUTS)))
+        if hasattr(fields, 'items'):
+            fields = fields.items()
+        fields = [
+            (name, transformer if isinstance(transformer, Transformer)
+             else Value(transformer))
+            for name, transformer in fields
+        ]
+        self.names = tuple(name for name, _ in fields)
+        self.transformers = tuple(transformer for _, transformer in fields)
+        self.output = output
+        self._record_class = self._create_record_class()
+
+    def _create_record_class(self):
+        if self.output != 'namedtuple':
+            return None
+        try:
+            return namedtuple('Record', self.names)
+        except ValueError as e:
+            raise_from(TransformationException(
+                'Invalid namedtuple field names: {}'.format(e)), e)
+
+    def __getstate__(self):
+        state = super(Record, self).__getstate__()
+        del state['_record_class']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._record_class = self._create_record_class()
+
+    @property
+    def record_class(self):
+        """
+        The namedtuple class of the records produced when output is
+        'namedtuple', otherwise None.
+        """
+        return self._record_class
+
+    def _make(self, results):
+        if self.output == 'dict':
+            return dict(zip(self.names, results))
+        if self.output == 'tuple':
+            return tuple(results)
+        return self._record_class._make(results)
+
+    def __call__(self, value, **flags):
+        if self.output == 'dict':
+            return {
+                name: transformer(value, **flags)
+                for name, transformer in zip(self.names, self.transformers)
+            }
+        return self._make([
+            transformer(value, **flags) for transformer in self.transformers
+        ])
+
+    def batch(self, values, **flags):
+        """
+        Each of the Record's transformers is called with the whole batch and
+        the results are then regrouped into a record per value.
+        """
+        values = list(values)
+        columns = [
+            transformer.batch(values, **flags)
+            for transformer in self.transformers
+        ]
+        return [self._make(row) for row in zip(*columns)]
+
+
+def record(*fields, **named_fields):
+    """
+    record is a short-cut function for working with the Record class. Fields
+    may be supplied as (name, transformer) pairs, which preserve their order
+    on all versions of Python, and as keyword arguments:
+
+    record(name=item.name, ts=attr.timestamp)
+    record(('name', item.name), ('ts', attr.timestamp), output='tuple')
+
+    :param fields: (name, transformer) pairs
+    :param named_fields: Transformers by name. An output keyword that is not
+                         a Transformer is passed to Record.
+    :rtype: Record
+    """
+    output = 'dict'
+    if not isinstance(named_fields.get('output'), Transformer):
+        output = named_fields.pop('output', output)
+    fields = list(fields) + list(named_fields.items())
+    if not fields:
+        raise TransformationException('At least argument must be supplied to '
+                                      'rightshift.record')
+    return Record(fields, output)
+
+
 class Value(Transformer):
     """
     Value is a simple Transform that, when called, will simply return the
@@ -364,9 +699,133 @@ class Wrap(Transformer):
         try:
             return self.callable_object(value)
         except Exception as e:
-            raise_from(TransformationException, e)
+            fail(TransformationException, flags, cause=e)
 
 wrap = Wrap
 """
 wrap is an alias for the Wrap transform.
 """
+
+
+class _PendingBatch(object):
+    """
+    The values collected by WrapBatch for a single call to its callable.
+    """
+    def __init__(self):
+        self.values = []
+        self.results = None
+        self.error = None
+        self.full = Event()
+        self.done = Event()
+
+
+class WrapBatch(Transformer):
+    """
+    WrapBatch allows you to re-use a callable object that operates on a list
+    of values, returning a list containing the result for each value, in the
+    context of a RightShift chain. This allows bulk operations such as a single
+    database query for a number of keys to replace one query per key.
+
+    When the batch method is used, such as when a WrapBatch is part of a Chain
+    or Tupling being batched, the callable is called with lists of at most
+    max_batch values.
+
+    When a WrapBatch is called with a single value it behaves like a Wrap
+    whose callable is called with a list containing that value. If max_wait is
+    greater than 0 then calls made concurrently from multiple threads are
+    coalesced: the first call waits up to max_wait seconds for further calls,
+    up to a total of max_batch values, and the callable is then called once
+    on behalf of all of them.
+    """
+    def __init__(self, callable_object, max_batch=1000, max_wait=0):
+        """
+        :param callable_object: A callable accepting a list of values and
+                                returning a list of results
+        :param max_batch: The maximum number of values per call
+        :param max_wait: The number of seconds a call waits for other calls to
+                         coalesce with. Defaults to 0 for no coalescing.
+        """
+        if not callable(callable_object):
+            raise TransformationException('{} is not callable'.format(callable_object))
+        if max_batch < 1:
+            raise TransformationException('max_batch must be at least 1')
+        self.callable_object = callable_object
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._lock = Lock()
+        self._pending = {}
+
+    def __getstate__(self):
+        state = super(WrapBatch, self).__getstate__()
+        del state['_lock'], state['_pending']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+        self._pending = {}
+
+    def _call(self, values, flags):
+        try:
+            results = list(self.callable_object(values))
+        except Exception as e:
+            fail(TransformationException, flags, cause=e)
+        if len(results) != len(values):
+            fail(TransformationException, flags,
+                 '{} returned {} results for {} values',
+                 (self.callable_object, len(results), len(values)))
+        return results
+
+    def __call__(self, value, **flags):
+        """
+        Only calls with equal flags are coalesced, calls with flags that are
+        not hashable calling the callable on their own.
+        """
+        if self.max_wait <= 0:
+            return self._call([value], flags)[0]
+        try:
+            key = frozenset(flags.items())
+        except TypeError:
+            return self._call([value], flags)[0]
+        with self._lock:
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = _PendingBatch()
+            index = len(pending.values)
+            pending.values.append(value)
+            if len(pending.values) >= self.max_batch:
+                del self._pending[key]
+                pending.full.set()
+        if leader:
+            # The followers wait on done whatever the leader raises
+            try:
+                try:
+                    pending.full.wait(self.max_wait)
+                finally:
+                    with self._lock:
+                        if self._pending.get(key) is pending:
+                            del self._pending[key]
+                pending.results = self._call(pending.values, flags)
+            except BaseException as e:
+                pending.error = e
+            finally:
+                pending.done.set()
+        else:
+            pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.results[index]
+
+    def batch(self, values, **flags):
+        values = list(values)
+        results = []
+        for start in range(0, len(values), self.max_batch):
+            results.extend(self._call(values[start:start + self.max_batch],
+                                      flags))
+        return results
+
+wrap_batch = WrapBatch
+"""
+wrap_batch is an alias for the WrapBatch transform.
+"""
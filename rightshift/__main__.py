@@ -0,0 +1,7 @@
+import sys
+
+from rightshift.runner import main
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+sys.exit(main())
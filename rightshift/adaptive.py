@@ -0,0 +1,190 @@
+import operator
+from threading import Lock
+
+from rightshift import (Chain, Detupling, Record, TransformationException,
+                        Transformer, Tupling)
+from rightshift.conditionals import BooleanCondition
+from rightshift.cse import CommonSubexpressions, Shared
+from rightshift.extractors import Attribute, Item, Object
+from rightshift.magic import IndexOrAccessToInstantiate
+from rightshift.matchers import (Comparison, EqualTo, GreaterThan,
+                                 GreaterThanEqualTo, LessThan,
+                                 LessThanEqualTo, Matcher, Must, MustNot,
+                                 NotEqualTo, Should)
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+_OPERATORS = {
+    LessThan: operator.lt,
+    LessThanEqualTo: operator.le,
+    EqualTo: operator.eq,
+    NotEqualTo: operator.ne,
+    GreaterThanEqualTo: operator.ge,
+    GreaterThan: operator.gt,
+}
+
+
+class AdaptiveComparison(Matcher):
+    """
+    An AdaptiveComparison wraps a Comparison and observes the types of the
+    values it is called with. Once warmup values of a type have been compared
+    without raising an exception and producing a bool, values of that type
+    are compared by calling the comparison operator directly, bypassing the
+    flag lookups and bool() conversion of Comparison.__call__.
+
+    The fast path is guarded: if flags are supplied, the comparison raises or
+    does not produce a bool then the wrapped Comparison is called as usual.
+    Observations are synchronized, so an AdaptiveComparison may be shared
+    between threads.
+    """
+    def __init__(self, comparison, warmup=64):
+        """
+        :param comparison: A Comparison instance
+        :param warmup: The number of values of a type observed before values
+                       of that type are specialized
+        """
+        self.comparison = comparison
+        self.warmup = warmup
+        self._compare = self._create_compare()
+        self._observed = {}
+        self._fast = frozenset()
+        self._lock = Lock()
+
+    def __getstate__(self):
+        # Observations are not carried over to copies, which warm up afresh
+        state = super(AdaptiveComparison, self).__getstate__()
+        del state['_compare'], state['_observed'], state['_fast'], \
+            state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._compare = self._create_compare()
+        self._observed = {}
+        self._fast = frozenset()
+        self._lock = Lock()
+
+    def _create_compare(self):
+        comparator = _OPERATORS.get(type(self.comparison))
+        if comparator is None:
+            return self.comparison.comparator
+        operand = self.comparison.value
+        return lambda value: comparator(value, operand)
+
+    @property
+    def specialized(self):
+        """
+        The types of value for which the fast path is used.
+        """
+        return self._fast
+
+    def __call__(self, value, **flags):
+        kind = type(value)
+        if not flags:
+            if kind in self._fast:
+                try:
+                    result = self._compare(value)
+                except Exception:
+                    pass
+                else:
+                    if result is True or result is False:
+                        return result
+            elif self._observed.get(kind, 0) >= 0:
+                self._observe(kind, value)
+        return self.comparison(value, **flags)
+
+    def _observe(self, kind, value):
+        try:
+            result = self._compare(value)
+        except Exception:
+            result = None
+        with self._lock:
+            count = self._observed.get(kind, 0)
+            if count < 0:
+                return
+            if result is True or result is False:
+                count += 1
+                if count >= self.warmup:
+                    self._fast = self._fast | frozenset([kind])
+            else:
+                # Values of this type are never specialized
+                count = -1
+            self._observed[kind] = count
+
+
+def _specialize_object(transformer):
+    """
+    The determiner of an Object is fixed at construction, so the extraction
+    it performs can be bound up front.
+    """
+    if transformer.determiner == IndexOrAccessToInstantiate.ATTR:
+        return Attribute(transformer.attribute, transformer.determiner)
+    if transformer.determiner == IndexOrAccessToInstantiate.ITEM:
+        return Item(transformer.item_or_slice, transformer.determiner)
+    return transformer
+
+
+def _adapt(transformer, warmup, adapted):
+    try:
+        return adapted[id(transformer)]
+    except KeyError:
+        pass
+
+    def children(nodes):
+        return tuple(_adapt(node, warmup, adapted) for node in nodes)
+
+    result = transformer
+    if type(transformer) is Object:
+        result = _specialize_object(transformer)
+    elif isinstance(transformer, Comparison):
+        result = AdaptiveComparison(transformer, warmup)
+    elif isinstance(transformer, (Tupling, Detupling, Record)):
+        result = transformer._replace(
+            transformers=children(transformer.transformers))
+    elif isinstance(transformer, (Must, Should, MustNot)):
+        result = transformer._replace(
+            matchers=children(transformer.matchers))
+    elif isinstance(transformer, BooleanCondition):
+        matcher, then, otherwise = children((
+            transformer.matcher, transformer.then_transformer,
+            transformer.otherwise_transformer))
+        result = transformer._replace(matcher=matcher, then_transformer=then,
+                                      otherwise_transformer=otherwise)
+    elif isinstance(transformer, (Shared, CommonSubexpressions)):
+        result = transformer._replace(transformer=_adapt(
+            transformer.transformer, warmup, adapted))
+    elif isinstance(transformer, Chain):
+        left = _adapt(transformer.left, warmup, adapted)
+        right = transformer.right
+        if right is not None:
+            right = _adapt(right, warmup, adapted)
+        result = transformer._replace(left=left, right=right)
+    adapted[id(transformer)] = result
+    return result
+
+
+def adapt(transformer, warmup=64):
+    """
+    Return a copy of transformer in which call sites that can benefit from
+    runtime specialization are replaced with adaptive equivalents:
+
+    Object extractors are bound to item or attribute access according to
+    their determiner.
+
+    Comparisons are replaced by AdaptiveComparison, which calls the
+    comparison operator directly for the types of value observed to compare
+    cleanly.
+
+    The results of the adapted transformer are those of transformer.
+    Detuplings are not specialized, as whether one of their transformers
+    succeeds depends on the value rather than its type, so skipping any of
+    them could change which result is returned.
+
+    :param transformer: The Transformer to adapt
+    :param warmup: The number of observations required before specializing
+    :rtype: Transformer
+    """
+    if not isinstance(transformer, Transformer):
+        raise TransformationException('{} is not a Transformer'.format(
+            transformer))
+    return _adapt(transformer, warmup, {})
@@ -0,0 +1,372 @@
+from hashlib import sha1
+from math import log
+
+from rightshift import identity, Transformer
+from rightshift.operations import Operation, OperationException
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+# The sum alias below shadows the builtin within this module
+_sum = sum
+
+_MISSING = object()
+
+
+class AggregateException(OperationException):
+    """
+    AggregateException is raised when an Aggregate cannot produce a result,
+    such as when the mean of an empty stream is requested.
+    """
+
+
+class Aggregate(Operation):
+    """
+    An Aggregate is called with an iterable and reduces it to a single value
+    in a single pass using constant or bounded memory.
+
+    Each value in the iterable is first passed through the extractor the
+    Aggregate was instantiated with, allowing for usages like:
+
+    sum(item.price)(orders)
+
+    Aggregates expose their partial state in order to allow results computed
+    over separate shards or chunks of a stream to be combined:
+
+    a = mean(item.price)
+    state = a.merge(a.partial(shard_1), a.partial(shard_2))
+    a.result(state) == a(shard_1 + shard_2)
+
+    Partial states are plain Python values and may be pickled in order to be
+    passed between processes.
+
+    Sub-classes implement initial, accumulate, merge and optionally result.
+    """
+    def __init__(self, extractor=identity):
+        """
+        :param extractor: A Transformer applied to each value before it is
+                          aggregated. Defaults to identity.
+        """
+        if not isinstance(extractor, Transformer):
+            raise AggregateException('extractor parameter must be an instance '
+                                     'of rightshift.Transformer')
+        self.extractor = extractor
+
+    def initial(self):
+        """
+        :return: The partial state of an empty stream
+        """
+        raise NotImplementedError
+
+    def accumulate(self, state, value):
+        """
+        :param state: A partial state
+        :param value: An extracted value
+        :return: The partial state updated with value
+        """
+        raise NotImplementedError
+
+    def merge(self, state, other):
+        """
+        Merge other into state. Mutable partial states may be modified in
+        place and returned.
+
+        :param state: A partial state
+        :param other: Another partial state
+        :return: The partial state representing both inputs
+        """
+        raise NotImplementedError
+
+    def result(self, state):
+        """
+        :param state: A partial state
+        :return: The result of the aggregation
+        """
+        return state
+
+    def update(self, state, value, **flags):
+        """
+        Extract the relevant value from value and accumulate it into state.
+        """
+        return self.accumulate(state, self.extractor(value, **flags))
+
+    def partial(self, values, **flags):
+        """
+        :param values: An iterable
+        :return: The partial state of the aggregation of values
+        """
+        state = self.initial()
+        for value in values:
+            state = self.update(state, value, **flags)
+        return state
+
+    def combine(self, states):
+        """
+        :param states: An iterable of partial states
+        :return: The result of the aggregation of all the states
+        """
+        state = self.initial()
+        for other in states:
+            state = self.merge(state, other)
+        return self.result(state)
+
+    def __call__(self, values, **flags):
+        return self.result(self.partial(values, **flags))
+
+
+class CountAggregate(Aggregate):
+    """
+    Counts the values in a stream
+    """
+    def initial(self):
+        return 0
+
+    def accumulate(self, state, value):
+        return state + 1
+
+    def merge(self, state, other):
+        return state + other
+
+count = CountAggregate
+
+
+class SumAggregate(Aggregate):
+    """
+    Sums the values in a stream
+    """
+    def initial(self):
+        return 0
+
+    def accumulate(self, state, value):
+        return state + value
+
+    def merge(self, state, other):
+        return state + other
+
+sum = total = SumAggregate
+
+
+class MinAggregate(Aggregate):
+    """
+    Finds the smallest value in a stream. The partial state is an empty tuple
+    for an empty stream and a tuple containing the smallest value otherwise.
+    """
+    def __init__(self, extractor=identity, default=_MISSING):
+        """
+        :param extractor: Defaults to identity
+        :param default: The result for an empty stream. If not supplied an
+                        AggregateException is raised for an empty stream.
+        """
+        super(MinAggregate, self).__init__(extractor)
+        self.has_default = default is not _MISSING
+        self.default = default if self.has_default else None
+
+    def initial(self):
+        return ()
+
+    def accumulate(self, state, value):
+        if not state or self.prefer(value, state[0]):
+            return value,
+        return state
+
+    def merge(self, state, other):
+        if not other:
+            return state
+        return self.accumulate(state, other[0])
+
+    def result(self, state):
+        if state:
+            return state[0]
+        if self.has_default:
+            return self.default
+        raise AggregateException('{} of an empty stream'.format(
+            type(self).__name__))
+
+    def prefer(self, value, current):
+        return value < current
+
+min = minimum = MinAggregate
+
+
+class MaxAggregate(MinAggregate):
+    """
+    Finds the largest value in a stream
+    """
+    def prefer(self, value, current):
+        return value > current
+
+max = maximum = MaxAggregate
+
+
+class VarianceAggregate(Aggregate):
+    """
+    Computes the variance of the values in a stream using Welford's algorithm.
+    Partial states are (count, mean, sum of squared differences) tuples which
+    are merged using the parallel form of the algorithm due to Chan et al.
+    """
+    def __init__(self, extractor=identity, ddof=0):
+        """
+        :param extractor: Defaults to identity
+        :param ddof: Delta degrees of freedom. Defaults to 0 for the population
+                     variance, use 1 for the sample variance.
+        """
+        super(VarianceAggregate, self).__init__(extractor)
+        self.ddof = ddof
+
+    def initial(self):
+        return 0, 0.0, 0.0
+
+    def accumulate(self, state, value):
+        n, mean, m2 = state
+        n += 1
+        delta = value - mean
+        mean += delta / float(n)
+        m2 += delta * (value - mean)
+        return n, mean, m2
+
+    def merge(self, state, other):
+        n_a, mean_a, m2_a = state
+        n_b, mean_b, m2_b = other
+        n = n_a + n_b
+        if n == 0:
+            return state
+        delta = mean_b - mean_a
+        mean = mean_a + delta * n_b / float(n)
+        m2 = m2_a + m2_b + delta * delta * n_a * n_b / float(n)
+        return n, mean, m2
+
+    def result(self, state):
+        n, mean, m2 = state
+        if n - self.ddof <= 0:
+            raise AggregateException('Variance requires more than {} '
+                                     'values'.format(self.ddof))
+        return m2 / (n - self.ddof)
+
+variance = VarianceAggregate
+
+
+class MeanAggregate(VarianceAggregate):
+    """
+    Computes the arithmetic mean of the values in a stream. The partial states
+    are the same as those of VarianceAggregate.
+    """
+    def __init__(self, extractor=identity):
+        super(MeanAggregate, self).__init__(extractor)
+
+    def result(self, state):
+        n, mean, m2 = state
+        if n == 0:
+            raise AggregateException('Mean of an empty stream')
+        return mean
+
+mean = average = MeanAggregate
+
+
+class GroupByAggregate(Aggregate):
+    """
+    Groups the values in a stream by the key returned by key_extractor and
+    aggregates each group using aggregate. The result is a dictionary mapping
+    each key to the result of its group.
+
+    Memory use is bounded by the number of distinct keys.
+
+    Example:
+
+    group_by(item.region, sum(item.price))(orders) == {'eu': 10, 'us': 12}
+    """
+    def __init__(self, key_extractor, aggregate):
+        """
+        :param key_extractor: A Transformer returning the key of a value
+        :param aggregate: The Aggregate applied to each group
+        """
+        super(GroupByAggregate, self).__init__(key_extractor)
+        if not isinstance(aggregate, Aggregate):
+            raise AggregateException('aggregate parameter must be an instance '
+                                     'of rightshift.aggregates.Aggregate')
+        self.aggregate = aggregate
+
+    def initial(self):
+        return {}
+
+    def update(self, state, value, **flags):
+        key = self.extractor(value, **flags)
+        group = state[key] if key in state else self.aggregate.initial()
+        state[key] = self.aggregate.update(group, value, **flags)
+        return state
+
+    def merge(self, state, other):
+        for key, group in other.items():
+            if key not in state:
+                # The groups of other may be modified in place by later
+                # merges, so they are merged into a new group instead
+                state[key] = self.aggregate.initial()
+            state[key] = self.aggregate.merge(state[key], group)
+        return state
+
+    def result(self, state):
+        return dict(
+            (key, self.aggregate.result(group))
+            for key, group in state.items()
+        )
+
+group_by = GroupByAggregate
+
+
+class ApproximateDistinctCountAggregate(Aggregate):
+    """
+    Estimates the number of distinct values in a stream using the HyperLogLog
+    algorithm. The partial state is a bytearray of 2 ** precision registers,
+    which bounds memory use regardless of the size of the stream. Partial
+    states are merged by taking the maximum of each register.
+
+    Values are hashed using SHA-1 of their repr (or their bytes for strings),
+    ensuring the hashes and thus partial states are stable across processes.
+    The relative standard error of the estimate is roughly
+    1.04 / sqrt(2 ** precision).
+    """
+    def __init__(self, extractor=identity, precision=12):
+        """
+        :param extractor: Defaults to identity
+        :param precision: The number of bits used to index the registers,
+                          between 4 and 16. Defaults to 12.
+        """
+        super(ApproximateDistinctCountAggregate, self).__init__(extractor)
+        if not 4 <= precision <= 16:
+            raise AggregateException('precision must be between 4 and 16')
+        self.precision = precision
+        self.registers = 1 << precision
+
+    def initial(self):
+        return bytearray(self.registers)
+
+    def accumulate(self, state, value):
+        if isinstance(value, bytes):
+            data = value
+        elif isinstance(value, type(u'')):
+            data = value.encode('utf-8')
+        else:
+            data = repr(value).encode('utf-8')
+        hashed = int(sha1(data).hexdigest()[:16], 16)
+        index = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - remainder.bit_length() + 1
+        if rank > state[index]:
+            state[index] = rank
+        return state
+
+    def merge(self, state, other):
+        for index, rank in enumerate(other):
+            if rank > state[index]:
+                state[index] = rank
+        return state
+
+    def result(self, state):
+        m = self.registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        harmonic = _sum(2.0 ** -rank for rank in state)
+        estimate = alpha * m * m / harmonic
+        zeros = state.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * log(m / float(zeros))
+        return int(round(estimate))
+
+approximate_distinct_count = distinct_count = ApproximateDistinctCountAggregate
@@ -0,0 +1,492 @@
+"""
+asyncio support for rightshift. This module requires Python 3.5+.
+"""
+import asyncio
+from collections import deque
+from functools import partial
+from inspect import isawaitable
+from weakref import WeakKeyDictionary
+
+from rightshift import (Chain, fail, Record, TransformationException,
+                        Transformer, Tupling, Wrap, WrapBatch)
+from rightshift.chains import FlagsChain
+from rightshift.hedged import HedgedDetupling
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+try:
+    _get_running_loop = asyncio.get_running_loop
+except AttributeError:
+    # Python 3.5 and 3.6, where get_event_loop returns the running loop when
+    # called from a coroutine
+    _get_running_loop = asyncio.get_event_loop
+
+
+async def _race(detupling, value, flags):
+    """
+    The asyncio equivalent of HedgedDetupling.__call__. The transformers are
+    run in the threads of the HedgedDetupling while the event loop waits for
+    them.
+    """
+    loop = _get_running_loop()
+    executor = detupling._get_executor()
+    futures = []
+    waiting = []
+    next_start = 0
+    try:
+        while True:
+            all_failed = True
+            for future in futures:
+                if not future.done():
+                    all_failed = False
+                    break
+                error = future.exception()
+                if error is None:
+                    return future.result()
+                if not isinstance(error, TransformationException):
+                    raise error
+            started = len(futures)
+            if started < len(detupling.transformers) and (
+                    all_failed or loop.time() >= next_start):
+                future = executor.submit(detupling._timed(started, value,
+                                                          flags))
+                futures.append(future)
+                waiting.append(asyncio.wrap_future(future))
+                next_start = loop.time() + detupling.hedge_delay
+                continue
+            if all_failed:
+                fail(TransformationException, flags, 'Failed to detuple {}',
+                     (value,))
+            timeout = None
+            if started < len(detupling.transformers):
+                timeout = max(0, next_start - loop.time())
+            await asyncio.wait([future for future in waiting
+                                if not future.done()],
+                               timeout=timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for index, future in enumerate(futures):
+            detupling._cancel(index, future)
+            if waiting[index].done():
+                if not waiting[index].cancelled():
+                    # Mark the outcome as retrieved
+                    waiting[index].exception()
+            else:
+                waiting[index].cancel()
+
+
+class _AsyncPendingBatch(object):
+    """
+    The values collected by a coalescing WrapBatch called from coroutines
+    for a single call to its callable.
+    """
+    def __init__(self, loop):
+        self.values = []
+        self.full = asyncio.Event()
+        self.results = loop.create_future()
+
+
+_pending_batches = {}
+"""
+The _AsyncPendingBatch collecting values for each WrapBatch, event loop and
+set of flags, keyed by the ids of the former and the items of the flags.
+Entries are removed once their batch is dispatched.
+"""
+
+
+async def _dispatch(wrap_batch, key, pending, executor, flags):
+    try:
+        await asyncio.wait_for(pending.full.wait(), wrap_batch.max_wait)
+    except asyncio.TimeoutError:
+        pass
+    if _pending_batches.get(key) is pending:
+        del _pending_batches[key]
+    loop = _get_running_loop()
+    try:
+        results = await loop.run_in_executor(
+            executor, wrap_batch._call, pending.values, flags)
+    except BaseException as e:
+        pending.results.set_exception(e)
+    else:
+        pending.results.set_result(results)
+
+
+async def _coalesce(wrap_batch, value, executor, flags):
+    """
+    The asyncio equivalent of WrapBatch.__call__ with coalescing. The first
+    call waits up to max_wait seconds for further calls without blocking the
+    event loop, and the callable is then called once in a thread of executor
+    on behalf of all of them.
+
+    Only calls with equal flags are coalesced, calls with flags that are not
+    hashable calling the callable on their own.
+    """
+    loop = _get_running_loop()
+    try:
+        key = id(wrap_batch), id(loop), frozenset(flags.items())
+        pending = _pending_batches.get(key)
+    except TypeError:
+        return (await loop.run_in_executor(executor, wrap_batch._call,
+                                           [value], flags))[0]
+    if pending is None:
+        pending = _pending_batches[key] = _AsyncPendingBatch(loop)
+        asyncio.ensure_future(_dispatch(wrap_batch, key, pending, executor,
+                                        flags))
+    index = len(pending.values)
+    pending.values.append(value)
+    if len(pending.values) >= wrap_batch.max_batch:
+        del _pending_batches[key]
+        pending.full.set()
+    # The batch is dispatched regardless of the cancellation of any caller
+    results = await asyncio.shield(pending.results)
+    return results[index]
+
+
+async def _awaited(awaitable, flags):
+    try:
+        return await awaitable
+    except Exception as e:
+        fail(TransformationException, flags, cause=e)
+
+
+def _steps(transformer):
+    """
+    :return: The sequence of Transformers making up transformer if it is a
+             Chain calling its left and right sides in turn, otherwise None
+    """
+    if (not isinstance(transformer, Chain) or transformer.right is None or
+            type(transformer).__call__ is not Chain.__call__):
+        return None
+    steps = []
+    for side in (transformer.left, transformer.right):
+        side_steps = _steps(side)
+        steps.extend(side_steps if side_steps is not None else [side])
+    return steps
+
+
+def _branches(transformer):
+    """
+    :return: The transformers of transformer if it is a Tupling or Record
+             calling each of them with the value, otherwise None
+    """
+    for kind in (Tupling, Record):
+        if (isinstance(transformer, kind) and
+                type(transformer).__call__ is kind.__call__):
+            return transformer.transformers
+    return None
+
+
+def _is_flags_chain(transformer):
+    return (isinstance(transformer, FlagsChain) and
+            type(transformer).__call__ is FlagsChain.__call__)
+
+
+def _is_coroutine_wrap(transformer):
+    return (isinstance(transformer, Wrap) and
+            asyncio.iscoroutinefunction(transformer.callable_object))
+
+
+def _children(transformer):
+    """
+    Generate the Transformers held by the public attributes of transformer.
+    """
+    for name, value in vars(transformer).items():
+        if name.startswith('_'):
+            continue
+        for child in value if isinstance(value, (list, tuple)) else (value,):
+            if isinstance(child, Transformer):
+                yield child
+
+
+_awaiting = WeakKeyDictionary()
+"""
+Caches the result of _awaits for each transformer called by acall.
+"""
+
+
+def _awaits(transformer):
+    """
+    :return: True if transformer is a Wrap of a coroutine function, or a
+             Chain, FlagsChain, Tupling or Record containing one
+    :raise: TransformationException if a Chain, Tupling or Record
+            containing a Wrap of a coroutine function is contained by any
+            other transformer
+    """
+    try:
+        return _awaiting[transformer]
+    except KeyError:
+        pass
+    if _is_coroutine_wrap(transformer):
+        awaits = True
+    elif _is_flags_chain(transformer):
+        awaits = _awaits(transformer.left)
+    else:
+        children = _steps(transformer)
+        if children is None:
+            children = _branches(transformer)
+        if children is not None:
+            awaits = any([_awaits(child) for child in children])
+        else:
+            # A Wrap of a coroutine function held directly returns its
+            # coroutine, which is awaited if it is the result
+            for child in _children(transformer):
+                if _awaits(child) and not _is_coroutine_wrap(child):
+                    raise TransformationException(
+                        '{} contains a Wrap of a coroutine function within '
+                        'a Chain, Tupling or Record, which acall cannot '
+                        'await'.format(transformer))
+            awaits = False
+    _awaiting[transformer] = awaits
+    return awaits
+
+
+async def acall(transformer, value, executor=None, **flags):
+    """
+    Call transformer with value from a coroutine without blocking the event
+    loop, the transformer being called in a thread of executor, or the
+    default executor of the event loop if None.
+
+    A HedgedDetupling is raced using its own threads, its transformers being
+    started after its hedge delay while the event loop waits. Concurrent
+    calls to a WrapBatch with a max_wait greater than 0 are coalesced within
+    the event loop, occupying a single thread per batch.
+
+    A Wrap of a coroutine function is called within the event loop, and its
+    coroutine awaited there, without using a thread. Likewise awaitable
+    results of other transformers are awaited within the event loop. As with
+    Wrap, exceptions raised awaiting them are raised as a
+    TransformationException.
+
+    Chains, Tuplings and Records containing a Wrap of a coroutine function,
+    including those to which flags are applied, are evaluated a part at a
+    time, each as by acall, so that the coroutine is awaited wherever the
+    Wrap appears within them. Those that do not contain one are called in a
+    single thread. Any other transformer is called in a thread as a whole,
+    so a Wrap of a coroutine function held by it directly, such as the then
+    transformer of a condition, returns its coroutine, which is awaited if it
+    is the result. A Chain, Tupling or Record containing a Wrap of a
+    coroutine function cannot be awaited within any other transformer, such
+    as a Detupling, and a TransformationException is raised.
+
+    :param transformer: A Transformer
+    :param value: The value to transform
+    :param executor: An optional concurrent.futures.Executor
+    :param flags: Flags to call transformer with
+    :return: The result of the transformer
+    """
+    if isinstance(transformer, HedgedDetupling):
+        return await _race(transformer, value, flags)
+    if isinstance(transformer, WrapBatch) and transformer.max_wait > 0:
+        return await _coalesce(transformer, value, executor, flags)
+    if _is_coroutine_wrap(transformer):
+        result = transformer(value, **flags)
+    elif _awaits(transformer):
+        if _is_flags_chain(transformer):
+            use_flags = dict(transformer.flags)
+            use_flags.update(flags)
+            return await acall(transformer.left, value, executor, **use_flags)
+        steps = _steps(transformer)
+        if steps is not None:
+            for step in steps:
+                value = await acall(step, value, executor, **flags)
+            return value
+        results = [await acall(branch, value, executor, **flags)
+                   for branch in _branches(transformer)]
+        if isinstance(transformer, Record):
+            return transformer._make(results)
+        if flags.get('tupling__generator', transformer.generator):
+            return iter(results)
+        return results
+    else:
+        loop = _get_running_loop()
+        result = await loop.run_in_executor(
+            executor, partial(transformer, value, **flags))
+    if isawaitable(result):
+        result = await _awaited(result, flags)
+    return result
+
+
+class _IterableSource(object):
+    """
+    Adapts an iterable to the asynchronous iterator protocol.
+    """
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+
+    async def __anext__(self):
+        try:
+            return next(self.iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncStream(object):
+    """
+    An AsyncStream is an asynchronous iterator over the results of a
+    transformer for the values of a source, see astream.
+    """
+    def __init__(self, transformer, source, concurrency=16, ordered=True,
+                 on_error=None, executor=None, **flags):
+        """
+        See astream.
+        """
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+        self.transformer = transformer
+        self.concurrency = concurrency
+        self.ordered = ordered
+        self.on_error = on_error
+        self.executor = executor
+        self.flags = flags
+        if hasattr(source, '__aiter__'):
+            self._source = source.__aiter__()
+        else:
+            self._source = _IterableSource(source)
+        # (value, task) tuples in the order the values were read
+        self._in_flight = deque()
+        # (value, task) tuples in the order the tasks completed, when
+        # unordered
+        self._completed = deque()
+        self._pull = None
+        self._exhausted = False
+
+    def __aiter__(self):
+        return self
+
+    def _start(self, value):
+        task = asyncio.ensure_future(acall(self.transformer, value,
+                                           self.executor, **self.flags))
+        self._in_flight.append((value, task))
+
+    def _next_completed(self):
+        """
+        :return: The next (value, task) tuple to yield the outcome of, or
+                 None if it has not completed yet
+        """
+        if self.ordered:
+            if self._in_flight and self._in_flight[0][1].done():
+                return self._in_flight.popleft()
+            return None
+        if not self._completed:
+            remaining = deque()
+            for value, task in self._in_flight:
+                if task.done():
+                    self._completed.append((value, task))
+                else:
+                    remaining.append((value, task))
+            self._in_flight = remaining
+        if self._completed:
+            return self._completed.popleft()
+        return None
+
+    async def __anext__(self):
+        try:
+            while True:
+                completed = self._next_completed()
+                if completed is not None:
+                    value, task = completed
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    if (self.on_error is None or
+                            not isinstance(error, TransformationException)):
+                        raise error
+                    handled = self.on_error(value, error)
+                    if isawaitable(handled):
+                        await handled
+                    continue
+                in_flight = len(self._in_flight) + len(self._completed)
+                if (self._pull is None and not self._exhausted and
+                        in_flight < self.concurrency):
+                    self._pull = asyncio.ensure_future(
+                        self._source.__anext__())
+                waiting = [task for _, task in self._in_flight
+                           if not task.done()]
+                if self._pull is not None:
+                    waiting.append(self._pull)
+                if not waiting:
+                    raise StopAsyncIteration
+                await asyncio.wait(waiting,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                if self._pull is not None and self._pull.done():
+                    pull, self._pull = self._pull, None
+                    try:
+                        value = pull.result()
+                    except StopAsyncIteration:
+                        self._exhausted = True
+                    else:
+                        self._start(value)
+        except StopAsyncIteration:
+            raise
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self):
+        """
+        Cancel the values in flight and stop reading the source, closing it
+        if it is an asynchronous generator.
+        """
+        tasks = [task for _, task in self._in_flight]
+        tasks.extend(task for _, task in self._completed)
+        if self._pull is not None:
+            tasks.append(self._pull)
+        self._in_flight.clear()
+        self._completed.clear()
+        self._pull = None
+        self._exhausted = True
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+        for task in tasks:
+            if not task.cancelled():
+                # Mark the outcome as retrieved
+                task.exception()
+        close = getattr(self._source, 'aclose', None)
+        if close is not None:
+            await close()
+
+
+def astream(transformer, source, concurrency=16, ordered=True, on_error=None,
+            executor=None, **flags):
+    """
+    Transform the values of an asynchronous source, such as a queue consumer,
+    from a coroutine:
+
+    async for result in astream(enrich, consumer, concurrency=32):
+        ...
+
+    Each value is transformed as by acall, so transformers are called in the
+    threads of executor without blocking the event loop, while a
+    HedgedDetupling, a coalescing WrapBatch or a Wrap of a coroutine
+    function is awaited within it.
+
+    At most concurrency values are in flight at a time, including those
+    whose results are held back to preserve their order. The source is only
+    read while fewer values are in flight, so a slow transformer or consumer
+    applies backpressure to the source rather than values accumulating in
+    memory.
+
+    Values for which the transformer raises a TransformationException, which
+    includes the BreakException raised by break_if and break_if_not, are
+    passed to on_error as on_error(value, exception) and produce no result.
+    on_error may be a coroutine function. Without on_error, and for any other
+    exception, the exception is raised by the stream after the values in
+    flight are cancelled.
+
+    :param transformer: A Transformer
+    :param source: An asynchronous iterable, or an iterable
+    :param concurrency: The maximum number of values in flight
+    :param ordered: Whether results are yielded in the order of their values
+                    or in the order they complete
+    :param on_error: An optional callable accepting a value and the
+                     TransformationException raised for it
+    :param executor: An optional concurrent.futures.Executor. The default
+                     executor of the event loop has a limited number of
+                     threads, which also limits concurrency.
+    :param flags: Flags to call transformer with
+    :rtype: AsyncStream
+    """
+    return AsyncStream(transformer, source, concurrency, ordered, on_error,
+                       executor, **flags)
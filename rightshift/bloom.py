@@ -0,0 +1,65 @@
+from math import ceil, log
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+_MASK = (1 << 64) - 1
+
+
+class BloomFilter(object):
+    """
+    A BloomFilter is a compact approximation of a set. A value that has been
+    added is always reported as present, while a value that has not been
+    added is reported as present with a probability of approximately
+    error_rate once capacity values have been added.
+
+    The positions tested for a value are derived from hash(value), so values
+    must be hashable and, as string hashes are randomized per process, a
+    BloomFilter is only meaningful within the process that populated it.
+    """
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        :param capacity: The number of values expected to be added
+        :param error_rate: The false positive rate expected once capacity
+                           values have been added
+        :raise: ValueError if capacity or error_rate is invalid
+        """
+        if not 0 < error_rate < 1:
+            raise ValueError('error_rate must be between 0 and 1')
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = int(ceil(-capacity * log(error_rate) / log(2) ** 2))
+        self.hashes = max(1, int(round(float(self.size) / capacity * log(2))))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        # Double hashing: position i is h1 + i * h2, h2 being odd
+        mixed = (hash(value) * 0x9E3779B97F4A7C15) & _MASK
+        first = mixed & 0xFFFFFFFF
+        step = (mixed >> 32) | 1
+        size = self.size
+        return [(first + i * step) % size for i in range(self.hashes)]
+
+    def add(self, value):
+        bits = self._bits
+        for position in self._positions(value):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def __contains__(self, value):
+        bits = self._bits
+        for position in self._positions(value):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        """
+        :return: The number of values added, including duplicates
+        """
+        return self.count
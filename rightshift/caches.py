@@ -0,0 +1,77 @@
+from collections import OrderedDict
+import sys
+from threading import Lock
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class LRUCache(object):
+    """
+    A thread-safe mapping that holds at most maxsize entries, discarding the
+    least recently used entry when full. Hits and misses are counted in order
+    to allow the effectiveness of the cache to be reported.
+    """
+    def __init__(self, maxsize=1024):
+        """
+        :param maxsize: The maximum number of entries held
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """
+        :return: The value cached for key, marking it as recently used, or
+                 default if key is not cached
+        """
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Cache value for key, discarding the least recently used entries if
+        the cache is full.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            while self._entries and len(self._entries) >= self.maxsize:
+                self._entries.popitem(last=False)
+            self._entries[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __sizeof__(self):
+        # The size of the entries themselves, which may be shared, is not
+        # included
+        return object.__sizeof__(self) + sys.getsizeof(self._entries)
+
+    def _fingerprint(self):
+        # The entries and statistics of a cache do not affect its behaviour
+        return self.maxsize
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
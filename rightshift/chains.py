@@ -1,4 +1,3 @@
-from copy import copy
 from rightshift import Chain, ChainTransformer, TransformationException
 from rightshift.magic import IndexOrAccessToInstantiate
 
@@ -7,25 +6,32 @@ __author__ = 'adam.jorgensen.za@gmail.com'
 
 class FlagsChain(Chain):
     """
-    TODO: Document
+    A FlagsChain calls left with its flags, updated with the flags it is
+    called with.
+
+    The flags are held as a tuple of (name, value) pairs sorted by name, so
+    that they cannot be modified once the FlagsChain is created.
     """
     def __init__(self, flags, left):
         """
-        TODO: Document
+        :param flags: A dictionary or iterable of (name, value) pairs
+        :param left: The Transformer to call with the flags
         """
         super(FlagsChain, self).__init__(left, None)
-        self.flags = flags
+        self.flags = tuple(sorted(dict(flags).items()))
 
     def __call__(self, value, **flags):
-        """
-        TODO: Document
-        """
-        use_flags = copy(self.flags)
+        use_flags = dict(self.flags)
         use_flags.update(flags)
         return self.left(value, **use_flags)
 
+    def batch(self, values, **flags):
+        use_flags = dict(self.flags)
+        use_flags.update(flags)
+        return self.left.batch(values, **use_flags)
+
     def __lshift__(self, other):
-        return self.left >> other >> Flags(**self.flags)
+        return self.left >> other >> Flags(**dict(self.flags))
 
 
 class Flags(ChainTransformer):
@@ -95,6 +101,17 @@ class DefaultChain(Chain):
         except TransformationException:
             return self.default
 
+    def batch(self, values, **flags):
+        """
+        If the batch fails as a whole each value is retried individually so
+        that the default is only used for the values that fail.
+        """
+        values = list(values)
+        try:
+            return self.left.batch(values, **flags)
+        except TransformationException:
+            return [self(value, **flags) for value in values]
+
     def __lshift__(self, other):
         return self.left >> other >> Default(self.default)
 
@@ -50,32 +50,44 @@ class BooleanCondition(Condition):
 
     By default the Identity transformer will be executed when the Matcher
     succeeds or fails but this can be changed by calling the .then() and
-    .otherwise() methods on the BooleanCondition instance.
+    .otherwise() methods on the BooleanCondition instance. As transformers are
+    immutable these methods return a new BooleanCondition, leaving the
+    original unchanged, which allows partially built conditions to be shared:
+
+    is_admin = when(item.role.value_is == 'admin')
+    a = is_admin.then(item.name)
+    b = is_admin.then(item.email)
     """
-    def __init__(self, matcher):
+    def __init__(self, matcher, then_transformer=identity,
+                 otherwise_transformer=identity):
         """
+        :param matcher: A Matcher instance
+        :param then_transformer: Defaults to identity
+        :param otherwise_transformer: Defaults to identity
         """
         super(BooleanCondition, self).__init__(matcher)
-        self.then_transformer = identity
-        self.otherwise_transformer = identity
+        self.then_transformer = then_transformer
+        self.otherwise_transformer = otherwise_transformer
 
     def then(self, transformer):
         """
+        :return: A copy of this BooleanCondition using transformer as its
+                 then transformer
         """
         if not isinstance(transformer, Transformer):
             raise ConditionException('transformer parameter must be an '
                                      'instance of rightshift.Transformer')
-        self.then_transformer = transformer
-        return self
+        return self._replace(then_transformer=transformer)
 
     def otherwise(self, transformer):
         """
+        :return: A copy of this BooleanCondition using transformer as its
+                 otherwise transformer
         """
         if not isinstance(transformer, Transformer):
             raise ConditionException('transformer parameter must ben an '
                                      'instance of rightshift.Transformer')
-        self.otherwise_transformer = transformer
-        return self
+        return self._replace(otherwise_transformer=transformer)
 
 
 class WhenBooleanCondition(BooleanCondition):
@@ -121,9 +133,9 @@ class BreakIfCondition(WhenBooleanCondition):
     The BreakIfCondition inherits from the WhenBooleanCondition. When the
     matcher is evaluated and returns True an exception will be raised.
     """
-    def __init__(self, matcher):
-        super(BreakIfCondition, self).__init__(matcher)
-        self.then_transformer = Break
+    def __init__(self, matcher, otherwise_transformer=identity):
+        super(BreakIfCondition, self).__init__(matcher, Break,
+                                               otherwise_transformer)
 
 break_if = BreakIfCondition
 """
@@ -0,0 +1,227 @@
+from collections import Counter
+from threading import local
+from types import GeneratorType
+
+from rightshift import (Chain, Detupling, Identity, Record,
+                        TransformationException, Transformer, Tupling, Value)
+from rightshift.chains import DefaultChain, FlagsChain
+from rightshift.conditionals import Break, BooleanCondition
+from rightshift.extractors import Attribute, Item, Object, Path
+from rightshift.matchers import Must, MustNot, Should
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+_scope = local()
+
+
+class Shared(Transformer):
+    """
+    A Shared transformer memoizes the result of calling transformer with a
+    value for the duration of the evaluation of the enclosing
+    CommonSubexpressions transformer, so that a sub-graph appearing in a
+    number of places is evaluated once per value. Failures are memoized as
+    well and raised again.
+
+    Outside of such an evaluation, such as when a lazy Tupling is consumed,
+    a Shared transformer simply calls transformer.
+    """
+    def __init__(self, transformer):
+        self.transformer = transformer
+
+    def __call__(self, value, **flags):
+        memo = getattr(_scope, 'memo', None)
+        if memo is None:
+            return self.transformer(value, **flags)
+        key = id(self), id(value), tuple(sorted(flags.items()))
+        try:
+            _, ok, result = memo[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Flags with unhashable values cannot be memoized
+            return self.transformer(value, **flags)
+        else:
+            if ok:
+                return result
+            raise result
+        try:
+            result = self.transformer(value, **flags)
+        except TransformationException as e:
+            memo[key] = value, False, e
+            raise
+        if not isinstance(result, GeneratorType):
+            # value is retained so that its id is not re-used while memoized
+            memo[key] = value, True, result
+        return result
+
+    def batch(self, values, **flags):
+        return self.transformer.batch(values, **flags)
+
+
+class CommonSubexpressions(Transformer):
+    """
+    CommonSubexpressions is the Transformer returned by
+    eliminate_common_subexpressions. Each call establishes the scope within
+    which the Shared transformers of transformer memoize their results.
+    """
+    def __init__(self, transformer, shared):
+        """
+        :param transformer: The rewritten Transformer
+        :param shared: The Shared transformers it contains
+        """
+        self.transformer = transformer
+        self.shared = shared
+
+    def __call__(self, value, **flags):
+        previous = getattr(_scope, 'memo', None)
+        _scope.memo = {}
+        try:
+            return self.transformer(value, **flags)
+        finally:
+            _scope.memo = previous
+
+    def batch(self, values, **flags):
+        return [self(value, **flags) for value in values]
+
+
+def _flatten(transformer):
+    """
+    :return: The sequence of Transformers making up a Chain
+    """
+    # Chains without a right, such as FlagsChain, wrap rather than sequence
+    if isinstance(transformer, Chain) and transformer.right is not None:
+        return _flatten(transformer.left) + _flatten(transformer.right)
+    return transformer,
+
+
+def _chain(transformers):
+    result = transformers[0]
+    for transformer in transformers[1:]:
+        result = Chain(result, transformer)
+    return result
+
+
+_TRIVIAL = (Value, Item, Attribute, Object, Path)
+
+
+def _is_trivial(transformers):
+    """
+    Sharing sequences of transformers that are cheaper to evaluate than to
+    memoize, such as item accesses, is not worthwhile.
+    """
+    return all(transformer is Identity or transformer is Break or
+               isinstance(transformer, _TRIVIAL)
+               for transformer in transformers)
+
+
+def _branches(transformer):
+    """
+    :return: The Transformers called with the same value as transformer
+    """
+    if isinstance(transformer, (Tupling, Detupling, Record)):
+        return list(transformer.transformers)
+    if isinstance(transformer, (Must, Should, MustNot)):
+        return list(transformer.matchers)
+    if isinstance(transformer, BooleanCondition):
+        return [transformer.matcher, transformer.then_transformer,
+                transformer.otherwise_transformer]
+    if isinstance(transformer, (FlagsChain, DefaultChain)):
+        return [transformer.left]
+    return []
+
+
+def _rebuild(transformer, branches):
+    if isinstance(transformer, (Tupling, Detupling)):
+        return transformer._replace(transformers=tuple(branches))
+    if isinstance(transformer, Record):
+        return transformer._replace(transformers=tuple(branches))
+    if isinstance(transformer, (Must, Should, MustNot)):
+        return type(transformer)(branches)
+    if isinstance(transformer, BooleanCondition):
+        matcher, then, otherwise = branches
+        return transformer._replace(matcher=matcher, then_transformer=then,
+                                    otherwise_transformer=otherwise)
+    if isinstance(transformer, FlagsChain):
+        return FlagsChain(transformer.flags, branches[0])
+    return DefaultChain(transformer.default, branches[0])
+
+
+def _count(transformer, context, counts):
+    """
+    Count the occurrences of each prefix of transformer, identified by the
+    sequence of transformers applied to the input value to compute it. Two
+    prefixes with the same sequence compute the same value.
+    """
+    transformers = _flatten(transformer)
+    for index, transformer in enumerate(transformers):
+        key = context + transformers[:index + 1]
+        counts[key] += 1
+        if counts[key] == 1:
+            for branch in _branches(transformer):
+                _count(branch, context + transformers[:index], counts)
+
+
+def _rewrite(transformer, context, counts, shared):
+    transformers = _flatten(transformer)
+    parts = []
+    start = 0
+    while start < len(transformers):
+        end = start + 1
+        for length in range(len(transformers), start, -1):
+            key = context + transformers[:length]
+            if counts[key] > 1 and not _is_trivial(transformers[start:length]):
+                end = length
+                break
+        rewritten = []
+        for index in range(start, end):
+            branches = _branches(transformers[index])
+            if branches:
+                rewritten.append(_rebuild(transformers[index], [
+                    _rewrite(branch, context + transformers[:index], counts,
+                             shared)
+                    for branch in branches
+                ]))
+            else:
+                rewritten.append(transformers[index])
+        key = context + transformers[:end]
+        if counts[key] > 1 and not _is_trivial(transformers[start:end]):
+            if key not in shared:
+                shared[key] = Shared(_chain(rewritten))
+            rewritten = [shared[key]]
+        parts.extend(rewritten)
+        start = end
+    return _chain(parts)
+
+
+def eliminate_common_subexpressions(transformer):
+    """
+    Detect equal sub-graphs of transformer that are evaluated with the same
+    value, such as a common prefix of the branches of a Tupling or a matcher
+    repeated in the then branch of a condition, and return a Transformer in
+    which each of them is evaluated once per value:
+
+    parse = item.body >> Wrap(json.loads)
+    t = eliminate_common_subexpressions(parse >> item.a & parse >> item.b)
+
+    Sub-graphs are compared structurally, so the Transformers involved must be
+    deterministic for the result to be equivalent. If no common
+    sub-expressions are found then transformer is returned unchanged.
+
+    :param transformer: The Transformer to optimize
+    :rtype: Transformer
+    """
+    if not isinstance(transformer, Transformer):
+        raise TransformationException('{} is not a Transformer'.format(
+            transformer))
+    counts = Counter()
+    _count(transformer, (), counts)
+    shared = {}
+    rewritten = _rewrite(transformer, (), counts, shared)
+    if not shared:
+        return transformer
+    return CommonSubexpressions(rewritten, list(shared.values()))
+
+cse = eliminate_common_subexpressions
+"""
+cse is an alias for the eliminate_common_subexpressions function.
+"""
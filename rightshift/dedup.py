@@ -0,0 +1,287 @@
+from collections import OrderedDict
+import sys
+from threading import Lock
+import time
+
+from rightshift import fail, identity, TransformationException, Transformer
+from rightshift.bloom import BloomFilter
+from rightshift.caches import LRUCache
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class DistinctException(TransformationException):
+    """
+    DistinctException is raised when a Distinct is instantiated with invalid
+    parameters or a key cannot be remembered, such as an unhashable key.
+    """
+
+
+class KeySet(object):
+    """
+    A thread-safe record of the keys seen by a Distinct, holding a bounded
+    number of keys. The number of keys added and of duplicates rejected are
+    counted in order to allow the hit rate to be reported.
+
+    Sub-classes implement _add, __len__, __sizeof__ and _clear.
+    """
+    def __init__(self):
+        self.added = 0
+        self.duplicates = 0
+        self._lock = Lock()
+
+    def _add(self, key):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def add(self, key):
+        """
+        :return: True if key has not been seen, in which case it is
+                 remembered, False otherwise
+        :raise: TypeError if key is not hashable
+        """
+        with self._lock:
+            if self._add(key):
+                self.added += 1
+                return True
+            self.duplicates += 1
+            return False
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+            self.added = self.duplicates = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+
+class ExactKeys(KeySet):
+    """
+    Remembers the max_keys most recently seen keys exactly, forgetting the
+    least recently seen key when full.
+    """
+    def __init__(self, max_keys):
+        super(ExactKeys, self).__init__()
+        self.cache = LRUCache(max_keys)
+
+    def _add(self, key):
+        if self.cache.get(key) is not None:
+            return False
+        self.cache.put(key, True)
+        return True
+
+    def _clear(self):
+        self.cache.clear()
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + sys.getsizeof(self.cache)
+
+
+class RecentKeys(KeySet):
+    """
+    Remembers each key for seconds after it is first seen, holding at most
+    max_keys keys, the oldest being forgotten first when full.
+    """
+    def __init__(self, seconds, max_keys, clock=time.time):
+        super(RecentKeys, self).__init__()
+        self.seconds = seconds
+        self.max_keys = max_keys
+        self.clock = clock
+        # Keys mapped to the time they were first seen, oldest first
+        self._times = OrderedDict()
+
+    def _add(self, key):
+        now = self.clock()
+        times = self._times
+        expired = now - self.seconds
+        while times:
+            oldest = next(iter(times))
+            if times[oldest] > expired:
+                break
+            del times[oldest]
+        if key in times:
+            return False
+        while len(times) >= self.max_keys:
+            times.popitem(last=False)
+        times[key] = now
+        return True
+
+    def _clear(self):
+        self._times.clear()
+
+    def __len__(self):
+        return len(self._times)
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + sys.getsizeof(self._times)
+
+
+class ApproximateKeys(KeySet):
+    """
+    Remembers keys in a pair of BloomFilters of capacity keys each, using a
+    fixed amount of memory. Once the current filter is full it replaces the
+    previous filter and a new filter is started, so at least the last
+    capacity keys are always remembered.
+
+    A key that has not been seen is mistaken for a duplicate with a
+    probability of at most about twice error_rate. Seen keys are never
+    mistaken for new keys while they are remembered.
+    """
+    def __init__(self, capacity, error_rate):
+        super(ApproximateKeys, self).__init__()
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = None
+
+    def _add(self, key):
+        if key in self._current or (self._previous is not None and
+                                    key in self._previous):
+            return False
+        self._current.add(key)
+        if len(self._current) >= self.capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+        return True
+
+    def _clear(self):
+        self._current = BloomFilter(self.capacity, self.error_rate)
+        self._previous = None
+
+    def __len__(self):
+        remembered = len(self._current)
+        if self._previous is not None:
+            remembered += len(self._previous)
+        return remembered
+
+    def __sizeof__(self):
+        filters = 1 if self._previous is None else 2
+        return (object.__sizeof__(self) +
+                filters * (self._current.size + 7) // 8)
+
+
+STRATEGIES = ('exact', 'recent', 'approximate')
+"""
+The strategies a Distinct may use to remember keys.
+"""
+
+
+class Distinct(Transformer):
+    """
+    A Distinct is called with an iterable, a stream of values, and returns a
+    generator of the values whose key has not been seen, dropping duplicates:
+
+    records >> distinct(key=item.id)
+
+    Keys are remembered across calls, so that a stream consumed in chunks is
+    deduplicated as a whole, in the seen KeySet, using one of the following
+    strategies in order to bound memory use:
+
+    exact: The max_keys most recently seen keys are remembered exactly
+    recent: Keys are remembered for seconds after they are first seen, and
+            at most max_keys of them
+    approximate: Keys are remembered in Bloom filters, using a fixed amount
+                 of memory. New keys are mistaken for duplicates at about
+                 error_rate.
+
+    Keys must be hashable. Values arriving one at a time, such as from a
+    consumer, may be checked using is_new.
+    """
+    def __init__(self, key=identity, strategy='exact', max_keys=1000000,
+                 seconds=None, error_rate=0.001, clock=time.time):
+        """
+        :param key: A Transformer extracting the key. Defaults to identity
+        :param strategy: One of STRATEGIES. Defaults to 'exact'.
+        :param max_keys: The maximum number of keys remembered by the exact
+                         and recent strategies, and the capacity of each
+                         Bloom filter of the approximate strategy
+        :param seconds: The number of seconds keys are remembered for by the
+                        recent strategy
+        :param error_rate: The false positive rate of the approximate
+                           strategy
+        :param clock: A callable returning the current time in seconds, used
+                      by the recent strategy. Defaults to time.time.
+        """
+        if not isinstance(key, Transformer):
+            raise DistinctException('key parameter must be an instance of '
+                                    'rightshift.Transformer')
+        if strategy not in STRATEGIES:
+            raise DistinctException('strategy must be one of {}, not '
+                                    '{!r}'.format(', '.join(STRATEGIES),
+                                                  strategy))
+        if max_keys < 1:
+            raise DistinctException('max_keys must be at least 1')
+        self.key = key
+        self.strategy = strategy
+        if strategy == 'exact':
+            self.seen = ExactKeys(max_keys)
+        elif strategy == 'recent':
+            if seconds is None or seconds <= 0:
+                raise DistinctException('seconds must be greater than 0 for '
+                                        'the recent strategy')
+            self.seen = RecentKeys(seconds, max_keys, clock)
+        else:
+            if not 0 < error_rate < 1:
+                raise DistinctException('error_rate must be between 0 and 1')
+            self.seen = ApproximateKeys(max_keys, error_rate)
+
+    def is_new(self, value, **flags):
+        """
+        :return: True if the key of value has not been seen, in which case
+                 it is remembered, False otherwise
+        """
+        key = self.key(value, **flags)
+        try:
+            return self.seen.add(key)
+        except TypeError as e:
+            fail(DistinctException, flags, 'Key {!r} of {!r} is not hashable',
+                 (key, value), e)
+
+    def _distinct(self, values, flags):
+        for value in values:
+            if self.is_new(value, **flags):
+                yield value
+
+    def __call__(self, values, **flags):
+        return self._distinct(values, flags)
+
+    def stats(self):
+        """
+        :return: A dictionary of the number of values checked, the number of
+                 duplicates among them and their proportion, the number of
+                 keys remembered and the approximate number of bytes used to
+                 remember them, excluding the keys themselves
+        """
+        seen = self.seen
+        values = seen.added + seen.duplicates
+        rate = float(seen.duplicates) / values if values else 0.0
+        return {
+            'values': values,
+            'duplicates': seen.duplicates,
+            'duplicate_rate': rate,
+            'keys': len(seen),
+            'bytes': sys.getsizeof(seen),
+        }
+
+    def clear(self):
+        """
+        Forget every key seen and reset the statistics.
+        """
+        self.seen.clear()
+
+distinct = Distinct
+"""
+distinct is an alias for the Distinct class.
+"""
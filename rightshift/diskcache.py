@@ -0,0 +1,377 @@
+"""
+A persistent result cache for Transformers. This module requires Python
+3.5+.
+"""
+import pickle
+import sqlite3
+from threading import Lock, local
+import time
+from types import GeneratorType
+
+from future.utils import raise_from
+
+from rightshift import Chain, ChainTransformer, TransformationException
+from rightshift.fingerprints import fingerprint
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class DiskCacheException(TransformationException):
+    """
+    DiskCacheException is raised when a DiskCache cannot be created or its
+    database cannot be used.
+    """
+
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, '
+    'value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)',
+    'CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, '
+    'value INTEGER NOT NULL)',
+    "INSERT OR IGNORE INTO totals VALUES ('size', 0)",
+)
+
+ACCESS_BATCH = 256
+"""
+The number of hits after which a DiskStore writes the access times it holds
+in memory to the database in a single transaction.
+"""
+
+
+class DiskStore(object):
+    """
+    A DiskStore holds pickled results in an SQLite database, discarding the
+    least recently used results once their total size exceeds max_bytes. The
+    database may be shared by any number of threads and processes, each
+    thread using its own connection.
+
+    Rather than writing to the database on every hit, the access times of
+    the results returned are held in memory and written after every
+    ACCESS_BATCH hits, before results are evicted and when the store is
+    closed.
+    The access times held by other processes are not taken into account when
+    evicting results, so the least recently used order is approximate.
+    """
+    def __init__(self, path, max_bytes, timeout=30.0):
+        """
+        :param path: The path of the database file, which is created if
+                     necessary
+        :param max_bytes: The maximum total size of the pickled results
+        :param timeout: The number of seconds to wait for another process
+                        writing to the database
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = local()
+        self._connections = []
+        self._lock = Lock()
+        # The access times of the keys of hits not yet written
+        self._accessed = {}
+        self._unwritten = 0
+        self._write(lambda connection: [connection.execute(statement)
+                                        for statement in _SCHEMA])
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            try:
+                connection = sqlite3.connect(
+                    self.path, timeout=self.timeout, isolation_level=None,
+                    check_same_thread=False)
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute('PRAGMA synchronous=NORMAL')
+            except sqlite3.Error as e:
+                raise_from(DiskCacheException('Unable to open {!r}: {}'.format(
+                    self.path, e)), e)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _write(self, operation):
+        """
+        Perform operation with a connection within a write transaction.
+        """
+        connection = self._connection()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                result = operation(connection)
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        except sqlite3.Error as e:
+            raise_from(DiskCacheException(str(e)), e)
+        return result
+
+    def get(self, key):
+        """
+        :return: A (found, result) tuple
+        """
+        connection = self._connection()
+        try:
+            row = connection.execute('SELECT value FROM results WHERE key = ?',
+                                     (key,)).fetchone()
+        except sqlite3.Error as e:
+            raise_from(DiskCacheException(str(e)), e)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self._accessed[key] = time.time()
+            self._unwritten += 1
+            flush = self._unwritten >= ACCESS_BATCH
+        if flush:
+            self._write(self._update_accessed)
+        return True, pickle.loads(row[0])
+
+    def _update_accessed(self, connection):
+        """
+        Write the access times held in memory.
+        """
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+            self._unwritten = 0
+        if accessed:
+            connection.executemany('UPDATE results SET accessed = ? '
+                                   'WHERE key = ?',
+                                   [(when, key)
+                                    for key, when in accessed.items()])
+
+    def put(self, key, result):
+        """
+        Store result for key, discarding the least recently used results if
+        the total size is exceeded. Results that cannot be pickled or are
+        larger than max_bytes are not stored.
+        """
+        try:
+            value = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        if len(value) > self.max_bytes:
+            return
+        evicted = self._write(lambda connection: self._put(
+            connection, key, value))
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def _put(self, connection, key, value):
+        # Evictions are ordered by the access times of the hits held in
+        # memory as well
+        self._update_accessed(connection)
+        row = connection.execute('SELECT size FROM results WHERE key = ?',
+                                 (key,)).fetchone()
+        connection.execute('INSERT OR REPLACE INTO results '
+                           'VALUES (?, ?, ?, ?)',
+                           (key, sqlite3.Binary(value), len(value),
+                            time.time()))
+        connection.execute("UPDATE totals SET value = value + ? "
+                           "WHERE name = 'size'",
+                           (len(value) - (row[0] if row else 0),))
+        total, = connection.execute("SELECT value FROM totals "
+                                    "WHERE name = 'size'").fetchone()
+        evicted = 0
+        while total > self.max_bytes:
+            oldest = connection.execute(
+                'SELECT key, size FROM results ORDER BY accessed LIMIT 64'
+            ).fetchall()
+            if not oldest:
+                # The total disagrees with the stored results, such as after
+                # rows were deleted by other means, so it is recomputed
+                total, = connection.execute(
+                    'SELECT COALESCE(SUM(size), 0) FROM results').fetchone()
+                break
+            for old_key, size in oldest:
+                connection.execute('DELETE FROM results WHERE key = ?',
+                                   (old_key,))
+                total -= size
+                evicted += 1
+                if total <= self.max_bytes:
+                    break
+        connection.execute("UPDATE totals SET value = ? WHERE name = 'size'",
+                           (total,))
+        return evicted
+
+    def size(self):
+        """
+        :return: The total size of the stored results in bytes
+        """
+        row = self._connection().execute(
+            "SELECT value FROM totals WHERE name = 'size'").fetchone()
+        return row[0]
+
+    def clear(self):
+        """
+        Discard every stored result.
+        """
+        def clear(connection):
+            connection.execute('DELETE FROM results')
+            connection.execute("UPDATE totals SET value = 0 "
+                               "WHERE name = 'size'")
+        self._write(clear)
+
+    def close(self):
+        """
+        Write the access times held in memory and close the connections of
+        every thread. The store may still be used afterwards, in which case
+        new connections are opened.
+        """
+        if self._accessed:
+            self._write(self._update_accessed)
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = local()
+        for connection in connections:
+            connection.close()
+
+
+class DiskCacheChain(Chain):
+    """
+    A DiskCacheChain returns the results of left stored in a DiskStore,
+    calling left only for values for which no result is stored. It is
+    created by chaining a Transformer with a DiskCache:
+
+    enrich = item.url >> Wrap(fetch) >> Wrap(parse) >> disk_cache('enrich.db')
+
+    Results are keyed by the fingerprint of left together with that of the
+    value and flags it is called with, see rightshift.fingerprints. Changing
+    left therefore invalidates the results stored for it, which are never
+    returned again and are eventually evicted as the least recently used.
+    Likewise a number of DiskCacheChains may share a database.
+
+    Values or flags that cannot be fingerprinted are passed to left without
+    caching. Failures and generators are never cached. left must be
+    deterministic, and its results picklable, for caching to be worthwhile.
+    """
+    def __init__(self, left, path, max_bytes=1 << 30):
+        """
+        :param left: The Transformer whose results are cached
+        :param path: The path of the database file
+        :param max_bytes: The maximum total size of the pickled results.
+                          Defaults to 1 GiB.
+        :raise: DiskCacheException if left cannot be fingerprinted or the
+                database cannot be opened
+        """
+        super(DiskCacheChain, self).__init__(left, None)
+        self.path = path
+        self.max_bytes = max_bytes
+        try:
+            self._fingerprint = fingerprint(left)
+        except TypeError as e:
+            raise_from(DiskCacheException(str(e)), e)
+        self._store = DiskStore(path, max_bytes)
+
+    def __getstate__(self):
+        state = super(DiskCacheChain, self).__getstate__()
+        del state['_store']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._store = DiskStore(self.path, self.max_bytes)
+
+    def __lshift__(self, other):
+        return self.left >> other >> DiskCache(self.path, self.max_bytes)
+
+    def _key(self, value, flags):
+        """
+        :return: The key of the result for value and flags, or None if they
+                 cannot be fingerprinted
+        """
+        try:
+            return '{}:{}'.format(self._fingerprint,
+                                  fingerprint((value, flags)))
+        except TypeError:
+            return None
+
+    def __call__(self, value, **flags):
+        key = self._key(value, flags)
+        if key is None:
+            return self.left(value, **flags)
+        found, result = self._store.get(key)
+        if found:
+            return result
+        result = self.left(value, **flags)
+        if not isinstance(result, GeneratorType):
+            self._store.put(key, result)
+        return result
+
+    def batch(self, values, **flags):
+        """
+        The values for which no result is stored are passed to left as a
+        single batch.
+        """
+        values = list(values)
+        results = [None] * len(values)
+        missing = []
+        for index, value in enumerate(values):
+            key = self._key(value, flags)
+            found = False
+            if key is not None:
+                found, results[index] = self._store.get(key)
+            if not found:
+                missing.append((index, key))
+        if missing:
+            computed = self.left.batch([values[index] for index, _ in missing],
+                                       **flags)
+            for (index, key), result in zip(missing, computed):
+                results[index] = result
+                if key is not None and not isinstance(result, GeneratorType):
+                    self._store.put(key, result)
+        return results
+
+    def stats(self):
+        """
+        :return: A dictionary of the hits, misses and evictions of this
+                 DiskCacheChain and the total size of the stored results
+        """
+        store = self._store
+        return {
+            'hits': store.hits,
+            'misses': store.misses,
+            'evictions': store.evictions,
+            'size': store.size(),
+        }
+
+    def clear(self):
+        """
+        Discard every result stored in the database, including those of other
+        DiskCacheChains sharing it.
+        """
+        self._store.clear()
+
+    def close(self):
+        self._store.close()
+
+
+class DiskCache(ChainTransformer):
+    """
+    A DiskCache is chained with a Transformer in order to cache its results
+    on disk, returning a DiskCacheChain:
+
+    expensive >> disk_cache('results.db', max_bytes=100 * 1024 * 1024)
+    """
+    def __init__(self, path, max_bytes=1 << 30):
+        """
+        :param path: The path of the database file
+        :param max_bytes: The maximum total size of the pickled results.
+                          Defaults to 1 GiB.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def __call__(self, left):
+        return DiskCacheChain(left, self.path, self.max_bytes)
+
+disk_cache = DiskCache
+"""
+disk_cache is an alias for the DiskCache class.
+"""
@@ -1,7 +1,12 @@
-from future.utils import raise_from, with_metaclass
+import re
 
-from rightshift import Transformer, TransformationException, Chain
+from future.utils import with_metaclass
+
+from rightshift import Transformer, TransformationException, Chain, fail
+from rightshift.caches import LRUCache
 from rightshift.chains import IndexOrAccessToChainMixin
+from rightshift.intervals import IntervalIndex
+from rightshift.keywords import KeywordAutomaton
 from rightshift.magic import IndexOrAccessToInstantiate
 
 __author__ = 'adam.jorgensen.za@gmail.com'
@@ -21,6 +26,119 @@ class Extractor(Transformer):
     """
 
 
+_PATH_TOKEN = re.compile(r'''
+    \.?(?P<name>[^.\[\]\s]+)
+  | \[\s*(?:
+        (?P<index>-?\d+)
+      | (?P<quote>['"])(?P<key>.*?)(?P=quote)
+      | (?P<slice>-?\d*\s*:\s*-?\d*(?:\s*:\s*-?\d*)?)
+    )\s*\]
+''', re.VERBOSE)
+
+
+def _parse_path(path):
+    """
+    Parse a path expression into a tuple of (segment, determiner) pairs.
+
+    Dotted names produce IndexOrAccessToInstantiate.ATTR segments while
+    bracketed integers, quoted strings and slices produce
+    IndexOrAccessToInstantiate.ITEM segments:
+
+    _parse_path("a.b[0]['c'][1:2]") == (
+        ('a', 'attr'), ('b', 'attr'), (0, 'item'), ('c', 'item'),
+        (slice(1, 2), 'item')
+    )
+
+    :raise: ExtractorException if the path expression is invalid
+    """
+    segments = []
+    position = 0
+    while position < len(path):
+        match = _PATH_TOKEN.match(path, position)
+        # A name is preceded by a '.' unless it starts the path
+        if match is None or (match.group('name') is not None and
+                             (path[position] == '.') == (position == 0)):
+            raise ExtractorException('Invalid path expression {!r} at '
+                                     'position {}'.format(path, position))
+        if match.group('name') is not None:
+            segments.append((match.group('name'),
+                             IndexOrAccessToInstantiate.ATTR))
+        elif match.group('index') is not None:
+            segments.append((int(match.group('index')),
+                             IndexOrAccessToInstantiate.ITEM))
+        elif match.group('quote') is not None:
+            segments.append((match.group('key'),
+                             IndexOrAccessToInstantiate.ITEM))
+        else:
+            bounds = [int(bound) if bound.strip() else None
+                      for bound in match.group('slice').split(':')]
+            segments.append((slice(*bounds), IndexOrAccessToInstantiate.ITEM))
+        position = match.end()
+    if not segments:
+        raise ExtractorException('Empty path expression')
+    return tuple(segments)
+
+
+class Path(Extractor):
+    """
+    A Path is a compiled path expression. The path expression is parsed once
+    when the Path is instantiated and each segment is compiled into an
+    extractor of the class supplied. When called the extractors are applied
+    in turn, resulting in the same failure semantics as the equivalent chain
+    of extractors without the need to build the chain segment by segment.
+
+    Path instances are not usually created directly but rather by using the
+    path method available on the Item, Attribute and Object classes:
+
+    Item.path('payload.users[0].address.zip')
+    """
+    def __init__(self, path_expression, segment_class):
+        """
+        :param path_expression: A path expression string
+        :param segment_class: The extractor class used for each segment
+        """
+        self.path_expression = path_expression
+        self.extractors = tuple(
+            segment_class(segment, determiner)
+            for segment, determiner in _parse_path(path_expression)
+        )
+
+    def __call__(self, value, **flags):
+        """
+        :param value: The value to attempt extraction from
+        :param flags: A dictionary of flags
+        :return: The extracted value
+        :raise: ExtractorException
+        """
+        for extractor in self.extractors:
+            value = extractor(value, **flags)
+        return value
+
+
+path_cache = LRUCache(1024)
+"""
+The process-wide cache of compiled paths used by compile_path.
+"""
+
+
+def compile_path(segment_class, path_expression):
+    """
+    Return the compiled Path for path_expression using the _path_class of
+    segment_class. Compiled paths are retained in the process-wide
+    least recently used path_cache.
+
+    :param segment_class: The Item, Attribute or Object class to compile with
+    :param path_expression: A path expression string
+    :rtype: Path
+    """
+    key = (segment_class, path_expression)
+    compiled = path_cache.get(key)
+    if compiled is None:
+        compiled = segment_class._path_class(path_expression, segment_class)
+        path_cache.put(key, compiled)
+    return compiled
+
+
 class ItemMixin(IndexOrAccessToChainMixin):
     @staticmethod
     def __new__(cls, *more):
@@ -33,6 +151,12 @@ class ItemChain(Chain, ItemMixin):
     """
 
 
+class ItemPath(Path, ItemMixin):
+    """
+    A compiled path of Item extractors.
+    """
+
+
 class Item(with_metaclass(IndexOrAccessToInstantiate, Extractor, ItemMixin)):
     """
     An Item instances expects to be called with a value that will be
@@ -51,7 +175,9 @@ class Item(with_metaclass(IndexOrAccessToInstantiate, Extractor, ItemMixin)):
     Item['x']['y']
     Item[variable]
     Item[42]
+    Item.path('x.y[0]')
     """
+    _path_class = ItemPath
 
     def __init__(self, item_or_slice, _):
         """
@@ -69,7 +195,7 @@ class Item(with_metaclass(IndexOrAccessToInstantiate, Extractor, ItemMixin)):
         try:
             return value[self.item_or_slice]
         except Exception as e:
-            raise_from(ExtractorException, e)
+            fail(ExtractorException, flags, cause=e)
 
 
 item = Item
@@ -91,6 +217,12 @@ class AttributeChain(Chain, AttributeMixin):
     """
 
 
+class AttributePath(Path, AttributeMixin):
+    """
+    A compiled path of Attribute extractors.
+    """
+
+
 class Attribute(with_metaclass(IndexOrAccessToInstantiate, Extractor, AttributeMixin)):
     """
     An Attribute instance can be called with a value in order to
@@ -108,7 +240,9 @@ class Attribute(with_metaclass(IndexOrAccessToInstantiate, Extractor, AttributeM
     Attribute.x.y
     Attribute['x']['y']
     Attribute[variable]
+    Attribute.path('x.y')
     """
+    _path_class = AttributePath
 
     def __init__(self, attribute, _):
         """
@@ -126,7 +260,8 @@ class Attribute(with_metaclass(IndexOrAccessToInstantiate, Extractor, AttributeM
         if hasattr(value, self.attribute):
             return getattr(value, self.attribute)
         else:
-            raise ExtractorException('{} has no attribute `{}`'.format(value, self.attribute))
+            fail(ExtractorException, flags, '{} has no attribute `{}`',
+                 (value, self.attribute))
 
 attr = prop = Attribute
 """
@@ -147,6 +282,12 @@ class ObjectChain(Chain, ObjectMixin):
     pass
 
 
+class ObjectPath(Path, ObjectMixin):
+    """
+    A compiled path of Object extractors
+    """
+
+
 class Object(with_metaclass(IndexOrAccessToInstantiate, Extractor, ObjectMixin)):
     """
     An Object instance can be called with a value in order to retrieve an item,
@@ -157,7 +298,11 @@ class Object(with_metaclass(IndexOrAccessToInstantiate, Extractor, ObjectMixin))
     with Attribute and Item the indexing and attribute addressing methods may
     be freely mixed, with this class the addressing method determines whether
     the Item or Attribute class is used to extract data.
+
+    The same applies to path expressions: Object.path('x[0]') extracts the
+    attribute x and then the item 0 of that attribute.
     """
+    _path_class = ObjectPath
 
     def __init__(self, item_or_attribute, determiner):
         self.attribute = item_or_attribute
@@ -169,8 +314,8 @@ class Object(with_metaclass(IndexOrAccessToInstantiate, Extractor, ObjectMixin))
             return Attribute.__call__(self, value, **flags)
         elif self.determiner == IndexOrAccessToInstantiate.ITEM:
             return Item.__call__(self, value, **flags)
-        raise ExtractorException('self.determiner is not a valid value: '
-                                 '{}'.format(self.determiner))
+        fail(ExtractorException, flags,
+             'self.determiner is not a valid value: {}', (self.determiner,))
 
 
 obj = Object
@@ -183,13 +328,20 @@ class PatternGroup(Extractor):
     """
     A PatternGroup can be called with a string in order to attempt to extract a
     new string from that string using a regular expression.
+
+    A PatternGroup instantiated with a bytes pattern may be called with any
+    bytes-like object supported by the re module, including bytearray,
+    memoryview and mmap instances, without copying or decoding the value. Only
+    the extracted group is copied and, if an encoding is supplied, decoded.
     """
-    def __init__(self, pattern, group=1, search=True):
+    def __init__(self, pattern, group=1, search=True, encoding=None):
         """
         :param pattern: A string or compiled Regular Expression pattern
         :param group: A string or numeric group value
         :param search: A boolean value indicating whether the search or match
                        method should be used
+        :param encoding: An optional encoding used to decode the extracted
+                         group when matching against bytes-like values
         """
         from past.builtins import basestring
         if isinstance(pattern, basestring):
@@ -198,6 +350,7 @@ class PatternGroup(Extractor):
         self.pattern = pattern
         self.group = group
         self.search = search
+        self.encoding = encoding
 
     def __call__(self, value, **flags):
         try:
@@ -205,9 +358,13 @@ class PatternGroup(Extractor):
             match = method(value)
             if match is None:
                 raise ExtractorException
-            return match.group(flags.get('pattern_group__group', self.group))
+            group = match.group(flags.get('pattern_group__group', self.group))
+            encoding = flags.get('pattern_group__encoding', self.encoding)
+            if encoding is not None and group is not None:
+                group = group.decode(encoding)
+            return group
         except Exception as e:
-            raise_from(ExtractorException, e)
+            fail(ExtractorException, flags, cause=e)
 
 pattern_group = PatternGroup
 """
@@ -231,14 +388,130 @@ class CoerceTo(Extractor):
         try:
             value = self.coercer(value)
             if not isinstance(value, self.type):
-                raise ExtractorException('Unable to coerce {} to {}'.format(
-                    value, self.type))
+                fail(ExtractorException, flags, 'Unable to coerce {} to {}',
+                     (value, self.type))
         except ExtractorException:
             raise
         except Exception as e:
-            raise_from(ExtractorException, e)
+            fail(ExtractorException, flags, cause=e)
         return value
 
 coerce_to = CoerceTo
 
 
+class RangeLabel(Extractor):
+    """
+    A RangeLabel returns the label of the range containing the value it is
+    called with, using an IntervalIndex to find the range in O(log n) time
+    regardless of the number of ranges:
+
+    RangeLabel([(0, 10, 'low'), (10, 100, 'medium')], closed='left')
+
+    If ranges overlap the label of the first range containing the value is
+    returned, or if all_labels is True a list of the labels of every range
+    containing the value in the order the ranges were given.
+
+    If no range contains the value an ExtractorException is raised, allowing
+    RangeLabel to be combined with Default and Detupling.
+    """
+    def __init__(self, ranges, closed='neither', all_labels=False):
+        """
+        :param ranges: An iterable of (lower, upper, label) tuples. For
+                       (lower, upper) tuples the label is the tuple itself.
+        :param closed: One of 'neither', 'left', 'right' or 'both'
+        :param all_labels: Defaults to False
+        """
+        try:
+            index = IntervalIndex(ranges, closed)
+        except (TypeError, ValueError) as e:
+            raise ExtractorException('Invalid ranges: {}'.format(e))
+        self.ranges = index.ranges
+        self.closed = closed
+        self.all_labels = all_labels
+        self._index = index
+
+    def __call__(self, value, **flags):
+        try:
+            if self.all_labels:
+                found = self._index.find_all(value)
+                if found:
+                    return [self._index.label(index) for index in found]
+            else:
+                found = self._index.find(value)
+                if found >= 0:
+                    return self._index.label(found)
+        except TypeError as e:
+            fail(ExtractorException, flags, cause=e)
+        fail(ExtractorException, flags, 'No range contains {}', (value,))
+
+    def batch(self, values, **flags):
+        """
+        Sorted values and NumPy arrays are matched against the ranges in bulk.
+        """
+        if self.all_labels:
+            return super(RangeLabel, self).batch(values, **flags)
+        if type(values).__module__ != 'numpy':
+            values = list(values)
+        try:
+            found = self._index.find_many(values)
+        except TypeError as e:
+            fail(ExtractorException, flags, cause=e)
+        if -1 in found:
+            fail(ExtractorException, flags, 'No range contains {}',
+                 (values[found.index(-1)],))
+        return [self._index.label(index) for index in found]
+
+range_label = RangeLabel
+"""
+range_label is an alias for the RangeLabel class.
+"""
+
+
+class FindKeywords(Extractor):
+    """
+    A FindKeywords extractor returns the keyword found in the value it is
+    called with, using a KeywordAutomaton to search for every keyword in a
+    single pass over the value:
+
+    FindKeywords(['ERROR', 'WARNING', 'timeout'])
+
+    The keyword returned is the one whose first occurrence ends first, the
+    longest being chosen if several end at the same position. If
+    all_matches is True a list of every occurrence of a keyword, in the
+    order the occurrences end, is returned instead.
+
+    If no keyword is found an ExtractorException is raised, allowing
+    FindKeywords to be combined with Default and Detupling.
+    """
+    def __init__(self, keywords, all_matches=False):
+        """
+        :param keywords: An iterable of strings or of bytes
+        :param all_matches: Defaults to False
+        """
+        try:
+            automaton = KeywordAutomaton(keywords)
+        except TypeError as e:
+            raise ExtractorException('Invalid keywords: {}'.format(e))
+        self.keywords = automaton.keywords
+        self.all_matches = all_matches
+        self._automaton = automaton
+
+    def __call__(self, value, **flags):
+        try:
+            if self.all_matches:
+                found = self._automaton.find_all(value)
+                if found:
+                    return [self.keywords[index] for _, index in found]
+            else:
+                found = self._automaton.find_first(value)
+                if found is not None:
+                    return self.keywords[found[1]]
+        except TypeError as e:
+            fail(ExtractorException, flags, 'Cannot search {!r} for keywords',
+                 (value,), cause=e)
+        fail(ExtractorException, flags, 'No keyword found in {}', (value,))
+
+find_keywords = FindKeywords
+"""
+find_keywords is an alias for the FindKeywords class.
+"""
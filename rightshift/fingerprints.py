@@ -0,0 +1,143 @@
+"""
+Stable fingerprints of Transformer graphs. This module requires Python 3.5+.
+"""
+from functools import partial
+import hashlib
+import re
+from types import (BuiltinFunctionType, CodeType, FunctionType, MethodType,
+                   ModuleType)
+
+from rightshift import Transformer
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+_PATTERN_TYPE = type(re.compile(''))
+
+
+def _name(value):
+    return '{}.{}'.format(getattr(value, '__module__', None),
+                          getattr(value, '__qualname__', value.__name__))
+
+
+def _attributes(value):
+    """
+    :return: The public attributes of value, as used by Transformer equality
+    """
+    attributes = getattr(value, '__dict__', {})
+    return sorted((name, attributes[name]) for name in attributes
+                  if not name.startswith('_'))
+
+
+class _Encoder(object):
+    """
+    Encodes values into a canonical byte string that, unlike hash(), does not
+    vary between processes or runs.
+    """
+    def __init__(self):
+        self.digests = {}
+        self.active = set()
+
+    def encode(self, value):
+        if value is None or isinstance(value, (bool, int, float, complex)):
+            return '{}:{!r}'.format(type(value).__name__, value).encode()
+        if isinstance(value, str):
+            return b'str:' + value.encode('utf-8', 'surrogatepass')
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return b'bytes:' + bytes(value)
+        key = id(value)
+        if key in self.digests:
+            return self.digests[key]
+        if key in self.active:
+            raise TypeError('Cannot fingerprint the self-referencing '
+                            '{!r}'.format(value))
+        self.active.add(key)
+        try:
+            encoded = self._encode_object(value)
+        finally:
+            self.active.discard(key)
+        if isinstance(value, Transformer):
+            # Shared sub-graphs are encoded once
+            self.digests[key] = encoded = hashlib.sha256(encoded).digest()
+        return encoded
+
+    def _sequence(self, tag, values):
+        parts = [self.encode(value) for value in values]
+        return b''.join([tag.encode(), b'(', str(len(parts)).encode()] +
+                        [b'%d:%s' % (len(part), part) for part in parts] +
+                        [b')'])
+
+    def _encode_object(self, value):
+        if isinstance(value, Transformer):
+            attributes = []
+            for name, attribute in _attributes(value):
+                if (isinstance(attribute, MethodType) and
+                        attribute.__self__ is value):
+                    attribute = attribute.__func__
+                attributes.append((name, attribute))
+            return self._sequence('transformer', [type(value)] + attributes)
+        fingerprint = getattr(type(value), '_fingerprint', None)
+        if fingerprint is not None:
+            return self._sequence(_name(type(value)), [fingerprint(value)])
+        if isinstance(value, (list, tuple)):
+            return self._sequence(type(value).__name__, value)
+        if isinstance(value, dict):
+            items = sorted(self._sequence('item', item)
+                           for item in value.items())
+            return self._sequence('dict', items)
+        if isinstance(value, (set, frozenset)):
+            return self._sequence(type(value).__name__,
+                                  sorted(self.encode(item) for item in value))
+        if isinstance(value, slice):
+            return self._sequence('slice', (value.start, value.stop,
+                                            value.step))
+        if isinstance(value, type):
+            return b'type:' + _name(value).encode()
+        if isinstance(value, _PATTERN_TYPE):
+            return self._sequence('pattern', (value.pattern, value.flags))
+        if isinstance(value, FunctionType):
+            closure = [cell.cell_contents for cell in value.__closure__ or ()]
+            return self._sequence('function', (
+                _name(value), value.__code__, value.__defaults__, closure))
+        if isinstance(value, CodeType):
+            # The names, constants and bytecode determine the behaviour of
+            # the code, while line numbers are ignored
+            return self._sequence('code', (
+                value.co_code, value.co_consts, value.co_names,
+                value.co_varnames, value.co_freevars))
+        if isinstance(value, BuiltinFunctionType):
+            owner = getattr(value, '__self__', None)
+            if owner is None or isinstance(owner, ModuleType):
+                return b'builtin:' + _name(value).encode()
+            return self._sequence('method', (owner, _name(value)))
+        if isinstance(value, MethodType):
+            return self._sequence('method', (value.__self__, value.__func__))
+        if isinstance(value, partial):
+            return self._sequence('partial', (value.func, value.args,
+                                              value.keywords))
+        if hasattr(value, '__dict__'):
+            return self._sequence('object', [type(value)] +
+                                  _attributes(value))
+        raise TypeError('Cannot fingerprint {!r}'.format(value))
+
+
+def fingerprint(value):
+    """
+    Compute a fingerprint of value that is stable between processes and
+    runs, unlike hash(). Transformers are fingerprinted structurally,
+    consistently with Transformer equality, so equal Transformers have equal
+    fingerprints and changing any part of a Transformer graph changes its
+    fingerprint.
+
+    Functions, such as those wrapped by Wrap, are fingerprinted by name,
+    bytecode, constants, defaults and closure. Changes to the globals or
+    other functions they call are not detected. Other objects are
+    fingerprinted by type and public attributes, unless their type defines a
+    _fingerprint method returning the value to fingerprint in their place.
+
+    :param value: A Transformer or a value composed of numbers, strings,
+                  bytes, containers and objects with public attributes
+    :return: A hexadecimal SHA-256 digest
+    :raise: TypeError if value contains an object that cannot be
+            fingerprinted
+    """
+    return hashlib.sha256(_Encoder().encode(value)).hexdigest()
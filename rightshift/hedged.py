@@ -0,0 +1,213 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock
+import time
+
+from rightshift import Detupling, fail, TransformationException
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class AlternativeStats(object):
+    """
+    Latency statistics for one of the transformers of a HedgedDetupling.
+    Latencies are measured from when the transformer is started until it
+    completes, with the most recent samples latencies retained in order to
+    compute percentiles.
+    """
+    def __init__(self, samples=1024):
+        self.started = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._latencies = deque(maxlen=samples)
+        self._lock = Lock()
+
+    def start(self):
+        with self._lock:
+            self.started += 1
+
+    def complete(self, latency, succeeded):
+        with self._lock:
+            if succeeded:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self._latencies.append(latency)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled += 1
+
+    def percentile(self, percentile):
+        """
+        :param percentile: A percentile between 0 and 100
+        :return: The latency at percentile of the retained samples, or None if
+                 there are none
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        index = int(round(percentile / 100.0 * (len(latencies) - 1)))
+        return latencies[index]
+
+    def as_dict(self):
+        completed = self.succeeded + self.failed
+        mean_latency = self.total_latency / completed if completed else None
+        return {
+            'started': self.started,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'mean_latency': mean_latency,
+            'p50_latency': self.percentile(50),
+            'p99_latency': self.percentile(99),
+            'max_latency': self.max_latency,
+        }
+
+
+class HedgedDetupling(Detupling):
+    """
+    A HedgedDetupling returns the same result as a Detupling, being the result
+    of the first of its transformers, in order, that succeeds. However rather
+    than waiting for each transformer to fail before calling the next, the
+    next transformer is started in a thread once hedge_delay seconds have
+    passed without a result. This bounds the latency of a chain of slow
+    alternatives, such as a cache, a secondary store and a recomputation, by
+    the latency of the alternative that succeeds rather than the sum of the
+    latencies of those that miss.
+
+    A transformer is started immediately when all those started before it
+    have failed. The result of a transformer is only used once all the
+    transformers preceding it have failed, so a hedge never changes the
+    result. Once a result is chosen transformers that have not yet started
+    are cancelled; those already running cannot be interrupted and run to
+    completion in the background.
+
+    Latency statistics for each transformer are available from stats(). The
+    asyncio equivalent of calling a HedgedDetupling is
+    rightshift.aio.acall.
+    """
+    def __init__(self, transformers, hedge_delay=0.05, max_workers=None,
+                 samples=1024):
+        """
+        :param transformers: The transformers in priority order
+        :param hedge_delay: The number of seconds to wait for a result before
+                            starting the next transformer
+        :param max_workers: The maximum number of threads used. Defaults to
+                            the ThreadPoolExecutor default.
+        :param samples: The number of latencies retained per transformer
+        """
+        super(HedgedDetupling, self).__init__(transformers)
+        if hedge_delay < 0:
+            raise TransformationException('hedge_delay must not be negative')
+        self.hedge_delay = hedge_delay
+        self.max_workers = max_workers
+        self.samples = samples
+        self._executor = None
+        self._lock = Lock()
+        self._stats = [AlternativeStats(samples) for _ in self.transformers]
+
+    def __getstate__(self):
+        state = super(HedgedDetupling, self).__getstate__()
+        del state['_executor'], state['_lock'], state['_stats']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._executor = None
+        self._lock = Lock()
+        self._stats = [AlternativeStats(self.samples)
+                       for _ in self.transformers]
+
+    def stats(self):
+        """
+        :return: A list containing a dictionary of statistics per transformer
+        """
+        return [stats.as_dict() for stats in self._stats]
+
+    def close(self):
+        """
+        Shut down the threads used by the HedgedDetupling. It may still be
+        called afterwards, in which case new threads are started.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers)
+            return self._executor
+
+    def _timed(self, index, value, flags):
+        """
+        :return: A callable calling the transformer at index with value and
+                 recording its latency
+        """
+        stats = self._stats[index]
+        transformer = self.transformers[index]
+
+        def call():
+            start = time.time()
+            try:
+                result = transformer(value, **flags)
+            except BaseException:
+                stats.complete(time.time() - start, False)
+                raise
+            stats.complete(time.time() - start, True)
+            return result
+        stats.start()
+        return call
+
+    def _cancel(self, index, future):
+        if future.cancel():
+            self._stats[index].cancel()
+
+    def __call__(self, value, **flags):
+        executor = self._get_executor()
+        futures = []
+        next_start = 0
+        try:
+            while True:
+                all_failed = True
+                for future in futures:
+                    if not future.done():
+                        all_failed = False
+                        break
+                    error = future.exception()
+                    if error is None:
+                        return future.result()
+                    if not isinstance(error, TransformationException):
+                        raise error
+                started = len(futures)
+                if started < len(self.transformers) and (
+                        all_failed or time.time() >= next_start):
+                    futures.append(executor.submit(
+                        self._timed(started, value, flags)))
+                    next_start = time.time() + self.hedge_delay
+                    continue
+                if all_failed:
+                    fail(TransformationException, flags,
+                         'Failed to detuple {}', (value,))
+                timeout = None
+                if started < len(self.transformers):
+                    timeout = max(0, next_start - time.time())
+                wait([future for future in futures if not future.done()],
+                     timeout, FIRST_COMPLETED)
+        finally:
+            for index, future in enumerate(futures):
+                self._cancel(index, future)
+
+
+hedged_detupling = HedgedDetupling
+"""
+hedged_detupling is an alias for the HedgedDetupling class.
+"""
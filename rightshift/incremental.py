@@ -0,0 +1,190 @@
+from copy import deepcopy
+from threading import Lock
+
+from past.builtins import basestring
+
+from rightshift import Record, Transformer, TransformationException, Tupling
+from rightshift.extractors import _parse_path
+from rightshift.paths import item_paths
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+def diff_paths(old, new, path=()):
+    """
+    Compare two documents built of dictionaries and lists and return the set
+    of item paths at which they differ. Dictionaries are compared key by key
+    and lists index by index, any other values are compared using ==.
+
+    Example:
+
+    diff_paths({'a': 1, 'b': [1, 2]}, {'a': 1, 'b': [1, 3]}) == {('b', 1)}
+
+    :param old: The previous document
+    :param new: The current document
+    :return: A set of item paths
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = set()
+        for key in old:
+            if key not in new:
+                changed.add(path + (key,))
+        for key, value in new.items():
+            if key not in old:
+                changed.add(path + (key,))
+            else:
+                changed.update(diff_paths(old[key], value, path + (key,)))
+        return changed
+    if isinstance(old, list) and isinstance(new, list):
+        changed = set()
+        for index in range(max(len(old), len(new))):
+            if index >= len(old) or index >= len(new):
+                changed.add(path + (index,))
+            else:
+                changed.update(diff_paths(old[index], new[index],
+                                          path + (index,)))
+        return changed
+    if type(old) is not type(new) or old != new:
+        return {path}
+    return set()
+
+
+def _overlaps(path, other):
+    """
+    Two paths overlap when one is a prefix of the other.
+    """
+    length = min(len(path), len(other))
+    return path[:length] == other[:length]
+
+
+_NO_SNAPSHOT = object()
+"""
+Marks that no copy of the previous document is retained for diff_paths.
+"""
+
+
+def _to_path(path):
+    if isinstance(path, basestring):
+        return tuple(segment for segment, _ in _parse_path(path))
+    return tuple(path)
+
+
+class Incremental(object):
+    """
+    An Incremental evaluates the branches of a Tupling, or the fields of a
+    Record, against a document and retains their outputs. When evaluated
+    again against an updated document only the branches that read the parts
+    of the document that changed are re-evaluated; the previous outputs of
+    the remaining branches are re-used.
+
+    The paths each branch reads are determined using
+    rightshift.paths.item_paths. The changed paths may be supplied as tuples
+    of keys or path expression strings, or are otherwise determined by
+    comparing the document with the previous one using diff_paths.
+
+    Example:
+
+    projection = Incremental(item.meta.id & item.body >> Wrap(expensive))
+    projection.evaluate(document)
+    projection.evaluate(updated_document, changed_paths=['meta.id'])
+
+    The branches must be pure functions of the document and flags for the
+    re-used outputs to be correct. Every branch is evaluated when the flags
+    differ from those of the previous evaluation.
+
+    When changed_paths is not supplied a deep copy of the document is
+    retained for comparison with the next document, so a document may be
+    updated in place between evaluations. Taking the copy costs time in
+    proportion to the size of the document, so callers updating large
+    documents should supply changed_paths on every evaluation, including the
+    first, such as changed_paths=(). No copy is then taken, and an evaluation
+    without changed_paths that follows one with them evaluates every branch.
+
+    Evaluation is serialized by a lock so that an Incremental may be shared
+    by threads.
+    """
+    def __init__(self, transformer):
+        """
+        :param transformer: A Tupling or Record, or any other Transformer
+                            which is then treated as a single branch
+        """
+        self._record = None
+        if isinstance(transformer, Record):
+            self._record = transformer
+        if isinstance(transformer, (Tupling, Record)):
+            branches = list(transformer.transformers)
+        elif isinstance(transformer, Transformer):
+            branches = [transformer]
+        else:
+            raise TransformationException('{} is not a Transformer'.format(
+                transformer))
+        self.branches = branches
+        self.dependencies = [item_paths(branch) for branch in branches]
+        self.reevaluated = []
+        """
+        The indices of the branches evaluated by the last call to evaluate.
+        """
+        self._document = _NO_SNAPSHOT
+        self._flags = None
+        self._outputs = None
+        self._lock = Lock()
+
+    def reset(self):
+        """
+        Discard the retained outputs so that the next evaluation evaluates
+        every branch.
+        """
+        with self._lock:
+            self._document = _NO_SNAPSHOT
+            self._outputs = None
+
+    def affected(self, changed_paths):
+        """
+        :param changed_paths: An iterable of changed paths
+        :return: The indices of the branches that read any of changed_paths
+        """
+        changed_paths = [_to_path(path) for path in changed_paths]
+        return [
+            index for index, dependencies in enumerate(self.dependencies)
+            if any(_overlaps(dependency, changed)
+                   for dependency in dependencies
+                   for changed in changed_paths)
+        ]
+
+    def evaluate(self, document, changed_paths=None, **flags):
+        """
+        :param document: The current document
+        :param changed_paths: An optional iterable of the paths that changed
+                              since the previous evaluation. If supplied the
+                              document is not copied.
+        :param flags: Flags to call the branches with
+        :return: A list containing the output of each branch, or a record
+                 if the Incremental was created with a Record
+        """
+        with self._lock:
+            if (self._outputs is None or flags != self._flags or
+                    (changed_paths is None and
+                     self._document is _NO_SNAPSHOT)):
+                indices = range(len(self.branches))
+            elif changed_paths is None:
+                indices = self.affected(diff_paths(self._document, document))
+            else:
+                indices = self.affected(changed_paths)
+            outputs = list(self._outputs or [None] * len(self.branches))
+            try:
+                for index in indices:
+                    outputs[index] = self.branches[index](document, **flags)
+            except BaseException:
+                self._document = _NO_SNAPSHOT
+                self._outputs = None
+                raise
+            if changed_paths is None:
+                self._document = deepcopy(document)
+            else:
+                self._document = _NO_SNAPSHOT
+            self._flags = flags
+            self._outputs = outputs
+            self.reevaluated = list(indices)
+            if self._record is not None:
+                return self._record._make(outputs)
+            return list(outputs)
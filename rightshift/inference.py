@@ -0,0 +1,405 @@
+import operator
+import sys
+
+from rightshift import (Chain, Detupling, Identity, Record,
+                        TransformationException, Transformer, Tupling, Value)
+from rightshift.chains import DefaultChain, FlagsChain
+from rightshift.conditionals import (BooleanCondition, BreakIfCondition,
+                                     BreakIfNotCondition, WhenBooleanCondition,
+                                     WhenNotBooleanCondition)
+from rightshift.extractors import CoerceTo, Item, Object, Path
+from rightshift.magic import IndexOrAccessToInstantiate
+from rightshift.matchers import (EqualTo, GreaterThan, GreaterThanEqualTo,
+                                 IsInstance, LessThan, LessThanEqualTo,
+                                 Matcher, Must, MustNot, NotEqualTo, Should)
+from rightshift.operations import (absolute, AddOperation, DivideOperation,
+                                   invert, LogicalNotOperation,
+                                   MultiplyOperation, negate, positive,
+                                   SubtractOperation)
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+ANY = object
+"""
+The type spec of a value about which nothing is known.
+"""
+
+_NUMBERS = (int, float)
+_TRUE_DIVISION = sys.version_info[0] >= 3
+
+_EXACT_COERCIONS = (bool, int, float, complex)
+"""
+Types whose constructors always return an instance of exactly that type.
+Other coercers may return an instance of a subclass, which CoerceTo accepts.
+"""
+
+
+def sample_type(values):
+    """
+    Derive a type spec from a number of example values.
+
+    A type spec is either a type, which is taken to be the exact type of the
+    value, a dictionary mapping keys to type specs describing a dictionary
+    with at least those keys, a list containing a single type spec describing
+    a list of such values, or ANY.
+
+    Examples:
+
+    sample_type([1, 2]) == int
+    sample_type([{'a': 1.0, 'b': 'x'}, {'a': 2.0}]) == {'a': float}
+    sample_type([[1, 2], [3]]) == [int]
+
+    :param values: An iterable of example values
+    :return: A type spec
+    """
+    spec = None
+    for value in values:
+        if isinstance(value, dict):
+            value_spec = dict((key, sample_type([item]))
+                              for key, item in value.items())
+        elif isinstance(value, list):
+            value_spec = [sample_type(value)] if value else [ANY]
+        else:
+            value_spec = type(value)
+        spec = value_spec if spec is None else _union(spec, value_spec)
+    return ANY if spec is None else spec
+
+
+def _union(spec, other):
+    if spec == other:
+        return spec
+    if isinstance(spec, dict) and isinstance(other, dict):
+        return dict((key, _union(spec[key], other[key]))
+                    for key in spec if key in other)
+    if isinstance(spec, list) and isinstance(other, list):
+        return [_union(spec[0], other[0])]
+    return ANY
+
+
+def _type_of(spec):
+    if isinstance(spec, dict):
+        return dict
+    if isinstance(spec, list):
+        return list
+    return spec
+
+
+def _item_type(spec, key):
+    if isinstance(spec, dict) and key in spec:
+        return spec[key]
+    if isinstance(spec, list) and isinstance(key, int):
+        return spec[0]
+    if isinstance(spec, list) and isinstance(key, slice):
+        return spec
+    return ANY
+
+
+def _arithmetic_type(spec, values, division=False):
+    types = [spec] + [type(value) for value in values]
+    if not all(t in _NUMBERS for t in types):
+        return ANY
+    if float in types or (division and _TRUE_DIVISION):
+        return float
+    return int
+
+
+class NumericComparison(Matcher):
+    """
+    A NumericComparison is a specialized replacement for one of the
+    LessThan, LessThanEqualTo, EqualTo, NotEqualTo, GreaterThanEqualTo or
+    GreaterThan comparisons that is used by specialize when both the input
+    and the compared value are known to be ints or floats. Such comparisons
+    always return a bool and never raise an exception, thus the flag lookups,
+    exception handling and bool conversion of Comparison are skipped.
+    """
+    def __init__(self, comparator, value):
+        """
+        :param comparator: A function from the operator module
+        :param value: The value to compare with
+        """
+        self.comparator = comparator
+        self.value = value
+
+    def __call__(self, value, **flags):
+        return self.comparator(value, self.value)
+
+
+class ConstantMatcher(Matcher):
+    """
+    A ConstantMatcher is used by specialize to replace matchers with an
+    outcome that is known in advance.
+    """
+    def __init__(self, result):
+        self.result = result
+
+    def __call__(self, value, **flags):
+        return self.result
+
+
+_COMPARATORS = {
+    LessThan: operator.lt,
+    LessThanEqualTo: operator.le,
+    EqualTo: operator.eq,
+    NotEqualTo: operator.ne,
+    GreaterThanEqualTo: operator.ge,
+    GreaterThan: operator.gt,
+}
+
+# The unary operations are bound to instances of their classes in
+# rightshift.operations, so their classes are taken from the instances
+_SAME_NUMBER_OPERATIONS = (type(negate), type(positive), type(absolute))
+_INVERT_OPERATION = type(invert)
+
+
+def _infer(transformer, spec, record):
+    """
+    Infer the output type spec of transformer given its input type spec,
+    appending a (transformer, input spec, output spec) tuple to record for
+    transformer and every transformer nested within it.
+    """
+    index = len(record)
+    record.append(None)
+    result = _infer_node(transformer, spec, record)
+    record[index] = (transformer, spec, result)
+    return result
+
+
+def _infer_node(transformer, spec, record):
+    if transformer is Identity:
+        return spec
+    if isinstance(transformer, Value):
+        return type(transformer.value)
+    if isinstance(transformer, Object):
+        if transformer.determiner == IndexOrAccessToInstantiate.ITEM:
+            return _item_type(spec, transformer.item_or_slice)
+        return ANY
+    if isinstance(transformer, Item):
+        return _item_type(spec, transformer.item_or_slice)
+    if isinstance(transformer, Path):
+        for extractor in transformer.extractors:
+            spec = _infer(extractor, spec, record)
+        return spec
+    if isinstance(transformer, FlagsChain):
+        return _infer(transformer.left, spec, record)
+    if isinstance(transformer, DefaultChain):
+        return _union(_infer(transformer.left, spec, record),
+                      type(transformer.default))
+    if isinstance(transformer, Chain) and transformer.right is None:
+        # Other Chains without a right, such as DiskCacheChain, return the
+        # results of left
+        return _infer(transformer.left, spec, record)
+    if isinstance(transformer, Chain):
+        return _infer(transformer.right,
+                      _infer(transformer.left, spec, record), record)
+    if isinstance(transformer, Tupling):
+        for child in transformer.transformers:
+            _infer(child, spec, record)
+        return ANY if transformer.generator else list
+    if isinstance(transformer, Record):
+        for child in transformer.transformers:
+            _infer(child, spec, record)
+        if transformer.output == 'dict':
+            return dict
+        return transformer.record_class or tuple
+    if isinstance(transformer, Detupling):
+        result = None
+        for child in transformer.transformers:
+            child_spec = _infer(child, spec, record)
+            result = child_spec if result is None else _union(result,
+                                                              child_spec)
+        return ANY if result is None else result
+    if isinstance(transformer, (Must, Should, MustNot)):
+        for child in transformer.matchers:
+            _infer(child, spec, record)
+        return bool
+    if isinstance(transformer, BooleanCondition):
+        _infer(transformer.matcher, spec, record)
+        return _union(_infer(transformer.then_transformer, spec, record),
+                      _infer(transformer.otherwise_transformer, spec, record))
+    if isinstance(transformer, Matcher):
+        return bool
+    if isinstance(transformer, CoerceTo):
+        if (transformer.type in _EXACT_COERCIONS and
+                transformer.coercer is transformer.type):
+            return transformer.type
+        return ANY
+    if isinstance(transformer, (AddOperation, SubtractOperation,
+                                MultiplyOperation)):
+        return _arithmetic_type(spec, transformer.values)
+    if isinstance(transformer, DivideOperation):
+        return _arithmetic_type(spec, transformer.values, division=True)
+    if isinstance(transformer, _SAME_NUMBER_OPERATIONS):
+        return spec if spec in _NUMBERS else ANY
+    if isinstance(transformer, _INVERT_OPERATION):
+        return int if spec is int else ANY
+    if isinstance(transformer, LogicalNotOperation):
+        return bool
+    return ANY
+
+
+def infer_types(transformer, spec=ANY):
+    """
+    Propagate a declared or sampled input type spec through a transformer
+    graph. See sample_type for a description of type specs.
+
+    :param transformer: A Transformer instance
+    :param spec: The type spec of the values transformer will be called with
+    :return: A list of (transformer, input spec, output spec) tuples for
+             transformer and each transformer nested within it, in the order
+             they are visited
+    """
+    record = []
+    _infer(transformer, spec, record)
+    return record
+
+
+def output_type(transformer, spec=ANY):
+    """
+    :param transformer: A Transformer instance
+    :param spec: The type spec of the values transformer will be called with
+    :return: The type spec of the values transformer returns
+    """
+    return infer_types(transformer, spec)[0][2]
+
+
+_DECISIVE = {Must: False, Should: True, MustNot: True}
+"""
+The matcher result that causes each boolean matcher to stop evaluating.
+"""
+
+
+def _specialize_matchers(transformer, spec):
+    matcher_class = type(transformer)
+    decisive = _DECISIVE[matcher_class]
+    remaining = []
+    for matcher in transformer.matchers:
+        matcher = _specialize(matcher, spec)[0]
+        if isinstance(matcher, ConstantMatcher):
+            if matcher.result is not decisive:
+                continue
+            if not remaining:
+                return ConstantMatcher(matcher_class is Should)
+            # Matchers before the constant may still raise
+            remaining.append(matcher)
+            break
+        remaining.append(matcher)
+    if not remaining:
+        return ConstantMatcher(matcher_class is not Should)
+    if len(remaining) == len(transformer.matchers) and all(
+            a is b for a, b in zip(remaining, transformer.matchers)):
+        return transformer
+    return matcher_class(remaining)
+
+
+def _cannot_fail(transformer, spec):
+    """
+    Determine whether transformer only accesses keys that spec declares and
+    thus cannot fail.
+    """
+    if transformer is Identity:
+        return True
+    if isinstance(transformer, Object):
+        return (transformer.determiner == IndexOrAccessToInstantiate.ITEM and
+                isinstance(spec, dict) and transformer.item_or_slice in spec)
+    if isinstance(transformer, Item):
+        return isinstance(spec, dict) and transformer.item_or_slice in spec
+    if isinstance(transformer, Path):
+        for extractor in transformer.extractors:
+            if not _cannot_fail(extractor, spec):
+                return False
+            spec = _item_type(spec, extractor.item_or_slice)
+        return True
+    if isinstance(transformer, Chain) and \
+            not isinstance(transformer, (FlagsChain, DefaultChain)):
+        return (_cannot_fail(transformer.left, spec) and
+                _cannot_fail(transformer.right,
+                             output_type(transformer.left, spec)))
+    return False
+
+
+def _specialize(transformer, spec):
+    """
+    :return: A (transformer, output spec) tuple where transformer is either
+             the original or a specialized replacement
+    """
+    if isinstance(transformer, CoerceTo):
+        if spec is transformer.type and transformer.coercer is transformer.type:
+            return Identity, spec
+    elif isinstance(transformer, IsInstance):
+        spec_type = _type_of(spec)
+        if spec_type is not ANY:
+            return ConstantMatcher(issubclass(spec_type, transformer.types)), bool
+    elif type(transformer) in _COMPARATORS:
+        if spec in _NUMBERS and type(transformer.value) in _NUMBERS:
+            comparator = _COMPARATORS[type(transformer)]
+            return NumericComparison(comparator, transformer.value), bool
+    elif isinstance(transformer, Chain) and transformer.right is None:
+        # Chains without a right, such as FlagsChain, wrap left
+        left, left_spec = _specialize(transformer.left, spec)
+        if left is not transformer.left:
+            specialized = transformer._replace(left=left)
+            return specialized, output_type(specialized, spec)
+    elif isinstance(transformer, Chain):
+        left, left_spec = _specialize(transformer.left, spec)
+        right, right_spec = _specialize(transformer.right, left_spec)
+        if left is Identity or (isinstance(right, ConstantMatcher) and
+                                _cannot_fail(left, spec)):
+            return right, right_spec
+        if right is Identity:
+            return left, left_spec
+        if left is not transformer.left or right is not transformer.right:
+            return transformer._replace(left=left, right=right), right_spec
+        return transformer, right_spec
+    elif isinstance(transformer, (Tupling, Detupling)):
+        children = [_specialize(child, spec)[0]
+                    for child in transformer.transformers]
+        if any(a is not b for a, b in zip(children, transformer.transformers)):
+            specialized = transformer._replace(transformers=tuple(children))
+            return specialized, output_type(specialized, spec)
+    elif type(transformer) in _DECISIVE:
+        return _specialize_matchers(transformer, spec), bool
+    elif type(transformer) in (WhenBooleanCondition, WhenNotBooleanCondition,
+                               BreakIfCondition, BreakIfNotCondition):
+        matcher = _specialize(transformer.matcher, spec)[0]
+        then = _specialize(transformer.then_transformer, spec)[0]
+        otherwise = _specialize(transformer.otherwise_transformer, spec)[0]
+        if isinstance(matcher, ConstantMatcher):
+            taken = matcher.result
+            if isinstance(transformer, WhenNotBooleanCondition):
+                taken = not taken
+            branch = then if taken else otherwise
+            return branch, output_type(branch, spec)
+        if (matcher is not transformer.matcher or
+                then is not transformer.then_transformer or
+                otherwise is not transformer.otherwise_transformer):
+            specialized = transformer._replace(
+                matcher=matcher, then_transformer=then,
+                otherwise_transformer=otherwise)
+            return specialized, output_type(specialized, spec)
+    return transformer, output_type(transformer, spec)
+
+
+def specialize(transformer, spec=ANY):
+    """
+    Return a transformer equivalent to transformer for values of the type
+    spec supplied, with work made redundant by the known types removed:
+
+    - CoerceTo a type the value is known to be exactly becomes identity
+    - IsInstance checks with a known outcome become ConstantMatchers, which
+      are in turn folded into Must, Should, MustNot and conditionals
+    - Comparisons of values known to be ints or floats with an int or float
+      become NumericComparisons
+
+    The original transformer is not modified and nested transformers that
+    cannot be specialized are re-used. Specialization trusts the type spec:
+    calling the result with values of other types may produce incorrect
+    results.
+
+    :param transformer: A Transformer instance
+    :param spec: The type spec of the values transformer will be called with
+    :rtype: Transformer
+    """
+    if not isinstance(transformer, Transformer):
+        raise TransformationException('{} is not a Transformer'.format(
+            transformer))
+    return _specialize(transformer, spec)[0]
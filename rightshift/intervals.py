@@ -0,0 +1,222 @@
+from bisect import bisect_left
+from heapq import heappop, heappush
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+CLOSED = ('neither', 'left', 'right', 'both')
+"""
+The values accepted by the closed parameter of IntervalIndex, indicating
+which of the bounds of each range are inclusive.
+"""
+
+
+class IntervalIndex(object):
+    """
+    An IntervalIndex finds the ranges containing a value in O(log n) time
+    using a binary search over the sorted bounds of the ranges.
+
+    The distinct bounds divide the values into regions, each being either a
+    single bound or the values strictly between two adjacent bounds. Every
+    value in a region is contained by the same set of ranges, so the first
+    range containing each region is computed once when the index is built.
+    Ranges may overlap, in which case the first range, in the order given,
+    takes priority.
+
+    Bounds may be of any mutually comparable type, such as numbers, strings
+    or ipaddress addresses.
+    """
+    def __init__(self, ranges, closed='neither'):
+        """
+        :param ranges: An iterable of (lower, upper) or (lower, upper, label)
+                       tuples. The label defaults to the (lower, upper) tuple.
+        :param closed: One of 'neither', 'left', 'right' or 'both'. Defaults
+                       to 'neither', making both bounds exclusive as with the
+                       Between matcher.
+        :raise: ValueError if a range or closed is invalid
+        """
+        if closed not in CLOSED:
+            raise ValueError('closed must be one of {}'.format(
+                ', '.join(CLOSED)))
+        normalized = []
+        for bounds in ranges:
+            if len(bounds) == 2:
+                lower, upper = bounds
+                label = (lower, upper)
+            elif len(bounds) == 3:
+                lower, upper, label = bounds
+            else:
+                raise ValueError('Ranges must be (lower, upper) or (lower, '
+                                 'upper, label) tuples, not {!r}'.format(
+                                     bounds))
+            if upper < lower:
+                raise ValueError('The lower bound of {!r} exceeds its upper '
+                                 'bound'.format(bounds))
+            normalized.append((lower, upper, label))
+        self.ranges = tuple(normalized)
+        self.closed = closed
+        self._points = sorted(set(
+            bound for lower, upper, _ in self.ranges for bound in (lower, upper)
+        ))
+        self._first = self._build()
+        self._all = None
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def _regions(self, index):
+        """
+        :return: The first and last regions covered by the range at index
+        """
+        lower, upper, _ = self.ranges[index]
+        # The bound at points[i] is region 2i + 1, preceded by region 2i
+        first = 2 * bisect_left(self._points, lower) + 1
+        last = 2 * bisect_left(self._points, upper)
+        if self.closed not in ('left', 'both'):
+            first += 1
+        if self.closed in ('right', 'both'):
+            last += 1
+        return first, last
+
+    def _build(self):
+        """
+        Sweep the regions in order, maintaining a heap of the ranges covering
+        the current region ordered by priority.
+        """
+        count = 2 * len(self._points) + 1
+        starts = [[] for _ in range(count)]
+        for index in range(len(self.ranges)):
+            first, last = self._regions(index)
+            if first <= last:
+                starts[first].append((index, last))
+        first_range = [-1] * count
+        active = []
+        for region in range(count):
+            for index, last in starts[region]:
+                heappush(active, (index, last))
+            while active and active[0][1] < region:
+                heappop(active)
+            if active:
+                first_range[region] = active[0][0]
+        return first_range
+
+    def region(self, value):
+        """
+        :return: The index of the region containing value, or -1 if value
+                 is not comparable with itself, such as NaN
+        """
+        if value != value:
+            return -1
+        points = self._points
+        index = bisect_left(points, value)
+        if index < len(points) and points[index] == value:
+            return 2 * index + 1
+        return 2 * index
+
+    def find(self, value):
+        """
+        :return: The index of the first range containing value or -1
+        :raise: TypeError if value cannot be compared with the bounds
+        """
+        region = self.region(value)
+        return -1 if region < 0 else self._first[region]
+
+    def _build_all(self):
+        """
+        Build a segment tree over the regions in which each range is stored
+        at the O(log n) nodes whose spans together cover its regions, so the
+        ranges containing a region are those stored at the nodes on the path
+        from its leaf to the root.
+        """
+        size = 1
+        while size < 2 * len(self._points) + 1:
+            size *= 2
+        nodes = {}
+        for index in range(len(self.ranges)):
+            first, last = self._regions(index)
+            low, high = first + size, last + size + 1
+            while low < high:
+                if low & 1:
+                    nodes.setdefault(low, []).append(index)
+                    low += 1
+                if high & 1:
+                    high -= 1
+                    nodes.setdefault(high, []).append(index)
+                low //= 2
+                high //= 2
+        return size, nodes
+
+    def find_all(self, value):
+        """
+        :return: A list of the indices, in ascending order, of all the ranges
+                 containing value
+        :raise: TypeError if value cannot be compared with the bounds
+        """
+        region = self.region(value)
+        if region < 0:
+            return []
+        if self._all is None:
+            self._all = self._build_all()
+        size, nodes = self._all
+        found = []
+        node = region + size
+        while node:
+            found.extend(nodes.get(node, ()))
+            node //= 2
+        found.sort()
+        return found
+
+    def find_many(self, values):
+        """
+        Find the first range containing each of values. Sorted values are
+        binary searched for among the bounds following the bound found for
+        the previous value and NumPy arrays are searched using
+        numpy.searchsorted; other values are searched individually.
+
+        :param values: An iterable of values or a NumPy array
+        :return: A list containing the index of the first range containing
+                 each value or -1
+        :raise: TypeError if a value cannot be compared with the bounds
+        """
+        if type(values).__module__ == 'numpy':
+            try:
+                return self._find_array(values)
+            except TypeError:
+                pass
+        values = list(values)
+        points = self._points
+        first_range = self._first
+        found = []
+        index = 0
+        previous = None
+        for position, value in enumerate(values):
+            if value != value or (position and value < previous):
+                # Not sorted: search for the remaining values individually
+                found.extend(self.find(value) for value in values[position:])
+                return found
+            index = bisect_left(points, value, index)
+            if index < len(points) and points[index] == value:
+                found.append(first_range[2 * index + 1])
+            else:
+                found.append(first_range[2 * index])
+            previous = value
+        return found
+
+    def _find_array(self, values):
+        import numpy
+        if self._arrays is None:
+            self._arrays = (numpy.asarray(self._points),
+                            numpy.asarray(self._first))
+        points, first_range = self._arrays
+        if not len(points):
+            return [-1] * len(values)
+        indices = numpy.searchsorted(points, values, side='left')
+        clipped = numpy.minimum(indices, len(points) - 1)
+        exact = (indices < len(points)) & (points[clipped] == values)
+        found = first_range[2 * indices + exact]
+        if values.dtype.kind == 'f':
+            found[numpy.isnan(values)] = -1
+        return found.tolist()
+
+    def label(self, index):
+        return self.ranges[index][2]
@@ -0,0 +1,146 @@
+from collections import deque
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class KeywordAutomaton(object):
+    """
+    A KeywordAutomaton finds occurrences of any of a number of keywords in a
+    text in a single pass over the text, regardless of the number of
+    keywords, using the Aho-Corasick algorithm.
+
+    The keywords are stored in a trie. Each node of the trie has a failure
+    link to the node for the longest proper suffix of its prefix that is
+    also a prefix in the trie, which is followed when the next character of
+    the text does not extend the current prefix. Each node also lists the
+    keywords ending at it, including those ending at the nodes reachable by
+    its failure links, longest first.
+
+    Keywords may be strings, in which case texts must be strings, or bytes,
+    in which case texts may be any bytes-like object, such as bytes,
+    bytearray, memoryview or mmap.
+    """
+    def __init__(self, keywords):
+        """
+        :param keywords: An iterable of strings or of bytes
+        :raise: TypeError if the keywords are not all strings or all bytes
+        """
+        self.keywords = tuple(keywords)
+        kinds = set(isinstance(keyword, (bytes, bytearray))
+                    for keyword in self.keywords)
+        if len(kinds) > 1:
+            raise TypeError('Keywords must be all strings or all bytes')
+        self.binary = kinds == set([True])
+        self._build()
+
+    def _build(self):
+        goto = self._goto = [{}]
+        ends = [[]]
+        for index, keyword in enumerate(self.keywords):
+            node = 0
+            for char in keyword:
+                following = goto[node].get(char)
+                if following is None:
+                    following = goto[node][char] = len(goto)
+                    goto.append({})
+                    ends.append([])
+                node = following
+            ends[node].append(index)
+        fail = self._fail = [0] * len(goto)
+        output = self._output = [()] * len(goto)
+        # Empty keywords occur only once, at the start of the text
+        self._empty = tuple(ends[0])
+        self._terminal = [bool(indices) for indices in ends]
+        # Breadth first from the children of the root, whose failure links
+        # are the root, so that the failure link and output of each node are
+        # complete before those of the deeper nodes depending on them
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            output[node] = tuple(ends[node]) + output[fail[node]]
+            for char, child in goto[node].items():
+                link = fail[node]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                fail[child] = goto[link].get(char, 0)
+                queue.append(child)
+
+    def _text(self, text):
+        """
+        :return: text as an iterable of the characters of the keywords,
+                 bytes-like objects such as mmap instances being viewed as
+                 integers without copying them
+        :raise: TypeError if text cannot be searched for the keywords
+        """
+        if str is bytes:
+            return text
+        if not self.binary:
+            if isinstance(text, (bytes, bytearray, memoryview)):
+                raise TypeError('Cannot search bytes for string keywords')
+            return text
+        if isinstance(text, str):
+            raise TypeError('Cannot search a string for bytes keywords')
+        if isinstance(text, (bytes, bytearray)):
+            return text
+        return memoryview(text).cast('B')
+
+    def iter_matches(self, text):
+        """
+        Generate a (start, index) tuple for each occurrence of a keyword in
+        text, index being the index of the keyword, in the order in which the
+        occurrences end. Occurrences ending at the same position are
+        generated longest first.
+
+        :raise: TypeError if text cannot be searched for the keywords
+        """
+        text = self._text(text)
+        goto, fail, output = self._goto, self._fail, self._output
+        keywords = self.keywords
+        for index in self._empty:
+            yield 0, index
+        state = 0
+        for position, char in enumerate(text, 1):
+            transitions = goto[state]
+            while state and char not in transitions:
+                state = fail[state]
+                transitions = goto[state]
+            state = transitions.get(char, 0)
+            if output[state]:
+                for index in output[state]:
+                    yield position - len(keywords[index]), index
+
+    def find_all(self, text):
+        """
+        :return: A list of (start, index) tuples, see iter_matches
+        """
+        return list(self.iter_matches(text))
+
+    def find_first(self, text):
+        """
+        :return: The (start, index) tuple of the occurrence of a keyword in
+                 text that ends first, or None
+        """
+        for match in self.iter_matches(text):
+            return match
+        return None
+
+    def search(self, text):
+        """
+        :return: True if any keyword occurs in text
+        """
+        return self.find_first(text) is not None
+
+    def match(self, text):
+        """
+        :return: True if text starts with any keyword
+        """
+        text = self._text(text)
+        goto, terminal = self._goto, self._terminal
+        state = 0
+        for char in text:
+            if terminal[state]:
+                return True
+            state = goto[state].get(char)
+            if state is None:
+                return False
+        return terminal[state]
@@ -0,0 +1,311 @@
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+import mmap
+from queue import Empty, LifoQueue
+import sqlite3
+from threading import Lock
+
+from future.utils import raise_from
+
+from rightshift import fail, identity, Transformer
+from rightshift.caches import LRUCache
+from rightshift.extractors import Extractor, ExtractorException
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class LookupException(ExtractorException):
+    """
+    LookupException is raised when a key cannot be found in a lookup source or
+    the source cannot be queried.
+    """
+
+
+class LookupSource(object):
+    """
+    Base class for the reference data sources used by the Lookup extractor.
+    Sub-classes implement get_many, which fetches a number of keys at once.
+    """
+    def get_many(self, keys):
+        """
+        :param keys: A list of keys
+        :return: A dictionary mapping each key found to its value. Keys that
+                 cannot be found are omitted.
+        :raise: LookupException if the source cannot be queried
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release any resources held by the source.
+        """
+
+
+class DictSource(LookupSource):
+    """
+    A LookupSource backed by a dictionary or other Mapping.
+    """
+    def __init__(self, mapping):
+        self.mapping = mapping
+
+    def get_many(self, keys):
+        mapping = self.mapping
+        return dict((key, mapping[key]) for key in keys if key in mapping)
+
+
+class SQLiteSource(LookupSource):
+    """
+    A LookupSource backed by a table in an SQLite database. Keys are fetched
+    using a single SELECT ... WHERE key IN (...) query per batch.
+
+    Connections are pooled and shared by all threads using the source, with
+    at most pool_size connections being opened. Alternatively an existing
+    sqlite3.Connection, created with check_same_thread=False, may be supplied
+    in which case it is shared by all threads in turn. This is required for
+    in-memory databases, as each connection to ':memory:' opens a new
+    database.
+    """
+    max_variables = 999
+    """
+    The maximum number of keys per query, the default limit on the number of
+    parameters in an SQLite statement.
+    """
+
+    def __init__(self, database, table, key_column, value_column,
+                 pool_size=4):
+        """
+        :param database: A database path or sqlite3.Connection
+        :param table: The table to query
+        :param key_column: The column containing the keys
+        :param value_column: The column containing the values or a tuple of
+                             columns, in which case each value is a
+                             dictionary of those columns
+        :param pool_size: The maximum number of connections to open
+        """
+        self.database = database
+        self.table = table
+        self.key_column = key_column
+        self.value_column = value_column
+        self.pool_size = pool_size
+        self._pool = LifoQueue()
+        self._created = 0
+        self._lock = Lock()
+        if isinstance(database, sqlite3.Connection):
+            self._pool.put(database)
+            self._created = self.pool_size = 1
+        columns = value_column if isinstance(value_column, tuple) else (value_column,)
+        self._query = 'SELECT {}, {} FROM {} WHERE {} IN ({{}})'.format(
+            _quote(key_column), ', '.join(_quote(column) for column in columns),
+            _quote(table), _quote(key_column))
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            create = self._created < self.pool_size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return sqlite3.connect(self.database, check_same_thread=False)
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._created -= 1
+                raise_from(LookupException, e)
+        return self._pool.get()
+
+    def get_many(self, keys):
+        keys = list(keys)
+        found = {}
+        connection = self._acquire()
+        try:
+            for start in range(0, len(keys), self.max_variables):
+                chunk = keys[start:start + self.max_variables]
+                query = self._query.format(', '.join('?' * len(chunk)))
+                for row in connection.execute(query, chunk):
+                    if isinstance(self.value_column, tuple):
+                        found[row[0]] = dict(zip(self.value_column, row[1:]))
+                    else:
+                        found[row[0]] = row[1]
+        except sqlite3.Error as e:
+            raise_from(LookupException, e)
+        finally:
+            self._pool.put(connection)
+        return found
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Empty:
+                break
+
+
+def _quote(identifier):
+    return '"{}"'.format(identifier.replace('"', '""'))
+
+
+class SortedFileSource(LookupSource):
+    """
+    A LookupSource backed by a memory-mapped file of newline separated
+    records, each consisting of a key and value split by separator, sorted by
+    the bytes of the key. Keys are found by binary search over the mapped file
+    without reading it into memory.
+
+    Keys other than bytes are converted to strings and encoded, and values
+    are decoded, using encoding. If encoding is None then keys must be bytes
+    and values are returned as bytes.
+    """
+    def __init__(self, path, separator=b'\t', encoding='utf-8'):
+        """
+        :param path: The path of the sorted file
+        :param separator: The bytes separating the key from the value
+        :param encoding: Defaults to utf-8
+        """
+        self.path = path
+        self.separator = separator
+        self.encoding = encoding
+        with open(path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                self._mmap = b''
+
+    def get(self, key):
+        """
+        :return: The value for key or None if it cannot be found
+        """
+        if self.encoding is not None and not isinstance(key, bytes):
+            key = type(u'')(key).encode(self.encoding)
+        data = self._mmap
+        low, high = 0, len(data)
+        while low < high:
+            middle = (low + high) // 2
+            start = data.rfind(b'\n', 0, middle) + 1
+            end = data.find(b'\n', start)
+            if end == -1:
+                end = len(data)
+            split = data.find(self.separator, start, end)
+            if split == -1:
+                split = end
+            line_key = data[start:split]
+            if line_key == key:
+                value = data[split + len(self.separator):end]
+                return value if self.encoding is None else value.decode(
+                    self.encoding)
+            if line_key < key:
+                low = end + 1
+            else:
+                high = start
+        return None
+
+    def get_many(self, keys):
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+
+
+_MISSING = object()
+_NOT_CACHED = object()
+
+
+class Lookup(Extractor):
+    """
+    A Lookup extracts a key from the value it is called with using the key
+    extractor and returns the value for that key in a LookupSource. This
+    allows records to be joined against reference data:
+
+    lookup(countries, key=item.country_code)
+
+    Values fetched from the source, as well as keys that could not be found,
+    are held in a bounded read-through cache. When a Lookup is batched the
+    keys of the whole batch that are not cached are fetched from the source
+    at once.
+
+    If the key cannot be found a LookupException is raised, allowing Lookup to
+    be combined with Default and Detupling.
+    """
+    def __init__(self, source, key=identity, cache_size=10000):
+        """
+        :param source: A LookupSource or a Mapping
+        :param key: A Transformer extracting the key. Defaults to identity
+        :param cache_size: The maximum number of keys cached
+        """
+        if isinstance(source, Mapping):
+            source = DictSource(source)
+        if not isinstance(source, LookupSource):
+            raise LookupException('source parameter must be a Mapping or an '
+                                  'instance of rightshift.lookups.LookupSource')
+        if not isinstance(key, Transformer):
+            raise LookupException('key parameter must be an instance of '
+                                  'rightshift.Transformer')
+        self.source = source
+        self.key = key
+        self.cache_size = cache_size
+        self._cache = LRUCache(cache_size)
+
+    def __getstate__(self):
+        state = super(Lookup, self).__getstate__()
+        del state['_cache']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache = LRUCache(self.cache_size)
+
+    def _fetch(self, keys):
+        found = self.source.get_many(keys)
+        for key in keys:
+            self._cache.put(key, found.get(key, _MISSING))
+        return found
+
+    def _result(self, key, value, flags):
+        if value is _MISSING:
+            fail(LookupException, flags, 'No value found for key {!r}', (key,))
+        return value
+
+    def __call__(self, value, **flags):
+        key = self.key(value, **flags)
+        try:
+            result = self._cache.get(key, _NOT_CACHED)
+        except TypeError as e:
+            fail(LookupException, flags, cause=e)
+        if result is _NOT_CACHED:
+            result = self._fetch([key]).get(key, _MISSING)
+        return self._result(key, result, flags)
+
+    def batch(self, values, **flags):
+        keys = self.key.batch(values, **flags)
+        results = []
+        pending = {}
+        for index, key in enumerate(keys):
+            try:
+                result = self._cache.get(key, _NOT_CACHED)
+            except TypeError as e:
+                fail(LookupException, flags, cause=e)
+            if result is _NOT_CACHED:
+                pending.setdefault(key, []).append(index)
+            results.append(result)
+        if pending:
+            found = self._fetch(list(pending))
+            for key, indices in pending.items():
+                for index in indices:
+                    results[index] = found.get(key, _MISSING)
+        return [self._result(key, result, flags)
+                for key, result in zip(keys, results)]
+
+lookup = Lookup
+"""
+lookup is an alias for the Lookup class.
+"""
@@ -24,3 +24,15 @@ class IndexOrAccessToInstantiate(type):
 
     def __getitem__(cls, name):
         return cls(name, IndexOrAccessToInstantiate.ITEM)
+
+    def path(cls, path):
+        """
+        Compile a path expression such as 'payload.users[0].address.zip' into
+        a single extractor. Compiled paths are cached process-wide keyed by
+        class and path string.
+
+        The class must expose the Path sub-class used to compile segments of
+        the class via the _path_class attribute.
+        """
+        from rightshift.extractors import compile_path
+        return compile_path(cls, path)
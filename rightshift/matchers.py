@@ -1,10 +1,12 @@
 from copy import copy
-from future.utils import raise_from, with_metaclass
 import re
 
 import rightshift.chains
-from rightshift import Transformer, RightShiftException, Chain
+from rightshift import Transformer, RightShiftException, Chain, fail
 from rightshift import extractors
+from rightshift.bloom import BloomFilter
+from rightshift.intervals import IntervalIndex
+from rightshift.keywords import KeywordAutomaton
 
 __author__ = 'adam.jorgensen.za@gmail.com'
 
@@ -29,12 +31,16 @@ class Matcher(Transformer):
         instance the standard Transformer behaviour is overridden.
 
         A Should instance encapsulating both self and other will be
-        returned. If other is an instance of Should then the matchers
-        encapsulated within other will be flattened into the new Should
-        instance.
+        returned. If either self or other is an instance of Should then the
+        matchers encapsulated within it will be flattened into the new Should
+        instance, allowing equality tests combined using a chain of | to be
+        merged as described on Should.
         """
         if isinstance(other, Matcher):
-            matchers = [self]
+            if isinstance(self, Should):
+                matchers = list(self.matchers)
+            else:
+                matchers = [self]
             if isinstance(other, Should):
                 matchers.extend(copy(other.matchers))
             else:
@@ -80,7 +86,7 @@ class Must(Matcher):
         """
         TODO: Document
         """
-        self.matchers = matchers
+        self.matchers = tuple(matchers)
 
     def __call__(self, value, **flags):
         """
@@ -106,7 +112,7 @@ def must(*matchers):
     if not matchers:
         raise MatcherException('At least argument must be supplied to '
                                'rightshift.matchers.must')
-    return Must(*matchers)
+    return Must(matchers)
 
 
 class Should(Matcher):
@@ -121,12 +127,28 @@ class Should(Matcher):
 
     False indicates the value failed to match any of the Matcher instances that
     the Should was initialised with.
+
+    Adjacent EqualTo and IsIn matchers that test the same value, either
+    directly or through the same Transformer, are merged into a single IsIn,
+    so that:
+
+    should(value_is == 'GET', value_is == 'HEAD', value_is == 'OPTIONS')
+
+    tests membership of a frozenset rather than making three comparisons.
+    Only adjacent matchers are merged, so the matchers are still tried in the
+    order given. Each | combining a Should with another EqualTo builds a new
+    IsIn, so a large set of values is better tested using is_in(values).
+
+    Likewise adjacent Pattern matchers searching for literal text are merged
+    into a single search for any of the literals, and adjacent ContainsAny
+    matchers into a single ContainsAny.
     """
     def __init__(self, matchers):
         """
         TODO: Document
         """
-        self.matchers = matchers
+        matchers = _merge(matchers, _membership, _create_membership)
+        self.matchers = tuple(_merge(matchers, _keywords, _create_keywords))
 
     def __call__(self, value, **flags):
         """
@@ -152,7 +174,7 @@ def should(*matchers):
     if not matchers:
         raise MatcherException('At least argument should be supplied to '
                                'rightshift.matchers.should')
-    return Should(*matchers)
+    return Should(matchers)
 
 
 class MustNot(Matcher):
@@ -172,7 +194,7 @@ class MustNot(Matcher):
         """
         TODO: Document
         """
-        self.matchers = matchers
+        self.matchers = tuple(matchers)
 
     def __call__(self, value, **flags):
         """
@@ -198,7 +220,7 @@ def must_not(*matchers):
     if not matchers:
         raise MatcherException('At least argument must_not be supplied to '
                                'rightshift.matchers.must_not')
-    return MustNot(*matchers)
+    return MustNot(matchers)
 
 
 class IsInstance(Matcher):
@@ -260,7 +282,7 @@ class Comparison(Matcher):
         except Exception as e:
             if flags.get('comparison__falsey_exceptions', self.falsey_exceptions):
                 return False
-            raise_from(MatcherException, e)
+            fail(MatcherException, flags, cause=e)
 
 compare_using = comparison = Comparison
 """
@@ -420,6 +442,10 @@ An alias to the Between class.
 class Pattern(MethodComparison):
     """
     A regex search/match. By default, search is used rather than match.
+
+    A Pattern instantiated with a bytes pattern may be called with any
+    bytes-like object supported by the re module, including bytearray,
+    memoryview and mmap instances, without copying or decoding the value.
     """
     def __init__(self, pattern, search=True, falsey_exceptions=False):
         super(MethodComparison, self).__init__(self.compare, falsey_exceptions)
@@ -439,73 +465,450 @@ An alias to the Pattern class.
 """
 
 
-def _get_value_is_class(left=None):
+class InRanges(Matcher):
+    """
+    An InRanges matcher returns True if the value it is called with is
+    contained by any of a number of ranges. Whereas a Should of Between
+    matchers compares the value with each range in turn, InRanges uses an
+    IntervalIndex to find a containing range in O(log n) time:
+
+    in_ranges([(0, 10), (20, 30), (25, 40)])
+
+    By default both bounds of each range are exclusive, as with Between,
+    which may be changed using the closed parameter.
+
+    Exceptions raised comparing the value with the bounds are handled as
+    they are by Comparison, being converted to False if falsey_exceptions or
+    the comparison__falsey_exceptions flag is set.
+    """
+    def __init__(self, ranges, closed='neither', falsey_exceptions=False):
+        """
+        :param ranges: An iterable of (lower, upper) or (lower, upper, label)
+                       tuples
+        :param closed: One of 'neither', 'left', 'right' or 'both'
+        :param falsey_exceptions: Defaults to False
+        """
+        try:
+            index = IntervalIndex(ranges, closed)
+        except (TypeError, ValueError) as e:
+            raise MatcherException('Invalid ranges: {}'.format(e))
+        self.ranges = index.ranges
+        self.closed = closed
+        self.falsey_exceptions = falsey_exceptions
+        self._index = index
+
+    def __call__(self, value, **flags):
+        try:
+            return self._index.find(value) >= 0
+        except TypeError as e:
+            if flags.get('comparison__falsey_exceptions',
+                         self.falsey_exceptions):
+                return False
+            fail(MatcherException, flags, cause=e)
+
+    def batch(self, values, **flags):
+        """
+        Sorted values and NumPy arrays are matched against the ranges in bulk.
+        """
+        try:
+            return [found >= 0 for found in self._index.find_many(values)]
+        except TypeError:
+            return super(InRanges, self).batch(values, **flags)
+
+in_ranges = InRanges
+"""
+An alias to the InRanges class.
+"""
+
+
+class IsIn(Matcher):
+    """
+    An IsIn matcher returns True if the value it is called with is equal to
+    one of a collection of values. The values are held in a frozenset, so the
+    test takes constant time however many values there are, whereas a Should
+    of EqualTo matchers compares the value with each in turn:
+
+    is_in(['GET', 'HEAD', 'OPTIONS'])
+
+    A value that is not hashable cannot be looked up in the frozenset and is
+    compared with each of the values instead, so IsIn returns the same result
+    as the equivalent Should of EqualTo matchers.
+
+    If bloom_error_rate is supplied a BloomFilter of the values is checked
+    before the frozenset, allowing most values that are not members to be
+    rejected using a bit array of roughly 10 bits per value at a rate of
+    0.01. In CPython a frozenset lookup is generally faster than the pure
+    Python BloomFilter, so this is only worthwhile for values that are
+    expensive to compare for equality.
+
+    Exceptions raised testing the value are handled as they are by
+    Comparison.
+    """
+    _expected = True
+
+    def __init__(self, values, falsey_exceptions=False, bloom_error_rate=None):
+        """
+        :param values: An iterable of hashable values
+        :param falsey_exceptions: Defaults to False
+        :param bloom_error_rate: The false positive rate of the BloomFilter
+                                 checked before the frozenset. Defaults to
+                                 None, in which case no BloomFilter is used.
+        """
+        try:
+            self.values = frozenset(values)
+        except TypeError as e:
+            raise MatcherException('Invalid values: {}'.format(e))
+        self.falsey_exceptions = falsey_exceptions
+        self.bloom_error_rate = bloom_error_rate
+        self._bloom = self._create_bloom()
+
+    def _create_bloom(self):
+        if self.bloom_error_rate is None:
+            return None
+        try:
+            bloom = BloomFilter(len(self.values), self.bloom_error_rate)
+        except ValueError as e:
+            raise MatcherException('Invalid bloom_error_rate: {}'.format(e))
+        bloom.update(self.values)
+        return bloom
+
+    def __getstate__(self):
+        # String hashes differ between processes, so the BloomFilter is
+        # rebuilt when unpickling
+        state = super(IsIn, self).__getstate__()
+        del state['_bloom']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._bloom = self._create_bloom()
+
+    def _contains(self, value):
+        try:
+            if self._bloom is not None and value not in self._bloom:
+                return False
+            return value in self.values
+        except TypeError:
+            return any(value == member for member in self.values)
+
+    def __call__(self, value, **flags):
+        try:
+            return self._contains(value) is self._expected
+        except Exception as e:
+            if flags.get('comparison__falsey_exceptions',
+                         self.falsey_exceptions):
+                return False
+            fail(MatcherException, flags, cause=e)
+
+    def batch(self, values, **flags):
+        values = list(values)
+        if self._bloom is None:
+            members = self.values
+            expected = self._expected
+            try:
+                return [(value in members) is expected for value in values]
+            except TypeError:
+                pass
+        return super(IsIn, self).batch(values, **flags)
+
+is_in = IsIn
+"""
+An alias to the IsIn class.
+"""
+
+
+class NotIn(IsIn):
+    """
+    A NotIn matcher returns True if the value it is called with is not equal
+    to any of a collection of values, being the negation of IsIn:
+
+    not_in(blocked_addresses)
+    """
+    _expected = False
+
+not_in = NotIn
+"""
+An alias to the NotIn class.
+"""
+
+
+class ContainsAny(Matcher):
+    """
+    A ContainsAny matcher returns True if the value it is called with
+    contains any of a number of keywords. Whereas a Should of Pattern
+    matchers searches the value once per keyword, ContainsAny uses a
+    KeywordAutomaton to search for every keyword in a single pass:
+
+    contains_any(['ERROR', 'timeout', 'refused'])
+
+    Keywords may be strings or bytes, in which case the value may be any
+    bytes-like object. As with Pattern, the pattern__search flag may be set
+    to False to only match keywords at the start of the value.
+
+    Exceptions raised searching the value, such as searching bytes for
+    string keywords, are handled as they are by Comparison.
     """
-    This function generates a ValueIs class that implements comparison operators
-    tied to the Comparison sub-classes defined above.
+    def __init__(self, keywords, falsey_exceptions=False):
+        """
+        :param keywords: An iterable of strings or of bytes
+        :param falsey_exceptions: Defaults to False
+        """
+        try:
+            automaton = KeywordAutomaton(keywords)
+        except TypeError as e:
+            raise MatcherException('Invalid keywords: {}'.format(e))
+        self.keywords = automaton.keywords
+        self.falsey_exceptions = falsey_exceptions
+        self._automaton = automaton
+
+    def __call__(self, value, **flags):
+        try:
+            if flags.get('pattern__search', True):
+                return self._automaton.search(value)
+            return self._automaton.match(value)
+        except Exception as e:
+            if flags.get('comparison__falsey_exceptions',
+                         self.falsey_exceptions):
+                return False
+            fail(MatcherException, flags, cause=e)
+
+contains_any = ContainsAny
+"""
+An alias to the ContainsAny class.
+"""
+
+_ALTERNATION_LIMIT = 50
+"""
+The number of keywords from which literal Patterns merged by Should are
+searched for using a KeywordAutomaton rather than a single re alternation.
+In CPython the alternation is around 10 times faster for a few keywords,
+but its cost grows with the number of keywords and it is overtaken by the
+automaton at around 50 keywords sharing an alphabet.
+"""
+
+
+class _LiteralPatterns(ContainsAny):
+    """
+    The matcher into which Should merges adjacent Pattern matchers searching
+    for literal text. Fewer than _ALTERNATION_LIMIT keywords are searched for
+    using a single re alternation, more using the KeywordAutomaton of
+    ContainsAny. Either way values of types the re module does not accept,
+    such as lists, raise a TypeError as they do for the Patterns.
+    """
+    def __init__(self, keywords, falsey_exceptions=False):
+        super(_LiteralPatterns, self).__init__(keywords, falsey_exceptions)
+        separator = b'|' if self._automaton.binary else u'|'
+        if len(self.keywords) < _ALTERNATION_LIMIT:
+            self._regex = re.compile(separator.join(
+                re.escape(keyword) for keyword in self.keywords))
+        else:
+            self._regex = None
+        # Matching an empty pattern of the same type up to position 0 checks
+        # the type of the value without searching it
+        self._check = re.compile(separator[:0])
+
+    def __call__(self, value, **flags):
+        if self._regex is None:
+            try:
+                self._check.match(value, 0, 0)
+            except Exception as e:
+                if flags.get('comparison__falsey_exceptions',
+                             self.falsey_exceptions):
+                    return False
+                fail(MatcherException, flags, cause=e)
+            return super(_LiteralPatterns, self).__call__(value, **flags)
+        try:
+            if flags.get('pattern__search', True):
+                return self._regex.search(value) is not None
+            return self._regex.match(value) is not None
+        except Exception as e:
+            if flags.get('comparison__falsey_exceptions',
+                         self.falsey_exceptions):
+                return False
+            fail(MatcherException, flags, cause=e)
+
+
+def _membership(matcher):
+    """
+    :return: A (key, values) tuple if matcher tests whether a value is one of
+             values, otherwise None
+    """
+    if type(matcher) is EqualTo:
+        return (matcher.falsey_exceptions,), (matcher.value,)
+    if type(matcher) is IsIn and matcher.bloom_error_rate is None:
+        return (matcher.falsey_exceptions,), matcher.values
+    return None
+
+
+def _create_membership(key, values):
+    falsey_exceptions, = key
+    # The union of the frozensets of IsIn matchers is taken without hashing
+    # their values again
+    return IsIn(frozenset().union(*values), falsey_exceptions)
+
+
+_METACHARACTERS = frozenset('.^$*+?{}[]\\|()')
+
+
+def _literal(pattern):
+    """
+    :return: The text a compiled regular expression matches if it is a
+             non-empty literal without flags, otherwise None
+    """
+    if pattern.flags & ~re.UNICODE:
+        return None
+    source = pattern.pattern
+    if isinstance(source, bytes):
+        characters = source.decode('latin-1')
+    else:
+        characters = source
+    if not characters or _METACHARACTERS.intersection(characters):
+        return None
+    return source
+
+
+def _keywords(matcher):
+    """
+    :return: A (key, keywords) tuple if matcher tests whether a value
+             contains one of keywords, otherwise None. Literal Patterns are
+             only merged with each other, as ContainsAny accepts values, such
+             as lists, that Pattern rejects.
+    """
+    if type(matcher) is Pattern and matcher.search:
+        literal = _literal(matcher.pattern)
+        if literal is not None:
+            return ((_LiteralPatterns, matcher.falsey_exceptions,
+                     isinstance(literal, bytes)), (literal,))
+    elif type(matcher) in (ContainsAny, _LiteralPatterns):
+        return ((type(matcher), matcher.falsey_exceptions,
+                 matcher._automaton.binary), matcher.keywords)
+    return None
+
+
+def _create_keywords(key, keywords):
+    matcher_type, falsey_exceptions, _ = key
+    return matcher_type([keyword for operands in keywords
+                         for keyword in operands], falsey_exceptions)
+
+
+def _merge(matchers, operands, create):
+    """
+    Merge each run of adjacent matchers of a disjunction that apply the same
+    test, with different operands, to the same value into a single matcher.
+    Matchers are only merged with their neighbours so that the order in
+    which the matchers are tried, and so which of them ends the disjunction
+    early, is unchanged.
+
+    :param matchers: The matchers of the disjunction
+    :param operands: A callable returning a (key, operands) tuple for a
+                     mergeable matcher, or None. Adjacent matchers with the
+                     same key are merged.
+    :param create: A callable returning the merged matcher given a key and
+                   a list of the operands of each of the matchers merged
+    """
+    # (key, [(matcher, operands)]) per run, key being None for matchers that
+    # cannot be merged
+    runs = []
+    for matcher in matchers:
+        # Matchers applied to the result of the same Transformer are merged
+        # and chained with it
+        left, right = None, matcher
+        if isinstance(matcher, Chain) and matcher.right is not None:
+            left, right = matcher.left, matcher.right
+        found = operands(right)
+        key = None
+        if found is not None:
+            try:
+                hash(found[1])
+                key = (left,) + found[0]
+                hash(key)
+            except TypeError:
+                key = None
+        if key is None:
+            runs.append((None, [(matcher, None)]))
+        elif runs and runs[-1][0] == key:
+            runs[-1][1].append((matcher, found[1]))
+        else:
+            runs.append((key, [(matcher, found[1])]))
+    result = []
+    for key, run in runs:
+        if len(run) == 1:
+            result.append(run[0][0])
+            continue
+        # The operands of the whole run are collected so that the merged
+        # matcher is built once
+        matcher = create(key[1:], [operands for _, operands in run])
+        left = key[0]
+        result.append(matcher if left is None else left >> matcher)
+    return result
 
-    These operators exist at the class level and thus the ValueIs class does
-    not need to be instantiated in order to make use of these operators. In
-    fact, the ValueIs class does not support being instantiated and will raise
-    a NotImplementedError if one attempts to do so.
 
-    A left value which is an instance of the Transformer class may be supplied
-    to this function in order to alter the behaviour of the comparison operator
-    methods.
+class ValueIsBuilder(object):
+    """
+    A ValueIsBuilder implements the comparison operators in terms of the
+    Comparison sub-classes defined above.
+
+    ValueIsBuilder instances are extremely light-weight, holding only a
+    reference to an optional left value, which allows them to be created and
+    cached cheaply.
 
     Normally, the comparison operator methods will simply return an instance of
     the relevant Comparison class:
 
-    ValueIs = _get_value_is_class()
-    ValueIs == 5 returns EqualTo(5)
+    ValueIsBuilder() == 5 returns EqualTo(5)
 
-    If a Transformer is supplied when this function is called then the comparison
-    methods behave so as to return the result of chaining the supplied instance
-    with the generated Comparison:
+    If a Transformer is supplied as the left value then the comparison methods
+    behave so as to return the result of chaining the supplied instance with
+    the generated Comparison:
 
-    ValueIs = _get_value_is_class(x)
-    ValueIs == 5 returns x >> EqualTo(5)
+    ValueIsBuilder(x) == 5 returns x >> EqualTo(5)
 
     This behaviour is leveraged by the ValueIsMixin in this module to implement
     the value_is property on the Item, ItemChain, Attribute and AttributeChain
     classes defined in this module.
-
-    :param left: Defaults to None
-    :returns: a ValueIs class
     """
-    def generate_comparison_method(comparator):
-        if isinstance(left, Transformer):
-            return lambda cls, other: left >> comparator(other)
-        else:
-            return lambda cls, other: comparator(other)
+    __slots__ = ('left',)
+
+    def __init__(self, left=None):
+        """
+        :param left: Defaults to None
+        """
+        self.left = left
+
+    def _compare(self, comparison, other):
+        if isinstance(self.left, Transformer):
+            return self.left >> comparison(other)
+        return comparison(other)
+
+    def __lt__(self, other):
+        return self._compare(LessThan, other)
+
+    def __le__(self, other):
+        return self._compare(LessThanEqualTo, other)
+
+    def __eq__(self, other):
+        return self._compare(EqualTo, other)
 
-    __metaclass = type('ValueIsMetaClass', bases=(type,), dict={
-        method: generate_comparison_method(comparison)
-        for method, comparison in (
-            ('__lt__', LessThan),
-            ('__le__', LessThanEqualTo),
-            ('__eq__', EqualTo),
-            ('__ne__', NotEqualTo),
-            ('__ge__', GreaterThanEqualTo),
-            ('__gt__', GreaterThan)
-        )
-    })
+    def __ne__(self, other):
+        return self._compare(NotEqualTo, other)
 
-    class ValueIs(with_metaclass(__metaclass, object)):
-        def __new__(cls, *args, **kwargs):
-            raise NotImplementedError
+    def __ge__(self, other):
+        return self._compare(GreaterThanEqualTo, other)
 
-    return ValueIs
+    def __gt__(self, other):
+        return self._compare(GreaterThan, other)
 
-value_is = ValueIs = _get_value_is_class()
+    __hash__ = object.__hash__
+
+value_is = ValueIs = ValueIsBuilder()
 """
 value_is is a special shortcut to enable working with the Comparison sub-classes
 LessThan, LessThanEqualTo, EqualTo, NotEqualTo, GreaterThanEqualTo or GreaterThan
 classes to feel more natural.
 
-value_is is a special class that implements the various comparison operator
-methods at a class-level via the meta-class facility in Python in order to
-return instances of the Comparison sub-classes.
+value_is is a ValueIsBuilder instance with no left value and thus its
+comparison operator methods simply return instances of the Comparison
+sub-classes.
 
 Examples:
 
@@ -517,13 +920,21 @@ value_is != True is equivalent to NotEqualTo(True)
 class ValueIsMixin(object):
     """
     The ValueIsMixin exposes a read-only property named value_is that
-    leverages the _get_value_is_class function in this module to implement
-    seamless chaining of a Transformer with the functionality provided by
-    the ValueIs class.
+    returns a ValueIsBuilder bound to the instance in order to implement
+    seamless chaining of a Transformer with the Comparison sub-classes.
+
+    The ValueIsBuilder is created on first access and cached on the instance.
+    A cached builder bound to another instance, as copied by pickling, is
+    replaced.
     """
     @property
     def value_is(self):
-        return _get_value_is_class(self)
+        # Look in __dict__ directly: a getattr miss would be routed to
+        # IndexOrAccessToChainMixin.__getattr__ and build a chain
+        builder = self.__dict__.get('_value_is')
+        if builder is None or builder.left is not self:
+            builder = self.__dict__['_value_is'] = ValueIsBuilder(self)
+        return builder
 
 
 class ItemMixin(rightshift.chains.IndexOrAccessToChainMixin):
@@ -541,6 +952,15 @@ class ItemChain(Chain, ItemMixin, ValueIsMixin):
     """
 
 
+class ItemPath(ItemMixin, extractors.ItemPath, ValueIsMixin):
+    """
+    A variant on the ItemPath extractor found in rightshift.extractors
+    that exposes a special value_is property in order to allow usage like:
+
+    item.path('x.y').value_is >= 5
+    """
+
+
 class Item(ItemMixin, extractors.Item, ValueIsMixin):
     """
     A variant on the Item extractor found in rightshift.extractors
@@ -548,6 +968,7 @@ class Item(ItemMixin, extractors.Item, ValueIsMixin):
 
     item['x'].value_is >= 5
     """
+    _path_class = ItemPath
 
 
 item = Item
@@ -572,6 +993,15 @@ class AttributeChain(Chain, AttributeMixin, ValueIsMixin):
     """
 
 
+class AttributePath(AttributeMixin, extractors.AttributePath, ValueIsMixin):
+    """
+    A variant on the AttributePath extractor found in rightshift.extractors
+    that exposes a special value_is property in order to allow usage like:
+
+    attr.path('x.y').value_is >= 5
+    """
+
+
 class Attribute(AttributeMixin, extractors.Attribute, ValueIsMixin):
     """
     A variant on the Attribute extractor found in rightshift.extractors that
@@ -579,6 +1009,7 @@ class Attribute(AttributeMixin, extractors.Attribute, ValueIsMixin):
 
     attr.x.value_is >= 5
     """
+    _path_class = AttributePath
 
 
 attr = prop = Attribute
@@ -0,0 +1,119 @@
+from numbers import Integral
+
+from past.builtins import basestring
+
+from rightshift import (Chain, Detupling, Identity, Record,
+                        TransformationException, Transformer, Tupling, Value)
+from rightshift.chains import DefaultChain, FlagsChain
+from rightshift.conditionals import Break, BooleanCondition
+from rightshift.extractors import Item, Object, Path
+from rightshift.magic import IndexOrAccessToInstantiate
+from rightshift.matchers import Must, MustNot, Should
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+def _is_path_key(key):
+    """
+    Only string keys and non-negative integer indices can be resolved without
+    knowledge of the container being accessed. Slices and negative indices
+    depend on the length of the container and thus require all of it.
+    """
+    if isinstance(key, bool):
+        return False
+    if isinstance(key, Integral):
+        return key >= 0
+    return isinstance(key, basestring)
+
+
+def _item_path(transformer):
+    """
+    If transformer does nothing but access items then return the path of keys
+    it accesses, otherwise return None.
+    """
+    if transformer is Identity:
+        return ()
+    if isinstance(transformer, Object):
+        if (transformer.determiner == IndexOrAccessToInstantiate.ITEM and
+                _is_path_key(transformer.item_or_slice)):
+            return transformer.item_or_slice,
+        return None
+    if isinstance(transformer, Item):
+        if _is_path_key(transformer.item_or_slice):
+            return transformer.item_or_slice,
+        return None
+    if isinstance(transformer, Path):
+        path = ()
+        for extractor in transformer.extractors:
+            segment = _item_path(extractor)
+            if segment is None:
+                return None
+            path += segment
+        return path
+    if isinstance(transformer, (FlagsChain, DefaultChain)):
+        return None
+    if isinstance(transformer, Chain):
+        left = _item_path(transformer.left)
+        if left is not None:
+            right = _item_path(transformer.right)
+            if right is not None:
+                return left + right
+    return None
+
+
+def _reads(transformer):
+    path = _item_path(transformer)
+    if path is not None:
+        return {path}
+    if isinstance(transformer, (FlagsChain, DefaultChain)):
+        return _reads(transformer.left)
+    if isinstance(transformer, Chain):
+        left = _item_path(transformer.left)
+        if left is None:
+            return _reads(transformer.left)
+        return {left + path for path in _reads(transformer.right)}
+    if isinstance(transformer, (Tupling, Detupling, Record)):
+        return _union(transformer.transformers)
+    if isinstance(transformer, (Must, Should, MustNot)):
+        return _union(transformer.matchers)
+    if isinstance(transformer, BooleanCondition):
+        return _union((transformer.matcher, transformer.then_transformer,
+                       transformer.otherwise_transformer))
+    if isinstance(transformer, Value) or transformer is Break:
+        return set()
+    return {()}
+
+
+def _union(transformers):
+    paths = set()
+    for transformer in transformers:
+        paths.update(_reads(transformer))
+    return paths
+
+
+def item_paths(transformer):
+    """
+    Return the set of item paths that transformer reads from the value it is
+    called with. Each path is a tuple of keys, with the empty tuple indicating
+    that the transformer requires the whole of the value.
+
+    Item, ItemChain and item based Path and Object extractors contribute their
+    paths while Chain, Tupling, Detupling, Record, Flags, Default, the boolean
+    matchers and the conditionals are traversed. Any other transformer is
+    assumed to require the whole of the value it receives.
+
+    Examples:
+
+    item_paths(item.meta.id & item.records) == {('meta', 'id'), ('records',)}
+    item_paths(item.body >> Wrap(len)) == {('body',)}
+
+    :param transformer: A Transformer instance
+    :rtype: frozenset
+    """
+    if not isinstance(transformer, Transformer):
+        raise TransformationException('{} is not a Transformer'.format(
+            transformer))
+    paths = _reads(transformer)
+    if () in paths:
+        return frozenset([()])
+    return frozenset(paths)
@@ -0,0 +1,595 @@
+"""
+Per node profiling of Transformer graphs. This module requires Python 3.4+.
+"""
+from collections import OrderedDict
+import marshal
+import sys
+import time
+import tracemalloc
+
+from rightshift import (Chain, Transformer, TransformationException, Value)
+from rightshift.cse import (_branches, _chain, _flatten, _rebuild,
+                            CommonSubexpressions, Shared)
+from rightshift.extractors import Attribute, Item, Object, Path
+from rightshift.matchers import Between, MethodComparison, Pattern
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+LABEL_LENGTH = 40
+"""
+The maximum length of the arguments included in a node label.
+"""
+
+
+def _shorten(text):
+    if len(text) > LABEL_LENGTH:
+        return text[:LABEL_LENGTH - 3] + '...'
+    return text
+
+
+def describe(transformer):
+    """
+    :return: A short label for transformer consisting of its class name and
+             the arguments distinguishing it from other instances of its
+             class, such as Item['a'] or EqualTo(5)
+    """
+    name = type(transformer).__name__
+    # Item, Attribute and Object build chains for unknown attributes, so
+    # only attributes known to be set are read
+    if isinstance(transformer, Object):
+        return '{}({})'.format(name, _shorten(repr(transformer.attribute)))
+    if isinstance(transformer, Item):
+        return '{}[{}]'.format(name, _shorten(repr(transformer.item_or_slice)))
+    if isinstance(transformer, Attribute):
+        return '{}.{}'.format(name, _shorten(str(transformer.attribute)))
+    if isinstance(transformer, Path):
+        return '{}({})'.format(name,
+                               _shorten(repr(transformer.path_expression)))
+    if isinstance(transformer, Between):
+        return '{}({})'.format(name, _shorten('{!r}, {!r}'.format(
+            transformer.lower_bound, transformer.upper_bound)))
+    if isinstance(transformer, Pattern):
+        return '{}({})'.format(name,
+                               _shorten(repr(transformer.pattern.pattern)))
+    if isinstance(transformer, (MethodComparison, Value)):
+        return '{}({})'.format(name, _shorten(repr(transformer.value)))
+    return name
+
+
+class Profiled(Transformer):
+    """
+    A Profiled transformer calls transformer, reporting each call to the
+    Profiler that created it as a call of the node identified by path. The
+    Profiled transformers making up an instrumented graph are created by
+    Profiler.instrument.
+    """
+    def __init__(self, transformer, path, profiler):
+        """
+        :param transformer: The Transformer profiled
+        :param path: The labels of the nodes from the root of the graph to
+                     transformer
+        :param profiler: The Profiler
+        """
+        self.transformer = transformer
+        self.path = path
+        self._profiler = profiler
+        self._node = profiler._node(path)
+
+    def __call__(self, value, **flags):
+        profiler = self._profiler
+        profiler._enter(self._node)
+        try:
+            return self.transformer(value, **flags)
+        finally:
+            profiler._exit(self._node)
+
+    def batch(self, values, **flags):
+        profiler = self._profiler
+        profiler._enter(self._node)
+        try:
+            return self.transformer.batch(values, **flags)
+        finally:
+            profiler._exit(self._node)
+
+
+def _labels(transformers):
+    """
+    :return: The labels of sibling transformers, numbered where they would
+             otherwise be equal
+    """
+    labels = [describe(transformer) for transformer in transformers]
+    seen = {}
+    for index, label in enumerate(labels):
+        if label in seen:
+            seen[label] += 1
+            labels[index] = '{}#{}'.format(label, seen[label])
+        else:
+            seen[label] = 1
+    return labels
+
+
+def _instrument(transformer, path, profiler, shared):
+    """
+    :param shared: The instrumented Shared transformers by id. A Shared
+                   transformer is instrumented once, where it is first
+                   found, so that it is still shared.
+    """
+    if isinstance(transformer, Shared):
+        try:
+            return shared[id(transformer)]
+        except KeyError:
+            pass
+    # Register the node before its children so that nodes are reported in
+    # the order of a depth first traversal
+    profiler._node(path)
+
+    def children(transformers):
+        return [_instrument(child, path + (label,), profiler, shared)
+                for child, label in zip(transformers, _labels(transformers))]
+
+    result = transformer
+    if isinstance(transformer, (Shared, CommonSubexpressions)):
+        result = transformer._replace(
+            transformer=children([transformer.transformer])[0])
+    elif isinstance(transformer, Chain) and transformer.right is not None:
+        result = _chain(children(_flatten(transformer)))
+    else:
+        branches = _branches(transformer)
+        if branches:
+            result = _rebuild(transformer, children(branches))
+    result = Profiled(result, path, profiler)
+    if isinstance(transformer, Shared):
+        shared[id(transformer)] = result
+    return result
+
+
+class NodeStats(object):
+    """
+    NodeStats is the base class of the measurements made for a node by a
+    Profiler, the measurements being the attributes named by __slots__.
+    Measurements named by _additive are sums over the calls of the node,
+    which include those of the nodes below it.
+    """
+    __slots__ = ()
+    _additive = ()
+
+    def __init__(self, *values):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def reset(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def copy(self):
+        return type(self)(*self.as_tuple())
+
+    def as_tuple(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return (type(other) is type(self) and
+                self.as_tuple() == other.as_tuple())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(name, getattr(self, name))
+            for name in self.__slots__))
+
+
+class NodeAllocations(NodeStats):
+    """
+    The memory allocations measured for a node by an AllocationProfiler:
+
+    calls: The number of calls of the node
+    bytes: The total net number of bytes allocated by the calls, being those
+           still allocated when each call returned
+    blocks: The total net number of memory blocks allocated by the calls
+    peak: The largest number of bytes allocated during a call, including
+          those freed before it returned
+    """
+    __slots__ = ('calls', 'bytes', 'blocks', 'peak')
+    _additive = ('bytes', 'blocks')
+
+
+class NodeTimings(NodeStats):
+    """
+    The time measured for a node by a TimingProfiler:
+
+    calls: The number of calls of the node
+    time: The total number of seconds spent in the calls
+    """
+    __slots__ = ('calls', 'time')
+    _additive = ('time',)
+
+
+class Report(object):
+    """
+    Report is the base class of the reports of the measurements made for
+    each node of a Transformer graph by a Profiler, or of the differences
+    between two such reports.
+    """
+    _node_class = NodeStats
+
+    def __init__(self, nodes):
+        """
+        :param nodes: An ordered mapping of node paths to NodeStats, in
+                      which each node follows its parent
+        """
+        self.nodes = OrderedDict(nodes)
+        self._children = {}
+        for path in self.nodes:
+            self._children.setdefault(path[:-1], []).append(path)
+
+    def children(self, path):
+        """
+        :return: The paths of the nodes directly below the node at path
+        """
+        return list(self._children.get(path, ()))
+
+    def own(self, path):
+        """
+        :return: The NodeStats of the node at path excluding the additive
+                 measurements of the nodes below it
+        """
+        stats = self.nodes[path].copy()
+        for child in self.children(path):
+            for name in stats._additive:
+                value = getattr(self.nodes[child], name)
+                setattr(stats, name, getattr(stats, name) - value)
+        return stats
+
+    def diff(self, baseline):
+        """
+        :param baseline: An earlier report of the same type
+        :return: A report of the differences between the nodes of this
+                 report and those of baseline. Nodes found in only one of the
+                 reports are compared with a node without measurements.
+        """
+        nodes = OrderedDict()
+        empty = self._node_class()
+        for path in list(self.nodes) + [path for path in baseline.nodes
+                                        if path not in self.nodes]:
+            current = self.nodes.get(path, empty)
+            previous = baseline.nodes.get(path, empty)
+            nodes[path] = self._node_class(*[
+                a - b for a, b in zip(current.as_tuple(), previous.as_tuple())
+            ])
+        return type(self)(nodes)
+
+    def folded(self, measurement, scale=1):
+        """
+        Format the report as folded stacks, the input format of flame graph
+        tools such as flamegraph.pl and speedscope. Each line holds the
+        labels of the nodes from the root to a node separated by semicolons
+        followed by the own measurement of the node as an integer. Nodes
+        with a measurement that is not positive are omitted.
+
+        :param measurement: The name of an additive measurement
+        :param scale: A factor to multiply the measurement by before it is
+                      rounded, such as 1e6 to report seconds as microseconds
+        :rtype: str
+        """
+        lines = []
+        for path in self.nodes:
+            value = int(round(getattr(self.own(path), measurement) * scale))
+            if value > 0:
+                lines.append('{} {}'.format(';'.join(
+                    label.replace(';', ',') for label in path), value))
+        return '\n'.join(lines)
+
+    def _format(self, headings, row):
+        """
+        :param headings: The headings of the columns preceding the node
+        :param row: A callable returning the values of those columns given a
+                    node path
+        """
+        template = ' '.join(['{:>12}'] * len(headings)) + '  {}{}'
+        lines = [template.format(*(list(headings) + ['', 'node']))]
+        for path in self.nodes:
+            lines.append(template.format(*(list(row(path)) + [
+                '  ' * (len(path) - 1), path[-1]])))
+        return '\n'.join(lines)
+
+    def format(self):
+        """
+        :return: The report as a table with a row per node, indented to show
+                 the structure of the graph
+        """
+        return self._format(self._node_class.__slots__,
+                            lambda path: self.nodes[path].as_tuple())
+
+    def __str__(self):
+        return self.format()
+
+
+class AllocationReport(Report):
+    """
+    An AllocationReport holds the allocations measured for each node of a
+    Transformer graph by an AllocationProfiler.
+    """
+    _node_class = NodeAllocations
+
+    def format(self):
+        def row(path):
+            node = self.nodes[path]
+            return (node.calls, node.bytes, self.own(path).bytes, node.blocks,
+                    node.peak)
+        return self._format(('calls', 'net bytes', 'self bytes', 'blocks',
+                             'peak bytes'), row)
+
+
+class TimingReport(Report):
+    """
+    A TimingReport holds the time measured for each node of a Transformer
+    graph by a TimingProfiler. It may be exported for viewing with standard
+    tools using dump_stats, producing a file readable by the pstats module
+    and viewers such as snakeviz, and folded, producing folded stacks for
+    flame graphs:
+
+    report.dump_stats('pipeline.prof')
+    pstats.Stats('pipeline.prof').sort_stats('tottime').print_stats()
+    """
+    _node_class = NodeTimings
+
+    def format(self):
+        def row(path):
+            node = self.nodes[path]
+            return (node.calls, '{:.6f}'.format(node.time),
+                    '{:.6f}'.format(self.own(path).time))
+        return self._format(('calls', 'time', 'self time'), row)
+
+    @staticmethod
+    def function(path):
+        """
+        :return: The pstats function key of the node at path, the node being
+                 represented as a pseudo-function named by the labels of the
+                 nodes from the root to it, such as Tupling>Chain>Item['a']
+        """
+        return 'rightshift', 0, '>'.join(path)
+
+    def pstats(self):
+        """
+        :return: The report in the form of the stats dictionary of a
+                 pstats.Stats, in which each node is a function called by
+                 the node above it
+        """
+        stats = {}
+        for path, node in self.nodes.items():
+            entry = (node.calls, node.calls, self.own(path).time, node.time)
+            callers = {}
+            if len(path) > 1:
+                callers[self.function(path[:-1])] = entry
+            stats[self.function(path)] = entry + (callers,)
+        return stats
+
+    def dump_stats(self, filename):
+        """
+        Write the report to filename in the format of cProfile output files,
+        allowing it to be loaded using pstats.Stats(filename).
+        """
+        with open(filename, 'wb') as f:
+            marshal.dump(self.pstats(), f)
+
+    def folded(self, measurement='time', scale=1e6):
+        """
+        Format the report as folded stacks weighted by the own time of each
+        node in microseconds. See Report.folded.
+        """
+        return super(TimingReport, self).folded(measurement, scale)
+
+
+class Profiler(object):
+    """
+    Profiler is the base class of profilers measuring the cost of each node
+    of a Transformer graph. A node is identified by its path, being the
+    labels of the nodes from the root of the graph to the node, so that a
+    Transformer used in a number of places is measured separately in each.
+
+    Profiling is performed by calling the Transformer returned by
+    instrument, in which every node is wrapped in a Profiled transformer.
+    Measurements of a node include those of the nodes below it. Profilers
+    keep a single stack of the nodes being called, so an instrumented
+    Transformer must not be called from a number of threads at once.
+    """
+    _report_class = Report
+
+    def __init__(self):
+        self._nodes = OrderedDict()
+
+    def instrument(self, transformer):
+        """
+        :return: A copy of transformer reporting calls of its nodes to this
+                 Profiler
+        :rtype: Transformer
+        """
+        if not isinstance(transformer, Transformer):
+            raise TransformationException('{} is not a Transformer'.format(
+                transformer))
+        return _instrument(transformer, (describe(transformer),), self, {})
+
+    def _node(self, path):
+        node = self._nodes.get(path)
+        if node is None:
+            node = self._nodes[path] = self._report_class._node_class()
+        return node
+
+    def _enter(self, node):
+        raise NotImplementedError
+
+    def _exit(self, node):
+        raise NotImplementedError
+
+    def reset(self):
+        """
+        Discard the measurements made so far.
+        """
+        for node in self._nodes.values():
+            node.reset()
+
+    def report(self):
+        """
+        :return: A report of the measurements made so far. As the report is
+                 a copy, reports taken before and after a run may be compared
+                 using Report.diff.
+        :rtype: Report
+        """
+        return self._report_class((path, node.copy())
+                                  for path, node in self._nodes.items())
+
+
+class AllocationProfiler(Profiler):
+    """
+    An AllocationProfiler uses tracemalloc to attribute the memory allocated
+    while calling a Transformer graph to each of its nodes:
+
+    profiler = AllocationProfiler()
+    instrumented = profiler.instrument(pipeline)
+    with profiler:
+        for value in values:
+            instrumented(value)
+    print(profiler.report())
+
+    For each node the net bytes and blocks allocated by its calls are
+    reported, revealing the nodes whose results or side effects retain
+    memory, along with the peak allocated during a call, revealing nodes
+    allocating large temporary objects such as exceptions or intermediate
+    lists. Blocks are those of the Python object allocator, as counted by
+    sys.getallocatedblocks.
+
+    tracemalloc counts the allocations of every thread, so other threads
+    should be idle while profiling. Memory freed by a garbage collection
+    during a call, such as the reference cycles created by caught
+    exceptions, is counted against the node being called and may make its
+    net bytes negative; disabling the gc module while profiling attributes
+    such garbage to the nodes creating it instead.
+
+    The bookkeeping of the profiler is calibrated when tracing starts and
+    subtracted from the net bytes and blocks of each call, making them
+    accurate to within a few bytes per call. Peaks require Python 3.9+ and
+    are otherwise reported as 0.
+    """
+    _report_class = AllocationReport
+
+    def __init__(self, frames=1):
+        """
+        :param frames: The number of frames tracemalloc stores per
+                       allocation if tracing is started by this profiler
+        """
+        super(AllocationProfiler, self).__init__()
+        self.frames = frames
+        self._started = False
+        self._stack = []
+        self._depth = 0
+        self._bias = (0, 0)
+        self._reset_peak = getattr(tracemalloc, 'reset_peak', None)
+
+    def start(self):
+        """
+        Start tracing allocations, unless tracemalloc is already tracing.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started = True
+        self._bias = self._calibrate()
+
+    def stop(self):
+        """
+        Stop tracing allocations if tracing was started by this profiler.
+        """
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _calibrate(self, samples=64):
+        """
+        :return: The median net bytes and blocks measured for a node that
+                 allocates nothing
+        """
+        self._bias = (0, 0)
+        node = NodeAllocations()
+        measured = []
+        for _ in range(samples):
+            before = node.bytes, node.blocks
+            self._enter(node)
+            self._exit(node)
+            measured.append((node.bytes - before[0], node.blocks - before[1]))
+        measured.sort()
+        return measured[len(measured) // 2]
+
+    def _enter(self, node):
+        if self._depth == len(self._stack):
+            self._stack.append([0, 0, 0])
+        frame = self._stack[self._depth]
+        self._depth += 1
+        current, peak = tracemalloc.get_traced_memory()
+        if self._depth > 1:
+            parent = self._stack[self._depth - 2]
+            parent[2] = max(parent[2], peak)
+        if self._reset_peak is not None:
+            self._reset_peak()
+        frame[1] = sys.getallocatedblocks()
+        frame[0] = frame[2] = current
+
+    def _exit(self, node):
+        blocks = sys.getallocatedblocks()
+        current, peak = tracemalloc.get_traced_memory()
+        self._depth -= 1
+        frame = self._stack[self._depth]
+        bias_bytes, bias_blocks = self._bias
+        node.calls += 1
+        node.bytes += current - frame[0] - bias_bytes
+        node.blocks += blocks - frame[1] - bias_blocks
+        if self._reset_peak is not None:
+            peak = max(frame[2], peak)
+            node.peak = max(node.peak, peak - frame[0])
+            if self._depth:
+                parent = self._stack[self._depth - 1]
+                parent[2] = max(parent[2], peak)
+            self._reset_peak()
+
+
+class TimingProfiler(Profiler):
+    """
+    A TimingProfiler measures the time spent calling each node of a
+    Transformer graph:
+
+    profiler = TimingProfiler()
+    instrumented = profiler.instrument(pipeline)
+    for value in values:
+        instrumented(value)
+    profiler.report().dump_stats('pipeline.prof')
+
+    Unlike the output of cProfile, in which every node appears as a call of
+    Chain.__call__ or Tupling.__call__, the report identifies each node by
+    its position in the graph. The time of a node includes the overhead of
+    profiling the nodes below it.
+    """
+    _report_class = TimingReport
+
+    def __init__(self, timer=time.perf_counter):
+        """
+        :param timer: A callable returning the current time in seconds
+        """
+        super(TimingProfiler, self).__init__()
+        self.timer = timer
+        self._starts = []
+
+    def _enter(self, node):
+        self._starts.append(self.timer())
+
+    def _exit(self, node):
+        node.time += self.timer() - self._starts.pop()
+        node.calls += 1
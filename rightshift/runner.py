@@ -0,0 +1,291 @@
+"""
+Running Transformer pipelines over files from the command line. This module
+requires Python 3.
+"""
+import argparse
+from collections import deque
+import csv
+from importlib import import_module
+from itertools import islice
+import json
+from multiprocessing import Pool
+import sys
+import time
+from types import GeneratorType
+
+from rightshift import RightShiftException, Transformer
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+BUFFER_SIZE = 1 << 20
+"""
+The buffer size used when reading input and writing output files.
+"""
+
+
+class RunnerException(RightShiftException):
+    """
+    RunnerException is raised when a pipeline cannot be loaded or run.
+    """
+
+
+def load_transformer(spec):
+    """
+    Load a Transformer from a 'module:attribute' spec, where attribute may be
+    a dotted path to an attribute nested within the module.
+
+    :param spec: A string of the form 'package.module:name'
+    :rtype: Transformer
+    """
+    module_name, _, attribute = spec.partition(':')
+    if not module_name or not attribute:
+        raise RunnerException('Pipeline must be given as module:attribute, '
+                              'not {!r}'.format(spec))
+    try:
+        value = import_module(module_name)
+        for name in attribute.split('.'):
+            value = getattr(value, name)
+    except (ImportError, AttributeError) as e:
+        raise RunnerException('Unable to load {!r}: {}'.format(spec, e))
+    if not isinstance(value, Transformer):
+        raise RunnerException('{!r} is not a Transformer'.format(spec))
+    return value
+
+
+def _read_chunks(path, input_format, chunk_size, encoding):
+    """
+    Yield lists of at most chunk_size raw records from path. JSONL records
+    are yielded as undecoded lines so that decoding happens in the workers,
+    CSV records as dictionaries.
+    """
+    # Quoted CSV fields may contain newlines, which must not be translated
+    newline = '' if input_format == 'csv' else None
+    with open(path, 'r', encoding=encoding, newline=newline,
+              buffering=BUFFER_SIZE) as f:
+        if input_format == 'csv':
+            records = csv.DictReader(f)
+        else:
+            records = (line for line in f if line.strip())
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+_transformer = None
+_decode = False
+
+
+def _initialize(spec, decode):
+    global _transformer, _decode
+    _transformer = load_transformer(spec)
+    _decode = decode
+
+
+def _error(e):
+    return '{}: {}'.format(type(e).__name__, e)
+
+
+def _encode(result):
+    """
+    :return: An (ok, output) tuple containing either the result encoded as JSON
+             or an error message if it cannot be encoded
+    """
+    if isinstance(result, GeneratorType):
+        result = list(result)
+    try:
+        return True, json.dumps(result)
+    except (TypeError, ValueError) as e:
+        return False, _error(e)
+
+
+def _transform_one(value):
+    try:
+        result = _transformer(value)
+    except RightShiftException as e:
+        return False, _error(e)
+    return _encode(result)
+
+
+def _process_chunk(chunk):
+    """
+    Decode and transform a chunk of raw records, returning a list containing
+    an (ok, output) tuple per record, where output is the encoded result or
+    an error message.
+    """
+    values = []
+    outcomes = []
+    for record in chunk:
+        if _decode:
+            try:
+                record = json.loads(record)
+            except ValueError as e:
+                outcomes.append((False, _error(e)))
+                continue
+        values.append(record)
+        outcomes.append(None)
+    try:
+        results = iter([_encode(result)
+                        for result in _transformer.batch(values)])
+    except RightShiftException:
+        results = (_transform_one(value) for value in values)
+    return [
+        outcome if outcome is not None else next(results)
+        for outcome in outcomes
+    ]
+
+
+class _InProcessResult(object):
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def run(spec, input_path, output_path, reject_path=None, workers=1,
+        chunk_size=1000, input_format=None, stats=sys.stderr,
+        encoding='utf-8'):
+    """
+    Run the pipeline identified by spec over the records in input_path,
+    writing the result for each record as a line of JSON to output_path in
+    the order the records were read.
+
+    Records are read in chunks of chunk_size which are distributed over a pool
+    of worker processes, each of which loads the pipeline itself. At most two
+    chunks per worker are in flight at a time, bounding memory use.
+
+    Records for which the pipeline raises a RightShiftException, such as a
+    TransformationException, the BreakException raised by break_if and
+    break_if_not or a MatcherException raised by a comparison of the record,
+    or whose result cannot be encoded are written to reject_path, if
+    supplied, as a line of JSON containing the record and the error.
+
+    :param spec: The pipeline as a 'module:attribute' string
+    :param input_path: A JSONL or CSV file
+    :param output_path: The JSONL file to write results to
+    :param reject_path: An optional JSONL file to write failures to
+    :param workers: The number of worker processes. With 1 the pipeline is
+                    run in the current process.
+    :param chunk_size: The number of records per chunk
+    :param input_format: 'jsonl' or 'csv'. Defaults to detection using the
+                         extension of input_path.
+    :param stats: A file to write throughput statistics to, or None
+    :param encoding: The encoding of input_path and of the files written.
+                     Defaults to utf-8 regardless of the locale.
+    :return: A (succeeded, rejected) tuple of counts
+    """
+    if input_format is None:
+        input_format = 'csv' if input_path.lower().endswith('.csv') else 'jsonl'
+    decode = input_format != 'csv'
+    # Load the pipeline up front so that errors are raised here rather than
+    # repeatedly in the initializer of each worker
+    _initialize(spec, decode)
+    pool = None
+    if workers > 1:
+        pool = Pool(workers, _initialize, (spec, decode))
+    window = workers * 2 if pool is not None else 0
+    pending = deque()
+    counts = [0, 0]
+    start = time.time()
+    # Lines are terminated by \n alone on every platform
+    output = open(output_path, 'w', encoding=encoding, newline='',
+                  buffering=BUFFER_SIZE)
+    rejects = None
+    if reject_path:
+        rejects = open(reject_path, 'w', encoding=encoding, newline='')
+
+    def write(chunk, outcomes):
+        for record, (ok, result) in zip(chunk, outcomes):
+            if ok:
+                output.write(result)
+                output.write('\n')
+                counts[0] += 1
+                continue
+            counts[1] += 1
+            if rejects is not None:
+                rejects.write(json.dumps({
+                    'record': record.rstrip('\n') if decode else record,
+                    'error': result,
+                }))
+                rejects.write('\n')
+
+    try:
+        for chunk in _read_chunks(input_path, input_format, chunk_size,
+                                  encoding):
+            if pool is None:
+                result = _InProcessResult(_process_chunk(chunk))
+            else:
+                result = pool.apply_async(_process_chunk, (chunk,))
+            pending.append((chunk, result))
+            while len(pending) > window:
+                chunk, result = pending.popleft()
+                write(chunk, result.get())
+        while pending:
+            chunk, result = pending.popleft()
+            write(chunk, result.get())
+    except BaseException:
+        if pool is not None:
+            pool.terminate()
+        raise
+    else:
+        if pool is not None:
+            pool.close()
+    finally:
+        output.close()
+        if rejects is not None:
+            rejects.close()
+        if pool is not None:
+            pool.join()
+    succeeded, rejected = counts
+    elapsed = time.time() - start
+    if stats is not None:
+        total = succeeded + rejected
+        print('{} records in {:.2f}s ({:.0f} records/s): {} succeeded, '
+              '{} rejected'.format(total, elapsed,
+                                   total / elapsed if elapsed else 0,
+                                   succeeded, rejected), file=stats)
+    return succeeded, rejected
+
+
+def main(argv=None):
+    """
+    Entry point for python -m rightshift.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m rightshift',
+        description='Run rightshift pipelines over files')
+    commands = parser.add_subparsers(dest='command')
+    run_parser = commands.add_parser(
+        'run', help='Run a pipeline over a JSONL or CSV file')
+    run_parser.add_argument('pipeline',
+                            help='The pipeline as module:attribute')
+    run_parser.add_argument('--input', required=True,
+                            help='The JSONL or CSV file to read')
+    run_parser.add_argument('--output', required=True,
+                            help='The JSONL file to write results to')
+    run_parser.add_argument('--rejects',
+                            help='The JSONL file to write failures to')
+    run_parser.add_argument('--workers', type=int, default=1,
+                            help='The number of worker processes')
+    run_parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='The number of records per chunk')
+    run_parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            help='The input format. Defaults to detection '
+                                 'by file extension.')
+    run_parser.add_argument('--encoding', default='utf-8',
+                            help='The encoding of the files read and '
+                                 'written. Defaults to utf-8.')
+    arguments = parser.parse_args(argv)
+    if arguments.command != 'run':
+        parser.print_help()
+        return 2
+    try:
+        run(arguments.pipeline, arguments.input, arguments.output,
+            arguments.rejects, arguments.workers, arguments.chunk_size,
+            arguments.format, encoding=arguments.encoding)
+    except RunnerException as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
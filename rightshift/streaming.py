@@ -0,0 +1,354 @@
+from codecs import getincrementaldecoder
+from itertools import islice
+import json
+import re
+
+from future.utils import raise_from
+
+from rightshift import TransformationException
+from rightshift.extractors import ExtractorException
+from rightshift.paths import item_paths
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class StreamException(ExtractorException):
+    """
+    StreamException is raised when a stream cannot be parsed.
+    """
+
+
+_WHOLE = object()
+"""
+Marker used in a path trie to indicate that a value must be materialized in
+full.
+"""
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_CONTAINER_CONTENT = re.compile(
+    r'[^"\[\]{}]*(?:"(?:[^"\\]|\\.)*"[^"\[\]{}]*)*')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[\s,\]}:]')
+
+
+class _Reader(object):
+    """
+    An incremental JSON tokenizer over a file-like object. The stream is read
+    in chunks of chunk_size and consumed data is discarded from the buffer.
+    Values may be skipped without being materialized or captured as text and
+    decoded using the json module.
+    """
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = None
+        self.buffer = u''
+        self.position = 0
+        self.capture = None
+        self.capture_start = 0
+
+    def fill(self):
+        """
+        Read another chunk from the stream, returning False at the end of
+        the stream.
+        """
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            return False
+        if not isinstance(chunk, type(u'')):
+            if self.decoder is None:
+                self.decoder = getincrementaldecoder('utf-8')()
+            chunk = self.decoder.decode(chunk)
+        if self.capture is not None:
+            self.capture.append(self.buffer[self.capture_start:self.position])
+            self.capture_start = 0
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def error(self, message):
+        raise StreamException('{} near {!r}'.format(
+            message, self.buffer[self.position:self.position + 20]))
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character or the empty string at
+        the end of the stream.
+        """
+        while True:
+            self.position = _WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return u''
+
+    def expect(self, character):
+        if self.peek() != character:
+            self.error('Expected {!r}'.format(character))
+        self.position += 1
+
+    def skip_string(self):
+        self.position += 1
+        while True:
+            match = _STRING_SPECIAL.search(self.buffer, self.position)
+            if match is None:
+                self.position = len(self.buffer)
+            elif match.group() == u'"':
+                self.position = match.end()
+                return
+            elif match.end() < len(self.buffer):
+                self.position = match.end() + 1
+                continue
+            else:
+                self.position = match.start()
+            if not self.fill():
+                self.error('Unterminated string')
+
+    def skip_container(self, depth=0):
+        """
+        Skip a container, or the remainder of one when depth is supplied.
+        Runs of content other than brackets, including complete strings, are
+        consumed by a single regular expression match. A string that is not
+        terminated within the buffer is left to skip_string so that it is not
+        scanned again from its start after each fill.
+        """
+        while True:
+            self.position = _CONTAINER_CONTENT.match(self.buffer,
+                                                     self.position).end()
+            if self.position == len(self.buffer):
+                if not self.fill():
+                    self.error('Unterminated container')
+                continue
+            if self.buffer[self.position] == u'"':
+                self.skip_string()
+                continue
+            depth += 1 if self.buffer[self.position] in u'[{' else -1
+            self.position += 1
+            if depth == 0:
+                return
+
+    def skip_scalar(self):
+        while True:
+            match = _SCALAR_END.search(self.buffer, self.position)
+            if match is not None:
+                self.position = match.start()
+                return
+            self.position = len(self.buffer)
+            if not self.fill():
+                return
+
+    def skip_value(self):
+        character = self.peek()
+        if character == u'"':
+            self.skip_string()
+        elif character in (u'[', u'{'):
+            self.skip_container()
+        elif character:
+            self.skip_scalar()
+        else:
+            self.error('Unexpected end of stream')
+
+    def read_value(self):
+        """
+        Materialize the next value in full.
+        """
+        self.peek()
+        self.capture = []
+        self.capture_start = self.position
+        try:
+            self.skip_value()
+            self.capture.append(self.buffer[self.capture_start:self.position])
+            text = u''.join(self.capture)
+        finally:
+            self.capture = None
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            raise_from(StreamException, e)
+
+
+def _path_trie(paths):
+    """
+    Convert a set of item paths into a nested dictionary of keys with _WHOLE
+    marking the values that must be materialized in full.
+    """
+    trie = {}
+    for path in sorted(paths, key=len):
+        if not path:
+            return _WHOLE
+        node = trie
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+            if node is _WHOLE:
+                break
+        else:
+            node[path[-1]] = _WHOLE
+    return trie
+
+
+def _extract(reader, trie):
+    if trie is _WHOLE:
+        return reader.read_value()
+    character = reader.peek()
+    if character == u'{':
+        reader.position += 1
+        result = {}
+        if reader.peek() == u'}':
+            reader.position += 1
+            return result
+        while True:
+            if reader.peek() != u'"':
+                reader.error('Expected an object key')
+            key = reader.read_value()
+            reader.expect(u':')
+            if key in trie:
+                result[key] = _extract(reader, trie[key])
+            else:
+                reader.skip_value()
+            character = reader.peek()
+            if character == u'}':
+                reader.position += 1
+                return result
+            if character != u',':
+                reader.error('Expected , or }')
+            reader.position += 1
+    elif character == u'[':
+        reader.position += 1
+        result = []
+        if reader.peek() == u']':
+            reader.position += 1
+            return result
+        indices = [key for key in trie if isinstance(key, int)]
+        last = max(indices) if indices else -1
+        index = 0
+        while True:
+            if index in trie:
+                result.append(_extract(reader, trie[index]))
+            else:
+                reader.skip_value()
+                if index < last:
+                    result.append(None)
+            index += 1
+            if index > last:
+                reader.skip_container(1)
+                return result
+            character = reader.peek()
+            if character == u']':
+                reader.position += 1
+                return result
+            if character != u',':
+                reader.error('Expected , or ]')
+            reader.position += 1
+    return reader.read_value()
+
+
+def iter_records(buffer, separator=b'\n'):
+    """
+    Iterate over the records in a bytes-like buffer, such as a bytes,
+    bytearray, memoryview or mmap instance, yielding each record as a
+    memoryview into the buffer without copying or decoding it. The separator
+    is not included in the records and an empty trailing record is not
+    yielded.
+
+    The memoryviews hold a reference to the underlying buffer and thus an mmap
+    cannot be closed until they have been released.
+
+    Example:
+
+    with open('access.log', 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        status = pattern_group(br' ([0-9]{3}) ', encoding='ascii')
+        for record in iter_records(buffer):
+            yield status(record)
+
+    :param buffer: A bytes-like object
+    :param separator: The bytes separating records
+    :return: A generator of memoryview instances
+    """
+    view = memoryview(buffer)
+    start = 0
+    for match in re.compile(re.escape(separator)).finditer(buffer):
+        yield view[start:match.start()]
+        start = match.end()
+    if start < len(view):
+        yield view[start:]
+
+
+def load_paths(stream, paths, chunk_size=65536):
+    """
+    Incrementally parse a single JSON document from stream, a file-like object
+    opened in either text or binary mode, materializing only the subtrees
+    addressed by paths.
+
+    Objects along the paths are returned as dictionaries containing only the
+    addressed keys while arrays are returned as lists truncated after the last
+    addressed index, with None standing in for skipped elements. All other
+    values are skipped without being built. Accessing the result using the
+    paths supplied thus behaves exactly as it would against the full
+    document. Skipped values are only checked for balanced brackets and
+    strings, not validated in full.
+
+    :param stream: A file-like object
+    :param paths: An iterable of item paths as produced by item_paths
+    :param chunk_size: The number of characters or bytes read per chunk
+    :return: The sparse document
+    :raise: StreamException
+    """
+    reader = _Reader(stream, chunk_size)
+    result = _extract(reader, _path_trie(paths))
+    if reader.peek():
+        reader.error('Trailing data')
+    return result
+
+
+def transform_json(transformer, stream, chunk_size=65536, **flags):
+    """
+    Call transformer with the JSON document read from stream, materializing
+    only the parts of the document that transformer reads according to
+    rightshift.paths.item_paths.
+
+    Example:
+
+    transform_json(item.meta.id & item.records, open('large.json', 'rb'))
+
+    :param transformer: A Transformer instance
+    :param stream: A file-like object
+    :param chunk_size: The number of characters or bytes read per chunk
+    :param flags: Flags to call transformer with
+    :return: The result of calling transformer
+    """
+    document = load_paths(stream, item_paths(transformer), chunk_size)
+    return transformer(document, **flags)
+
+
+def _transform_batch(transformer, values, flags):
+    try:
+        return transformer.batch(values, **flags)
+    except TransformationException:
+        return (transformer(value, **flags) for value in values)
+
+
+def stream(transformer, values, batch_size=1000, **flags):
+    """
+    Lazily transform an iterable of values, yielding the results in order.
+    Values are read from the iterable in batches of batch_size which are
+    transformed using Transformer.batch, allowing batch-aware transformers
+    such as WrapBatch to operate in bulk.
+
+    If a batch fails then its values are transformed one at a time so that
+    the results preceding the failing value are yielded before the
+    TransformationException is raised.
+
+    :param transformer: A Transformer instance
+    :param values: An iterable of values
+    :param batch_size: The number of values transformed per batch
+    :param flags: Flags to call transformer with
+    :return: A generator of results
+    """
+    values = iter(values)
+    while True:
+        batch = list(islice(values, batch_size))
+        if not batch:
+            return
+        for result in _transform_batch(transformer, batch, flags):
+            yield result
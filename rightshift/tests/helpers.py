@@ -0,0 +1,29 @@
+"""
+Helpers shared by the tests of a number of modules.
+"""
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class Counter(object):
+    """
+    A callable counting the values it is called with and returning the
+    result of calling function with each.
+    """
+    def __init__(self, function=lambda value: value):
+        self.function = function
+        self.calls = 0
+
+    def __call__(self, value):
+        self.calls += 1
+        return self.function(value)
+
+
+class Clock(object):
+    """
+    A clock returning a time which is advanced explicitly.
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
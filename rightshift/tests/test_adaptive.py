@@ -0,0 +1,64 @@
+import pickle
+import unittest
+
+from rightshift import matchers, wrap
+from rightshift.adaptive import AdaptiveComparison, adapt
+from rightshift.extractors import item
+from rightshift.hedged import HedgedDetupling
+from rightshift.matchers import equal_to, gt
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class AdaptiveComparisonTest(unittest.TestCase):
+    def test_specialization(self):
+        comparison = AdaptiveComparison(gt(2), warmup=2)
+        self.assertEqual([comparison(v) for v in (1, 3, 5)],
+                         [False, True, True])
+        self.assertEqual(comparison.specialized, frozenset([int]))
+        self.assertTrue(comparison(2.5))
+
+    def test_copies_warm_up_afresh(self):
+        comparison = AdaptiveComparison(equal_to(1), warmup=1)
+        comparison(1)
+        for copy in (pickle.loads(pickle.dumps(comparison)),
+                     comparison._replace(warmup=2)):
+            self.assertEqual(copy.specialized, frozenset())
+            self.assertIsNot(copy._lock, comparison._lock)
+            self.assertIsNot(copy._observed, comparison._observed)
+            self.assertTrue(copy(1))
+        self.assertEqual(comparison.specialized, frozenset([int]))
+
+
+class AdaptTest(unittest.TestCase):
+    def test_results(self):
+        transformer = (item.a >> gt(1)) & (item.b >> equal_to('x'))
+        adapted = adapt(transformer, warmup=1)
+        for value in ({'a': 2, 'b': 'x'}, {'a': 0, 'b': 'y'}) * 2:
+            self.assertEqual(list(adapted(value)), list(transformer(value)))
+
+    def test_private_state_is_not_shared(self):
+        """
+        Adapting a transformer copies it with _replace, which must create
+        private state such as locks and statistics afresh.
+        """
+        hedged = HedgedDetupling([wrap(abs) >> gt(1)], hedge_delay=0)
+        hedged(-5)
+        adapted = adapt(hedged)
+        self.assertIsNot(adapted._lock, hedged._lock)
+        self.assertIsNot(adapted._stats, hedged._stats)
+        self.assertEqual(adapted.stats()[0]['started'], 0)
+        self.assertTrue(adapted(-5))
+        adapted.close()
+        hedged.close()
+
+    def test_value_is_builder(self):
+        transformer = matchers.item.a
+        transformer.value_is
+        copy = transformer._replace()
+        self.assertIs(copy.value_is.left, copy)
+        self.assertTrue((copy.value_is == 1)({'a': 1}))
+
+
+if __name__ == '__main__':
+    unittest.main()
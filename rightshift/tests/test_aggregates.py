@@ -0,0 +1,97 @@
+import pickle
+import unittest
+
+from rightshift import wrap
+from rightshift.aggregates import (AggregateException, count, distinct_count,
+                                   group_by, maximum, mean, minimum, total,
+                                   variance)
+from rightshift.extractors import item
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+VALUES = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5]
+
+
+class AggregateTest(unittest.TestCase):
+    """
+    Aggregates must match their builtin equivalents and merging the partial
+    states of any split of a stream must produce the result of the whole.
+    """
+    def _check_merge(self, aggregate, values):
+        expected = aggregate(values)
+        for split in range(len(values) + 1):
+            state = aggregate.merge(aggregate.partial(values[:split]),
+                                    aggregate.partial(values[split:]))
+            self.assertAlmostEqual(aggregate.result(state), expected)
+            self.assertAlmostEqual(aggregate.combine([
+                aggregate.partial(values[:split]),
+                aggregate.partial(values[split:]),
+            ]), expected)
+
+    def test_count(self):
+        self.assertEqual(count()(VALUES), len(VALUES))
+        self._check_merge(count(), VALUES)
+
+    def test_sum(self):
+        self.assertEqual(total()(VALUES), sum(VALUES))
+        self.assertEqual(total(item.x)({'x': v} for v in VALUES), sum(VALUES))
+        self._check_merge(total(), VALUES)
+
+    def test_min_max(self):
+        self.assertEqual(minimum()(VALUES), min(VALUES))
+        self.assertEqual(maximum()(VALUES), max(VALUES))
+        self._check_merge(minimum(), VALUES)
+        self._check_merge(maximum(), VALUES)
+
+    def test_min_max_default(self):
+        with self.assertRaises(AggregateException):
+            minimum()([])
+        self.assertIsNone(minimum(default=None)([]))
+        self.assertEqual(maximum(default=())([]), ())
+        self.assertEqual(maximum(default=())(VALUES), 9)
+
+    def test_min_default_pickled(self):
+        aggregate = pickle.loads(pickle.dumps(minimum(wrap(abs))))
+        with self.assertRaises(AggregateException):
+            aggregate([])
+        aggregate = pickle.loads(pickle.dumps(minimum(wrap(abs), default=())))
+        self.assertEqual(aggregate([]), ())
+
+    def test_mean_variance(self):
+        n = float(len(VALUES))
+        expected_mean = sum(VALUES) / n
+        expected_variance = sum((v - expected_mean) ** 2 for v in VALUES) / n
+        self.assertAlmostEqual(mean()(VALUES), expected_mean)
+        self.assertAlmostEqual(variance()(VALUES), expected_variance)
+        self.assertAlmostEqual(variance(ddof=1)(VALUES),
+                               expected_variance * n / (n - 1))
+        self._check_merge(mean(), VALUES)
+        self._check_merge(variance(), VALUES)
+        with self.assertRaises(AggregateException):
+            mean()([])
+
+    def test_group_by(self):
+        orders = [{'region': r, 'price': p}
+                  for r, p in zip('abab' * 3, range(12))]
+        aggregate = group_by(item.region, total(item.price))
+        self.assertEqual(aggregate(orders), {'a': 30, 'b': 36})
+        left = aggregate.partial(orders[:5])
+        right = aggregate.partial(orders[5:])
+        state = aggregate.merge(aggregate.initial(), left)
+        state = aggregate.merge(state, right)
+        self.assertEqual(aggregate.result(state), {'a': 30, 'b': 36})
+        self.assertEqual(aggregate.result(left), {'a': 6, 'b': 4})
+
+    def test_distinct_count(self):
+        values = [i % 5000 for i in range(20000)]
+        estimate = distinct_count(precision=12)(values)
+        self.assertLess(abs(estimate - 5000), 5000 * 0.05)
+        aggregate = distinct_count()
+        state = aggregate.merge(aggregate.partial(values[:10000]),
+                                aggregate.partial(values[10000:]))
+        self.assertEqual(aggregate.result(state), estimate)
+
+
+if __name__ == '__main__':
+    unittest.main()
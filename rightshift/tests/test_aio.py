@@ -0,0 +1,149 @@
+import asyncio
+import time
+import unittest
+
+from rightshift import (detupling, record, TransformationException, wrap,
+                        WrapBatch)
+from rightshift.aio import acall, astream
+from rightshift.chains import flags
+from rightshift.extractors import item
+from rightshift.hedged import HedgedDetupling
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+def _run(coroutine):
+    """
+    Run coroutine in a new event loop, which is not set as the current loop.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def _slow(value):
+    time.sleep(0.5)
+    return 'slow'
+
+
+async def _fetch(value):
+    await asyncio.sleep(0)
+    return {'value': value}
+
+
+async def _delayed(value):
+    await asyncio.sleep(value / 100.0)
+    return value
+
+
+async def _collect(stream):
+    return [result async for result in stream]
+
+
+class AcallTest(unittest.TestCase):
+    def test_acall(self):
+        self.assertEqual(_run(acall(wrap(abs), -1)), 1)
+        with self.assertRaises(TransformationException):
+            _run(acall(wrap(abs), 'a'))
+
+    def test_hedged(self):
+        hedged = HedgedDetupling([wrap(_slow), wrap(lambda value: 'fast')],
+                                 hedge_delay=0.01)
+        self.addCleanup(hedged.close)
+        self.assertEqual(_run(acall(hedged, None)), 'slow')
+        hedged = HedgedDetupling([wrap(abs), wrap(lambda value: 'fast')],
+                                 hedge_delay=0.01)
+        self.addCleanup(hedged.close)
+        self.assertEqual(_run(acall(hedged, 'a')), 'fast')
+
+    def test_coalesce(self):
+        batches = []
+
+        def double(values):
+            batches.append(list(values))
+            return [value * 2 for value in values]
+        batch = WrapBatch(double, max_batch=3, max_wait=0.1)
+
+        async def calls():
+            return await asyncio.gather(*[acall(batch, value)
+                                          for value in range(4)])
+        self.assertEqual(_run(calls()), [0, 2, 4, 6])
+        self.assertEqual(batches, [[0, 1, 2], [3]])
+
+
+    def test_coroutine_wrap_in_chain(self):
+        transformer = wrap(abs) >> wrap(_fetch) >> item.value
+        self.assertEqual(_run(acall(transformer, -2)), 2)
+        transformer = flags(x=1) > (wrap(_fetch) >> item.value)
+        self.assertEqual(_run(acall(transformer, 3)), 3)
+
+    def test_coroutine_wrap_in_tupling(self):
+        transformer = (wrap(_fetch) >> item.value) & wrap(abs)
+        self.assertEqual(_run(acall(transformer, -1)), [-1, 1])
+        transformer = record(('fetched', wrap(_fetch) >> item.value),
+                             ('absolute', wrap(abs)))
+        self.assertEqual(_run(acall(transformer, -1)),
+                         {'fetched': -1, 'absolute': 1})
+
+    def test_coroutine_wrap_rejected(self):
+        transformer = detupling(wrap(_fetch) >> item.value, wrap(abs))
+        with self.assertRaises(TransformationException):
+            _run(acall(transformer, 1))
+        transformer = detupling(wrap(_fetch), wrap(abs))
+        self.assertEqual(_run(acall(transformer, 1)), {'value': 1})
+
+
+class AstreamTest(unittest.TestCase):
+    VALUES = [5, 1, 3, 0, 2]
+
+    def test_ordered(self):
+        self.assertEqual(_run(_collect(astream(wrap(_delayed), self.VALUES))),
+                         self.VALUES)
+
+    def test_unordered(self):
+        results = _run(_collect(astream(wrap(_delayed), self.VALUES,
+                                        ordered=False)))
+        self.assertEqual(results, sorted(self.VALUES))
+
+    def test_backpressure(self):
+        """
+        The source is only read while fewer than concurrency values are in
+        flight.
+        """
+        in_flight = []
+        peak = []
+
+        async def source():
+            for value in range(20):
+                in_flight.append(value)
+                peak.append(len(in_flight))
+                yield value
+
+        async def transform(value):
+            await asyncio.sleep(0.001)
+            in_flight.remove(value)
+            return value
+
+        results = _run(_collect(astream(wrap(transform), source(),
+                                        concurrency=3)))
+        self.assertEqual(results, list(range(20)))
+        self.assertLessEqual(max(peak), 3)
+
+    def test_on_error(self):
+        errors = []
+
+        async def on_error(value, error):
+            errors.append(value)
+
+        results = _run(_collect(astream(wrap(abs), [1, 'a', -2, None],
+                                        on_error=on_error)))
+        self.assertEqual(results, [1, 2])
+        self.assertEqual(errors, ['a', None])
+        with self.assertRaises(TransformationException):
+            _run(_collect(astream(wrap(abs), [1, 'a', -2])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+from threading import Lock, Thread
+import unittest
+
+from rightshift import (TransformationException, Value, WrapBatch, record,
+                        tupling, wrap)
+from rightshift.chains import default, flags
+from rightshift.extractors import item
+from rightshift.matchers import MatcherException
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class _Recorder(object):
+    """
+    A batch callable recording the batches it is called with.
+    """
+    def __init__(self, function=lambda value: value * 2):
+        self.function = function
+        self.batches = []
+        self.lock = Lock()
+
+    def __call__(self, values):
+        with self.lock:
+            self.batches.append(list(values))
+        return [self.function(value) for value in values]
+
+
+def _call_in_threads(transformer, calls, timeout=5):
+    """
+    Call transformer from a thread per (value, flags) tuple, returning the
+    results or exceptions in the order of calls.
+    """
+    outcomes = [None] * len(calls)
+
+    def run(index, value, call_flags):
+        try:
+            outcomes[index] = transformer(value, **call_flags)
+        except BaseException as e:
+            outcomes[index] = e
+
+    threads = [Thread(target=run, args=(index, value, call_flags))
+               for index, (value, call_flags) in enumerate(calls)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join(timeout)
+    return [thread.is_alive() for thread in threads], outcomes
+
+
+class WrapBatchTest(unittest.TestCase):
+    def test_batch_splits_by_max_batch(self):
+        recorder = _Recorder()
+        transformer = WrapBatch(recorder, max_batch=3)
+        self.assertEqual(transformer.batch(range(7)),
+                         [0, 2, 4, 6, 8, 10, 12])
+        self.assertEqual(recorder.batches, [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_call_without_coalescing(self):
+        recorder = _Recorder()
+        transformer = WrapBatch(recorder)
+        self.assertEqual(transformer(4), 8)
+        self.assertEqual(recorder.batches, [[4]])
+
+    def test_wrong_number_of_results(self):
+        transformer = WrapBatch(lambda values: values[1:])
+        with self.assertRaises(TransformationException):
+            transformer.batch([1, 2])
+
+    def test_coalescing(self):
+        recorder = _Recorder()
+        transformer = WrapBatch(recorder, max_batch=4, max_wait=10)
+        alive, outcomes = _call_in_threads(transformer,
+                                           [(i, {}) for i in range(4)])
+        self.assertFalse(any(alive))
+        self.assertEqual(outcomes, [0, 2, 4, 6])
+        self.assertEqual(len(recorder.batches), 1)
+
+    def test_coalescing_by_flags(self):
+        recorder = _Recorder()
+        transformer = WrapBatch(recorder, max_batch=2, max_wait=10)
+        calls = [(1, {'x': 1}), (2, {'x': 2}), (1, {'x': 1}), (2, {'x': 2})]
+        alive, outcomes = _call_in_threads(transformer, calls)
+        self.assertFalse(any(alive))
+        self.assertEqual(outcomes, [2, 4, 2, 4])
+        self.assertEqual(sorted(recorder.batches), [[1, 1], [2, 2]])
+
+    def test_unhashable_flags_are_not_coalesced(self):
+        recorder = _Recorder()
+        transformer = WrapBatch(recorder, max_batch=2, max_wait=10)
+        self.assertEqual(transformer(3, x=[]), 6)
+        self.assertEqual(recorder.batches, [[3]])
+
+    def test_followers_are_released_on_any_exception(self):
+        def failing(values):
+            raise MatcherException('failed')
+        transformer = WrapBatch(failing, max_batch=3, max_wait=10)
+        alive, outcomes = _call_in_threads(transformer,
+                                           [(i, {}) for i in range(3)])
+        self.assertFalse(any(alive))
+        for outcome in outcomes:
+            self.assertIsInstance(outcome, MatcherException)
+
+
+class CompositeBatchTest(unittest.TestCase):
+    """
+    Composite Transformers pass batches through to the Transformers they are
+    composed of, producing the same results as calling them per value.
+    """
+    VALUES = [{'x': i, 'y': -i} for i in range(5)]
+
+    def setUp(self):
+        self.recorder = _Recorder()
+        self.doubled = WrapBatch(self.recorder)
+
+    def _check(self, transformer):
+        expected = [transformer(value) for value in self.VALUES]
+        del self.recorder.batches[:]
+        self.assertEqual(transformer.batch(self.VALUES), expected)
+        self.assertEqual(len(self.recorder.batches), 1)
+
+    def test_chain(self):
+        self._check(item.x >> self.doubled >> wrap(abs))
+
+    def test_tupling(self):
+        self._check(tupling(item.x >> self.doubled, item.y, Value(1)))
+
+    def test_record(self):
+        self._check(record(('a', item.x >> self.doubled), ('b', item.y)))
+        self._check(record(a=item.y >> self.doubled, output='tuple'))
+
+    def test_flags_chain(self):
+        self._check(flags(errors='fast') > item.x >> self.doubled)
+
+    def test_default_chain(self):
+        transformer = (item.z >> self.doubled) >> default(0)
+        self.assertEqual(transformer.batch(self.VALUES), [0] * 5)
+        transformer = (item.x >> self.doubled) >> default(0)
+        self.assertEqual(transformer.batch(self.VALUES + [{}]),
+                         [0, 2, 4, 6, 8, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import pickle
+import unittest
+
+from rightshift import Transformer
+from rightshift.chains import FlagsChain, flags
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class _Flag(Transformer):
+    """
+    Returns the name flag it is called with.
+    """
+    def __call__(self, value, **flags):
+        return flags.get('name')
+
+
+class FlagsChainTest(unittest.TestCase):
+    def setUp(self):
+        self.chain = flags(name='a', other=1) > _Flag()
+
+    def test_flags(self):
+        self.assertIsInstance(self.chain, FlagsChain)
+        self.assertEqual(self.chain(None), 'a')
+        self.assertEqual(self.chain(None, name='b'), 'b')
+        self.assertEqual(self.chain.batch([None, None]), ['a', 'a'])
+
+    def test_flags_are_read_only(self):
+        self.assertEqual(self.chain.flags, (('name', 'a'), ('other', 1)))
+        with self.assertRaises(AttributeError):
+            self.chain.flags = ()
+        self.assertEqual(FlagsChain({'other': 1, 'name': 'a'},
+                                    self.chain.left), self.chain)
+        self.assertEqual(pickle.loads(pickle.dumps(self.chain))(None), 'a')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import pickle
+import unittest
+
+from rightshift import (fail, LazyMessage, Record, record,
+                        TransformationException, Value)
+from rightshift.extractors import item
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class _Formatted(object):
+    """
+    A value counting the number of times it is formatted.
+    """
+    def __init__(self):
+        self.formats = 0
+
+    def __format__(self, spec):
+        self.formats += 1
+        return 'formatted'
+
+
+def _fail(flags, template=None, args=()):
+    """
+    Fail with flags while handling a KeyError, returning the exception.
+    """
+    try:
+        try:
+            {}['missing']
+        except KeyError as e:
+            fail(TransformationException, flags, template, args, cause=e)
+    except TransformationException as e:
+        return e
+
+
+class FailTest(unittest.TestCase):
+    def test_default(self):
+        value = _Formatted()
+        exception = _fail({}, 'Failed on {}', (value,))
+        self.assertEqual(value.formats, 1)
+        self.assertEqual(str(exception), 'Failed on formatted')
+        self.assertIsInstance(exception.__cause__, KeyError)
+        self.assertIsInstance(_fail({}).__cause__, KeyError)
+
+    def test_fast(self):
+        value = _Formatted()
+        exception = _fail({'errors': 'fast'}, 'Failed on {}', (value,))
+        self.assertIsNone(exception.__cause__)
+        self.assertEqual(value.formats, 0)
+        message, = exception.args
+        self.assertIsInstance(message, LazyMessage)
+        self.assertEqual(str(exception), 'Failed on formatted')
+        self.assertEqual(value.formats, 1)
+        exception = _fail({'errors': 'fast'})
+        self.assertIsNone(exception.__cause__)
+        self.assertEqual(exception.args, ())
+
+
+class RecordTest(unittest.TestCase):
+    VALUE = {'name': 'x', 'size': 2}
+
+    def test_dict(self):
+        transformer = record(('name', item.name), size=item.size, kind='file')
+        self.assertEqual(transformer.output, 'dict')
+        self.assertIsNone(transformer.record_class)
+        self.assertEqual(transformer(self.VALUE),
+                         {'name': 'x', 'size': 2, 'kind': 'file'})
+        self.assertEqual(transformer.batch([self.VALUE]),
+                         [transformer(self.VALUE)])
+        self.assertEqual(Record({'a': 1}).transformers, (Value(1),))
+
+    def test_namedtuple(self):
+        transformer = record(('name', item.name), ('size', item.size),
+                             output='namedtuple')
+        result = transformer(self.VALUE)
+        self.assertIsInstance(result, transformer.record_class)
+        self.assertEqual(result._fields, ('name', 'size'))
+        self.assertEqual((result.name, result.size), ('x', 2))
+        self.assertEqual(transformer.batch([self.VALUE]), [result])
+        copied = pickle.loads(pickle.dumps(transformer))
+        self.assertEqual(copied.record_class._fields, ('name', 'size'))
+        self.assertEqual(tuple(copied(self.VALUE)), ('x', 2))
+
+    def test_tuple(self):
+        transformer = record(('name', item.name), ('size', item.size),
+                             output='tuple')
+        self.assertEqual(transformer.names, ('name', 'size'))
+        self.assertIsNone(transformer.record_class)
+        self.assertEqual(transformer(self.VALUE), ('x', 2))
+        self.assertEqual(transformer.batch([self.VALUE, self.VALUE]),
+                         [('x', 2), ('x', 2)])
+
+    def test_output_field(self):
+        transformer = record(output=item.name)
+        self.assertEqual(transformer(self.VALUE), {'output': 'x'})
+
+    def test_invalid(self):
+        with self.assertRaises(TransformationException):
+            record(('name', item.name), output='list')
+        with self.assertRaises(TransformationException):
+            Record([('name', item.name)], output=None)
+        with self.assertRaises(TransformationException):
+            record(('not valid', item.name), output='namedtuple')
+        with self.assertRaises(TransformationException):
+            record(output='tuple')
+
+
+if __name__ == '__main__':
+    unittest.main()
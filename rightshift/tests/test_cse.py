@@ -0,0 +1,56 @@
+import pickle
+import unittest
+
+from rightshift import Value, wrap
+from rightshift.cse import CommonSubexpressions, cse
+from rightshift.extractors import item
+from rightshift.matchers import equal_to
+from rightshift.tests.helpers import Counter
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class StructuralEqualityTest(unittest.TestCase):
+    def test_equality(self):
+        self.assertEqual(equal_to(5), equal_to(5))
+        self.assertEqual(hash(equal_to(5)), hash(equal_to(5)))
+        self.assertEqual(item.a >> wrap(abs), item.a >> wrap(abs))
+        self.assertNotEqual(equal_to(5), equal_to(6))
+        self.assertNotEqual(Value(1), Value(True))
+        self.assertNotEqual(item.a >> wrap(abs), item.b >> wrap(abs))
+
+    def test_hash_is_cached(self):
+        transformer = item.a >> wrap(abs)
+        value = hash(transformer)
+        self.assertEqual(transformer.__dict__['_hash'], value)
+        self.assertEqual(hash(transformer), value)
+
+    def test_cached_hash_is_not_copied(self):
+        transformer = wrap(abs) >> equal_to(5)
+        hash(transformer)
+        self.assertNotIn('_hash', pickle.loads(pickle.dumps(transformer))
+                         .__dict__)
+        replaced = transformer._replace(right=equal_to(6))
+        self.assertNotEqual(replaced, transformer)
+        self.assertEqual(replaced, wrap(abs) >> equal_to(6))
+
+
+class EliminateCommonSubexpressionsTest(unittest.TestCase):
+    def test_shared_prefix(self):
+        counter = Counter()
+        parse = item.body >> wrap(counter)
+        transformer = (parse >> item.a) & (parse >> item.b)
+        optimized = cse(transformer)
+        self.assertIsInstance(optimized, CommonSubexpressions)
+        value = {'body': {'a': 1, 'b': 2}}
+        self.assertEqual(list(optimized(value)), [1, 2])
+        self.assertEqual(counter.calls, 1)
+        self.assertEqual(list(optimized(value)), list(transformer(value)))
+
+    def test_no_common_subexpressions(self):
+        transformer = (item.a >> wrap(abs)) & (item.b >> wrap(abs))
+        self.assertIs(cse(transformer), transformer)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import pickle
+import unittest
+
+from rightshift.dedup import distinct, DistinctException
+from rightshift.extractors import item
+from rightshift.tests.helpers import Clock
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class DistinctTest(unittest.TestCase):
+    def test_exact(self):
+        dedup = distinct(key=item.id)
+        records = [{'id': 1}, {'id': 2}, {'id': 1, 'other': True}]
+        self.assertEqual(list(dedup(records)), records[:2])
+        # Keys are remembered across calls
+        self.assertEqual(list(dedup([{'id': 2}, {'id': 3}])), [{'id': 3}])
+        stats = dedup.stats()
+        self.assertEqual((stats['values'], stats['duplicates'], stats['keys']),
+                         (5, 2, 3))
+        self.assertAlmostEqual(stats['duplicate_rate'], 0.4)
+        self.assertGreater(stats['bytes'], 0)
+
+    def test_exact_bounded(self):
+        dedup = distinct(max_keys=2)
+        self.assertEqual(list(dedup([1, 2, 1, 3, 2])), [1, 2, 3, 2])
+        self.assertEqual(len(dedup.seen), 2)
+
+    def test_recent(self):
+        clock = Clock()
+        dedup = distinct(strategy='recent', seconds=10, clock=clock)
+        self.assertTrue(dedup.is_new('a'))
+        clock.now = 5
+        self.assertFalse(dedup.is_new('a'))
+        clock.now = 10
+        self.assertTrue(dedup.is_new('a'))
+
+    def test_approximate(self):
+        dedup = distinct(strategy='approximate', max_keys=1000,
+                         error_rate=0.01)
+        # New keys are mistaken for duplicates at about error_rate
+        first = list(dedup(range(1000)))
+        self.assertGreater(len(first), 970)
+        # Keys remembered are never mistaken for new keys
+        self.assertEqual(list(dedup(first)), [])
+        new = list(dedup(range(1000, 3000)))
+        self.assertGreater(len(new), 1900)
+        # Two filters of about 10 bits per key
+        self.assertLess(dedup.stats()['bytes'], 4096)
+
+    def test_clear(self):
+        dedup = distinct()
+        list(dedup([1, 1]))
+        dedup.clear()
+        self.assertEqual(dedup.stats()['values'], 0)
+        self.assertTrue(dedup.is_new(1))
+
+    def test_unhashable(self):
+        dedup = distinct()
+        with self.assertRaises(DistinctException):
+            list(dedup([[1]]))
+
+    def test_invalid(self):
+        for kwargs in ({'key': 'id'}, {'strategy': 'other'},
+                       {'max_keys': 0}, {'strategy': 'recent'},
+                       {'strategy': 'approximate', 'error_rate': 1}):
+            with self.assertRaises(DistinctException):
+                distinct(**kwargs)
+
+    def test_pickle(self):
+        for strategy in ('exact', 'approximate'):
+            dedup = distinct(strategy=strategy)
+            list(dedup([1, 2]))
+            copy = pickle.loads(pickle.dumps(dedup.seen))
+            self.assertFalse(copy.add(1))
+            self.assertTrue(copy.add(3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from rightshift import wrap
+from rightshift.diskcache import ACCESS_BATCH, disk_cache, DiskStore
+from rightshift.tests.helpers import Counter
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class _TestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'cache.db')
+
+
+class DiskCacheChainTest(_TestCase):
+    def test_cached(self):
+        counter = Counter(lambda value: value * 2)
+        cached = wrap(counter) >> disk_cache(self.path)
+        self.addCleanup(cached.close)
+        self.assertEqual([cached(value) for value in (1, 2, 1, 1)],
+                         [2, 4, 2, 2])
+        self.assertEqual(cached.batch([1, 2, 3]), [2, 4, 6])
+        self.assertEqual(counter.calls, 3)
+        stats = cached.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (4, 3))
+
+
+class DiskStoreTest(_TestCase):
+    def _store(self, max_bytes):
+        store = DiskStore(self.path, max_bytes)
+        self.addCleanup(store.close)
+        return store
+
+    def _accessed(self, store, key):
+        return store._connection().execute(
+            'SELECT accessed FROM results WHERE key = ?', (key,)).fetchone()[0]
+
+    def test_access_times_are_batched(self):
+        store = self._store(1 << 20)
+        store.put('a', 1)
+        accessed = self._accessed(store, 'a')
+        for _ in range(ACCESS_BATCH - 1):
+            self.assertEqual(store.get('a'), (True, 1))
+        self.assertEqual(self._accessed(store, 'a'), accessed)
+        store.get('a')
+        self.assertGreater(self._accessed(store, 'a'), accessed)
+
+    def test_eviction_uses_held_access_times(self):
+        store = self._store(1 << 20)
+        value = b'x' * 1000
+        size = None
+        for key in ('a', 'b'):
+            store.put(key, value)
+            size = size or store.size()
+        store.close()
+        store = self._store(size * 2)
+        store.get('a')
+        store.put('c', value)
+        self.assertEqual(store.evictions, 1)
+        self.assertEqual(store.get('b'), (False, None))
+        self.assertEqual(store.get('a'), (True, value))
+
+    def test_total_disagrees_with_results(self):
+        """
+        A total larger than the stored results must not loop forever, and is
+        recomputed.
+        """
+        store = self._store(1000)
+        store.put('a', 1)
+        store._write(lambda connection: connection.execute(
+            "UPDATE totals SET value = 1000000 WHERE name = 'size'"))
+        store.put('b', 2)
+        self.assertEqual(store.size(), 0)
+        self.assertEqual(store.get('b'), (False, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import mmap
+import tempfile
+import unittest
+
+from rightshift import extractors
+from rightshift.caches import LRUCache
+from rightshift.extractors import (attr, compile_path, ExtractorException,
+                                   find_keywords, item, Item, ItemPath,
+                                   pattern_group)
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class PathTest(unittest.TestCase):
+    VALUE = {'a': {'b': [{'c': 1}, {'c': 2}, {'c': 3}]}}
+
+    def test_valid(self):
+        path = item.path("a.b[0]['c']")
+        self.assertIsInstance(path, ItemPath)
+        self.assertEqual(path(self.VALUE), 1)
+        self.assertEqual(item.path('a.b[-1].c')(self.VALUE), 3)
+        self.assertEqual(item.path('a.b[1:]')(self.VALUE),
+                         [{'c': 2}, {'c': 3}])
+        self.assertEqual(item.path('[1][0]')([[0], [1]]), 1)
+        self.assertEqual(item.path('["a.b"]')({'a.b': 1}), 1)
+        self.assertEqual(attr.path('real')(1), 1)
+        with self.assertRaises(ExtractorException):
+            item.path('a.x')(self.VALUE)
+
+    def test_invalid(self):
+        for path in ('', '.a', 'a.', 'a..b', 'a[0]b', '[0]a', 'a[x]',
+                     'a[0', 'a b'):
+            with self.assertRaises(ExtractorException):
+                item.path(path)
+
+    def test_cache(self):
+        original = extractors.path_cache
+        extractors.path_cache = LRUCache(2)
+        self.addCleanup(setattr, extractors, 'path_cache', original)
+        first = compile_path(Item, 'a')
+        self.assertIs(item.path('a'), first)
+        compile_path(Item, 'b')
+        compile_path(Item, 'a')
+        compile_path(Item, 'c')
+        self.assertEqual(len(extractors.path_cache), 2)
+        self.assertIs(compile_path(Item, 'a'), first)
+        self.assertNotIn((Item, 'b'), extractors.path_cache)
+
+
+class PatternGroupTest(unittest.TestCase):
+    def test_bytes_like(self):
+        extract = pattern_group(br'status=(\d+)')
+        for value in (b'a status=200 b', bytearray(b'a status=200 b'),
+                      memoryview(b'a status=200 b')):
+            self.assertEqual(extract(value), b'200')
+        with self.assertRaises(ExtractorException):
+            extract(b'status=')
+
+    def test_mmap(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(b'x' * mmap.PAGESIZE + b' name=caf\xc3\xa9 ')
+            f.flush()
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                extract = pattern_group(br'name=(\S+)', encoding='utf-8')
+                self.assertEqual(extract(buffer), u'caf\u00e9')
+            finally:
+                buffer.close()
+
+    def test_encoding(self):
+        value = b'name=caf\xc3\xa9'
+        self.assertEqual(pattern_group(br'name=(\S+)')(value),
+                         b'caf\xc3\xa9')
+        extract = pattern_group(br'name=(\S+)', encoding='utf-8')
+        self.assertEqual(extract(value), u'caf\u00e9')
+        self.assertEqual(extract(value, pattern_group__encoding='latin-1'),
+                         u'caf\u00c3\u00a9')
+        with self.assertRaises(ExtractorException):
+            extract(value, pattern_group__encoding='ascii')
+        self.assertIsNone(
+            pattern_group(br'name=(x)?', encoding='utf-8')(value))
+
+
+class FindKeywordsTest(unittest.TestCase):
+    def test_find(self):
+        extract = find_keywords(['ERROR', 'WARNING'])
+        self.assertEqual(extract('a WARNING then an ERROR'), 'WARNING')
+        self.assertEqual(find_keywords(['ERROR', 'WARNING'], True)(
+            'a WARNING then an ERROR'), ['WARNING', 'ERROR'])
+        with self.assertRaises(ExtractorException):
+            extract('INFO')
+
+    def test_mismatched_type(self):
+        with self.assertRaises(ExtractorException) as context:
+            find_keywords(['ERROR'])(b'ERROR')
+        self.assertEqual(str(context.exception),
+                         "Cannot search b'ERROR' for keywords")
+        self.assertIsInstance(context.exception.__cause__, TypeError)
+
+
+if __name__ == '__main__':
+    unittest.main()
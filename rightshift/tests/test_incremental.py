@@ -0,0 +1,107 @@
+import copy
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from rightshift import TransformationException, record, wrap
+from rightshift.extractors import item
+from rightshift.incremental import Incremental, diff_paths
+from rightshift.tests.helpers import Counter
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class DiffPathsTest(unittest.TestCase):
+    def test_diff_paths(self):
+        self.assertEqual(diff_paths({'a': 1, 'b': [1, 2]},
+                                    {'a': 1, 'b': [1, 3]}), {('b', 1)})
+        self.assertEqual(diff_paths({'a': 1}, {'b': 1}), {('a',), ('b',)})
+        self.assertEqual(diff_paths([1], [1, 2]), {(1,)})
+        self.assertEqual(diff_paths({'a': 1}, {'a': True}), {('a',)})
+        self.assertEqual(diff_paths({'a': {'b': []}}, {'a': {'b': []}}),
+                         set())
+
+
+class IncrementalTest(unittest.TestCase):
+    DOCUMENT = {'meta': {'id': 1, 'tags': ['a']}, 'body': 'text'}
+
+    def setUp(self):
+        self.body = Counter()
+        self.meta = Counter()
+        self.transformer = (item.meta.id >> wrap(self.meta)) & \
+            (item.body >> wrap(self.body))
+        self.incremental = Incremental(self.transformer)
+        self.document = copy.deepcopy(self.DOCUMENT)
+
+    def test_diffed(self):
+        self.assertEqual(self.incremental.evaluate(self.document), [1, 'text'])
+        self.document['meta']['id'] = 2
+        self.assertEqual(self.incremental.evaluate(self.document), [2, 'text'])
+        self.assertEqual(self.incremental.reevaluated, [0])
+        self.document['meta']['tags'].append('b')
+        self.incremental.evaluate(self.document)
+        self.assertEqual(self.incremental.reevaluated, [])
+        self.assertEqual((self.meta.calls, self.body.calls), (2, 1))
+
+    def test_changed_paths(self):
+        self.incremental.evaluate(self.document, changed_paths=())
+        self.assertEqual(self.incremental.reevaluated, [0, 1])
+        self.document['body'] = 'new'
+        self.assertEqual(self.incremental.evaluate(
+            self.document, changed_paths=['body']), [1, 'new'])
+        self.assertEqual(self.incremental.reevaluated, [1])
+        self.document['meta']['id'] = 3
+        self.assertEqual(self.incremental.evaluate(
+            self.document, changed_paths=[('meta',)]), [3, 'new'])
+        self.assertEqual(self.incremental.reevaluated, [0])
+
+    def test_changed_paths_are_not_copied(self):
+        with mock.patch('rightshift.incremental.deepcopy') as deepcopy:
+            self.incremental.evaluate(self.document, changed_paths=())
+            self.incremental.evaluate(self.document, changed_paths=['body'])
+            self.assertFalse(deepcopy.called)
+            self.incremental.evaluate(self.document)
+            self.assertEqual(deepcopy.call_count, 1)
+
+    def test_diff_after_changed_paths(self):
+        """
+        No copy is retained when changed_paths are supplied, so a following
+        evaluation without them must evaluate every branch.
+        """
+        self.incremental.evaluate(self.document)
+        self.document['meta']['id'] = 2
+        self.incremental.evaluate(self.document, changed_paths=['meta.id'])
+        self.document['body'] = 'new'
+        self.assertEqual(self.incremental.evaluate(self.document), [2, 'new'])
+        self.assertEqual(self.incremental.reevaluated, [0, 1])
+        self.document['body'] = 'newer'
+        self.assertEqual(self.incremental.evaluate(self.document),
+                         [2, 'newer'])
+        self.assertEqual(self.incremental.reevaluated, [1])
+
+    def test_flags_change(self):
+        self.incremental.evaluate(self.document)
+        self.incremental.evaluate(self.document, errors='fast')
+        self.assertEqual(self.incremental.reevaluated, [0, 1])
+
+    def test_reset_and_failure(self):
+        self.incremental.evaluate(self.document)
+        self.incremental.reset()
+        self.incremental.evaluate(self.document)
+        self.assertEqual(self.incremental.reevaluated, [0, 1])
+        with self.assertRaises(TransformationException):
+            self.incremental.evaluate({'meta': {'id': 1}})
+        self.incremental.evaluate(self.document, changed_paths=())
+        self.assertEqual(self.incremental.reevaluated, [0, 1])
+
+    def test_record(self):
+        incremental = Incremental(record(('id', item.meta.id),
+                                         ('body', item.body)))
+        self.assertEqual(incremental.evaluate(self.document),
+                         {'id': 1, 'body': 'text'})
+
+
+if __name__ == '__main__':
+    unittest.main()
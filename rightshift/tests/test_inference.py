@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from rightshift import Identity, Value, wrap
+from rightshift.conditionals import when
+from rightshift.diskcache import DiskCacheChain
+from rightshift.extractors import coerce_to, item
+from rightshift.inference import (ANY, ConstantMatcher, NumericComparison,
+                                  output_type, sample_type, specialize)
+from rightshift.hedged import HedgedDetupling
+from rightshift.matchers import gt, is_instance, must, should
+from rightshift.operations import absolute, add, invert, negate
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class _Text(str):
+    pass
+
+
+class SampleTypeTest(unittest.TestCase):
+    def test_sample_type(self):
+        self.assertEqual(sample_type([1, 2]), int)
+        self.assertEqual(sample_type([1, 2.0]), ANY)
+        self.assertEqual(sample_type([{'a': 1.0, 'b': 'x'}, {'a': 2.0}]),
+                         {'a': float})
+        self.assertEqual(sample_type([[1, 2], [3]]), [int])
+        self.assertEqual(sample_type([]), ANY)
+
+
+class OutputTypeTest(unittest.TestCase):
+    def test_output_type(self):
+        spec = {'a': int, 'b': [float]}
+        self.assertEqual(output_type(item.a, spec), int)
+        self.assertEqual(output_type(item.b[0], spec), float)
+        self.assertEqual(output_type(item.a >> add(1), spec), int)
+        self.assertEqual(output_type(item.a >> add(1.5), spec), float)
+        self.assertEqual(output_type(item.c, spec), ANY)
+        self.assertEqual(output_type(Value('x'), spec), str)
+        self.assertEqual(output_type(gt(1), spec), bool)
+
+    def test_coerce_to(self):
+        self.assertEqual(output_type(coerce_to(int)), int)
+        self.assertEqual(output_type(coerce_to(float)), float)
+        # CoerceTo accepts instances of subclasses from these coercers
+        self.assertEqual(output_type(coerce_to(str)), ANY)
+        self.assertEqual(output_type(coerce_to(int, lambda v: v)), ANY)
+
+
+    def test_operations(self):
+        self.assertEqual(output_type(negate, int), int)
+        self.assertEqual(output_type(item.a >> absolute, {'a': float}), float)
+        self.assertEqual(output_type(absolute, str), ANY)
+        self.assertEqual(output_type(invert, int), int)
+        self.assertEqual(output_type(invert, bool), ANY)
+
+    def test_wrap(self):
+        self.assertEqual(output_type(wrap(abs)), ANY)
+        self.assertEqual(output_type(item.a >> wrap(abs), {'a': int}), ANY)
+
+
+class SpecializeTest(unittest.TestCase):
+    def test_is_instance_folding(self):
+        transformer = specialize(item.a >> is_instance(int), {'a': int})
+        self.assertIsInstance(transformer, ConstantMatcher)
+        self.assertTrue(transformer({'a': 1}))
+
+    def test_is_instance_after_coercion(self):
+        """
+        A value coerced to int by a coercer other than int may be a bool, so
+        an IsInstance check for bool must not be folded.
+        """
+        transformer = coerce_to(int, lambda v: v) >> is_instance(bool)
+        specialized = specialize(transformer, bool)
+        self.assertEqual(specialized(True), transformer(True))
+        transformer = coerce_to(str) >> is_instance(_Text)
+        specialized = specialize(transformer, _Text)
+        self.assertEqual(specialized(_Text('x')), transformer(_Text('x')))
+
+    def test_coerce_to_identity(self):
+        self.assertIs(specialize(coerce_to(int), int), Identity)
+
+    def test_numeric_comparison(self):
+        transformer = specialize(gt(2), int)
+        self.assertIsInstance(transformer, NumericComparison)
+        self.assertEqual([transformer(v) for v in (1, 2, 3)],
+                         [False, False, True])
+
+    def test_boolean_matchers(self):
+        spec = {'a': int}
+        transformer = should(item.a >> is_instance(str), item.a >> gt(1))
+        specialized = specialize(transformer, spec)
+        for value in ({'a': 0}, {'a': 2}):
+            self.assertEqual(specialized(value), transformer(value))
+        self.assertIsInstance(
+            specialize(must(item.a >> is_instance(str), gt(1)), spec),
+            ConstantMatcher)
+
+    def test_condition(self):
+        transformer = when(must(item.a >> is_instance(int))).then(Value('int'))
+        specialized = specialize(transformer, {'a': int})
+        self.assertEqual(specialized({'a': 1}), 'int')
+        self.assertIsInstance(specialized, Value)
+
+    def test_wrap(self):
+        transformer = item.a >> wrap(abs)
+        specialized = specialize(transformer, {'a': int})
+        self.assertEqual(specialized({'a': -1}), 1)
+
+    def test_subclasses_are_kept(self):
+        transformer = HedgedDetupling([item.a >> is_instance(int), Value(0)],
+                                      hedge_delay=1)
+        specialized = specialize(transformer, {'a': int})
+        self.assertIsInstance(specialized, HedgedDetupling)
+        self.assertEqual(specialized.hedge_delay, 1)
+        self.assertIsInstance(specialized.transformers[0], ConstantMatcher)
+        self.assertIs(specialized({'a': 1}), True)
+
+    def test_chain_without_right(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        transformer = DiskCacheChain(coerce_to(int),
+                                     os.path.join(directory, 'cache.db'))
+        self.addCleanup(transformer.close)
+        self.assertEqual(output_type(transformer, str), int)
+        specialized = specialize(transformer, int)
+        self.assertIsInstance(specialized, DiskCacheChain)
+        self.assertIsNone(specialized.right)
+        self.assertIs(specialized.left, Identity)
+        self.addCleanup(specialized.close)
+        self.assertEqual(specialized(2), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import random
+import unittest
+
+from rightshift.intervals import CLOSED, IntervalIndex
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+def _contains(lower, upper, value, closed):
+    if closed in ('left', 'both'):
+        above = lower <= value
+    else:
+        above = lower < value
+    if closed in ('right', 'both'):
+        below = value <= upper
+    else:
+        below = value < upper
+    return above and below
+
+
+class _Counted(float):
+    """
+    A float counting the comparisons made with it.
+    """
+    comparisons = 0
+
+    def _compare(self, other, operation):
+        _Counted.comparisons += 1
+        return operation(float(self), other)
+
+    def __lt__(self, other):
+        return self._compare(other, float.__lt__)
+
+    def __gt__(self, other):
+        return self._compare(other, float.__gt__)
+
+    def __eq__(self, other):
+        return self._compare(other, float.__eq__)
+
+    def __ne__(self, other):
+        return self._compare(other, float.__ne__)
+
+    __hash__ = float.__hash__
+
+
+class IntervalIndexTest(unittest.TestCase):
+    """
+    find, find_all and find_many must agree with a scan of the ranges.
+    """
+    def setUp(self):
+        generator = random.Random(0)
+        self.ranges = []
+        for _ in range(200):
+            lower = generator.randint(0, 100)
+            self.ranges.append((lower, lower + generator.randint(0, 30)))
+        self.values = [value / 2.0 for value in range(-2, 264)]
+
+    def test_find_all(self):
+        for closed in CLOSED:
+            index = IntervalIndex(self.ranges, closed)
+            for value in self.values:
+                expected = [i for i, (lower, upper) in enumerate(self.ranges)
+                            if _contains(lower, upper, value, closed)]
+                self.assertEqual(index.find_all(value), expected)
+                self.assertEqual(index.find(value),
+                                 expected[0] if expected else -1)
+            self.assertEqual(index.find_many(self.values),
+                             [index.find(value) for value in self.values])
+
+    def test_find_all_size(self):
+        """
+        Each range is stored at O(log n) nodes rather than once per region
+        it covers.
+        """
+        ranges = [(i, 10000 + i) for i in range(1000)]
+        index = IntervalIndex(ranges)
+        self.assertEqual(len(index.find_all(5000)), 1000)
+        size, nodes = index._all
+        self.assertLess(sum(len(node) for node in nodes.values()),
+                        len(ranges) * 2 * size.bit_length())
+
+    def test_find_many_small_batch(self):
+        """
+        A few sorted values are binary searched for rather than merged with
+        every bound.
+        """
+        ranges = [(i, i + 0.5) for i in range(100000)]
+        index = IntervalIndex(ranges)
+        values = [_Counted(value) for value in (10.25, 50000.25, 99999.75)]
+        _Counted.comparisons = 0
+        self.assertEqual(index.find_many(values), [10, 50000, -1])
+        self.assertLess(_Counted.comparisons, 100)
+
+    def test_not_comparable(self):
+        index = IntervalIndex([(0, 1)])
+        self.assertEqual(index.find_all(float('nan')), [])
+        with self.assertRaises(TypeError):
+            index.find_all('a')
+
+
+if __name__ == '__main__':
+    unittest.main()
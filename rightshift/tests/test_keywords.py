@@ -0,0 +1,127 @@
+import mmap
+import tempfile
+import unittest
+
+from rightshift.matchers import (_ALTERNATION_LIMIT, _LiteralPatterns,
+                                  ContainsAny, MatcherException, Pattern,
+                                  Should)
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class ShouldKeywordsRewriteTest(unittest.TestCase):
+    """
+    A Should of literal Patterns is rewritten into a single search for any of
+    the literals, which must produce the same results as the Patterns for
+    every supported value type.
+    """
+    TEXTS = (b'', b'all good', b'an ERROR occurred', b'timeout', b'ERRO',
+             b'connection timeout after ERROR')
+    PADDING = ()
+
+    def setUp(self):
+        self.patterns = [Pattern(br'ERROR'), Pattern(br'timeout')]
+        self.patterns.extend(Pattern(padding) for padding in self.PADDING)
+        self.should = Should(self.patterns)
+        self.files = []
+
+    def tearDown(self):
+        for f in self.files:
+            f.close()
+
+    def _mmap(self, text):
+        f = tempfile.TemporaryFile()
+        self.files.append(f)
+        f.write(text)
+        f.flush()
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.addCleanup(buffer.close)
+        return buffer
+
+    def _check(self, value):
+        for search in (True, False):
+            expected = any(pattern(value, pattern__search=search)
+                           for pattern in self.patterns)
+            self.assertEqual(self.should(value, pattern__search=search),
+                             expected, (value, search))
+
+    def test_rewritten(self):
+        self.assertEqual(len(self.should.matchers), 1)
+        self.assertIsInstance(self.should.matchers[0], _LiteralPatterns)
+        self.assertEqual(self.should.matchers[0]._regex is None,
+                         len(self.patterns) >= _ALTERNATION_LIMIT)
+
+    def test_type_checks(self):
+        """
+        Values the Patterns reject, such as lists, must be rejected.
+        """
+        for value in ([b'ERROR'], u'ERROR'):
+            with self.assertRaises(MatcherException):
+                self.should(value)
+            self.assertFalse(self.should(
+                value, comparison__falsey_exceptions=True))
+
+    def test_bytes(self):
+        for text in self.TEXTS:
+            self._check(text)
+
+    def test_bytearray(self):
+        for text in self.TEXTS:
+            self._check(bytearray(text))
+
+    def test_memoryview(self):
+        for text in self.TEXTS:
+            self._check(memoryview(text))
+
+    def test_mmap(self):
+        for text in self.TEXTS:
+            if text:
+                self._check(self._mmap(text))
+
+    def test_str(self):
+        patterns = [Pattern(r'ERROR'), Pattern(r'timeout')]
+        patterns.extend(Pattern(padding.decode('ascii'))
+                        for padding in self.PADDING)
+        should = Should(patterns)
+        self.assertIsInstance(should.matchers[0], _LiteralPatterns)
+        for text in self.TEXTS:
+            text = text.decode('ascii')
+            for search in (True, False):
+                expected = any(pattern(text, pattern__search=search)
+                               for pattern in patterns)
+                self.assertEqual(should(text, pattern__search=search),
+                                 expected, (text, search))
+
+
+
+class ShouldKeywordsAutomatonTest(ShouldKeywordsRewriteTest):
+    """
+    Literal Patterns numbering _ALTERNATION_LIMIT or more are searched for
+    using a KeywordAutomaton.
+    """
+    PADDING = tuple(u'unused{}'.format(index).encode('ascii')
+                    for index in range(_ALTERNATION_LIMIT))
+
+
+class ShouldKeywordsMergeTest(unittest.TestCase):
+    def test_contains_any(self):
+        """
+        ContainsAny matchers are merged with each other but not with literal
+        Patterns, as ContainsAny accepts values that Pattern rejects.
+        """
+        should = Should([ContainsAny(['a']), ContainsAny(['b']),
+                         Pattern('c'), Pattern('d')])
+        self.assertEqual([type(matcher) for matcher in should.matchers],
+                         [ContainsAny, _LiteralPatterns])
+        self.assertTrue(should(['b']))
+
+    def test_or(self):
+        should = Pattern('a') | Pattern('b') | Pattern('c')
+        self.assertEqual(should.matchers,
+                         (_LiteralPatterns(['a', 'b', 'c']),))
+        self.assertTrue(should('xc'))
+        self.assertFalse(should('xc', pattern__search=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from rightshift.chains import default
+from rightshift.extractors import item
+from rightshift.lookups import (DictSource, LookupException,
+                                SortedFileSource, SQLiteSource, lookup)
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+COUNTRIES = {'de': 'Germany', 'fr': 'France', 'za': 'South Africa',
+             'us': 'United States'}
+
+
+class _CountingSource(DictSource):
+    """
+    A DictSource recording the keys fetched by each call to get_many.
+    """
+    def __init__(self, mapping):
+        super(_CountingSource, self).__init__(mapping)
+        self.calls = []
+
+    def get_many(self, keys):
+        self.calls.append(sorted(keys))
+        return super(_CountingSource, self).get_many(keys)
+
+
+class LookupTest(unittest.TestCase):
+    RECORDS = [{'country': code} for code in ('za', 'de', 'xx', 'za', 'fr')]
+
+    def test_call(self):
+        transformer = lookup(COUNTRIES, key=item.country)
+        self.assertEqual(transformer({'country': 'za'}), 'South Africa')
+        with self.assertRaises(LookupException):
+            transformer({'country': 'xx'})
+        with self.assertRaises(LookupException):
+            transformer({'country': []})
+
+    def test_read_through_cache(self):
+        source = _CountingSource(COUNTRIES)
+        transformer = lookup(source, key=item.country)
+        for _ in range(3):
+            transformer({'country': 'de'})
+            with self.assertRaises(LookupException):
+                transformer({'country': 'xx'})
+        self.assertEqual(source.calls, [['de'], ['xx']])
+
+    def test_cache_size(self):
+        source = _CountingSource(COUNTRIES)
+        transformer = lookup(source, cache_size=1)
+        transformer('de')
+        transformer('fr')
+        transformer('de')
+        self.assertEqual(source.calls, [['de'], ['fr'], ['de']])
+
+    def test_cache_is_private(self):
+        source = DictSource(COUNTRIES)
+        transformer = lookup(source, key=item.country)
+        hash(transformer)
+        transformer({'country': 'de'})
+        self.assertEqual(transformer, lookup(source, key=item.country))
+        copied = pickle.loads(pickle.dumps(transformer))
+        self.assertEqual(len(copied._cache), 0)
+        self.assertEqual(copied({'country': 'fr'}), 'France')
+
+    def test_batch(self):
+        source = _CountingSource(COUNTRIES)
+        transformer = lookup(source, key=item.country) >> default(None)
+        self.assertEqual(transformer.batch(self.RECORDS),
+                         ['South Africa', 'Germany', None, 'South Africa',
+                          'France'])
+        self.assertEqual(source.calls[0], ['de', 'fr', 'xx', 'za'])
+
+    def test_batch_uses_cache(self):
+        source = _CountingSource(COUNTRIES)
+        transformer = lookup(source, key=item.country)
+        transformer({'country': 'za'})
+        transformer.batch([{'country': 'za'}, {'country': 'us'}])
+        self.assertEqual(source.calls, [['za'], ['us']])
+
+    def test_invalid_source(self):
+        with self.assertRaises(LookupException):
+            lookup(object())
+        with self.assertRaises(LookupException):
+            lookup(COUNTRIES, key='country')
+
+
+class SQLiteSourceTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:', check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE "country codes" (code TEXT, name TEXT, rank INT)')
+        self.connection.executemany(
+            'INSERT INTO "country codes" VALUES (?, ?, ?)',
+            [(code, name, rank)
+             for rank, (code, name) in enumerate(sorted(COUNTRIES.items()))])
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_single_column(self):
+        source = SQLiteSource(self.connection, 'country codes', 'code',
+                              'name')
+        self.assertEqual(source.get_many(['za', 'xx', 'de']),
+                         {'za': 'South Africa', 'de': 'Germany'})
+
+    def test_multiple_columns(self):
+        source = SQLiteSource(self.connection, 'country codes', 'code',
+                              ('name', 'rank'))
+        self.assertEqual(source.get_many(['fr']),
+                         {'fr': {'name': 'France', 'rank': 1}})
+
+    def test_more_keys_than_variables(self):
+        source = SQLiteSource(self.connection, 'country codes', 'code',
+                              'name')
+        source.max_variables = 2
+        keys = sorted(COUNTRIES) + ['xx'] * 3
+        self.assertEqual(source.get_many(keys), COUNTRIES)
+
+    def test_query_error(self):
+        source = SQLiteSource(self.connection, 'missing', 'code', 'name')
+        with self.assertRaises(LookupException):
+            source.get_many(['za'])
+
+    def test_database_path(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'countries.db')
+        connection = sqlite3.connect(path)
+        connection.execute('CREATE TABLE countries (code TEXT, name TEXT)')
+        connection.executemany('INSERT INTO countries VALUES (?, ?)',
+                               COUNTRIES.items())
+        connection.commit()
+        connection.close()
+        source = SQLiteSource(path, 'countries', 'code', 'name', pool_size=2)
+        self.addCleanup(source.close)
+        transformer = lookup(source)
+        self.assertEqual(transformer.batch(['us', 'za']),
+                         ['United States', 'South Africa'])
+
+
+class SortedFileSourceTest(unittest.TestCase):
+    def _source(self, lines, **kwargs):
+        f = tempfile.NamedTemporaryFile(delete=False)
+        self.addCleanup(os.remove, f.name)
+        f.write(b'\n'.join(lines))
+        f.close()
+        source = SortedFileSource(f.name, **kwargs)
+        self.addCleanup(source.close)
+        return source
+
+    def test_get(self):
+        source = self._source([u'{}\t{}'.format(key, COUNTRIES[key]).encode(
+            'utf-8') for key in sorted(COUNTRIES)])
+        for key, value in COUNTRIES.items():
+            self.assertEqual(source.get(key), value)
+        for key in ('', 'a', 'e', 'zz', 'xx'):
+            self.assertIsNone(source.get(key))
+        self.assertEqual(source.get_many(['za', 'xx']),
+                         {'za': 'South Africa'})
+
+    def test_integer_keys_and_bytes(self):
+        keys = sorted(str(i).encode('ascii') for i in range(200))
+        source = self._source([key + b',' + key * 2 for key in keys],
+                              separator=b',', encoding=None)
+        for key in keys:
+            self.assertEqual(source.get(key), key * 2)
+        self.assertIsNone(source.get(b'200'))
+
+    def test_empty_file(self):
+        source = self._source([])
+        self.assertIsNone(source.get('za'))
+
+
+if __name__ == '__main__':
+    unittest.main()
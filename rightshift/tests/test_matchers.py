@@ -0,0 +1,87 @@
+import pickle
+import unittest
+
+from rightshift.extractors import item
+from rightshift.matchers import (EqualTo, gt, IsIn, is_in, Matcher, Should,
+                                 value_is)
+from rightshift.matchers import item as matcher_item
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class _Recorder(Matcher):
+    """
+    A Matcher recording the values it is called with and never matching.
+    """
+    def __init__(self):
+        self._values = []
+
+    def __call__(self, value, **flags):
+        self._values.append(value)
+        return False
+
+
+class ShouldMembershipTest(unittest.TestCase):
+    """
+    Adjacent EqualTo and IsIn matchers of a Should are merged into an IsIn
+    without changing the order in which the matchers are tried.
+    """
+    def test_merged(self):
+        should = Should([EqualTo(1), is_in([2, 3]), EqualTo(4)])
+        self.assertEqual(should.matchers, (IsIn([1, 2, 3, 4]),))
+        for value in range(6):
+            self.assertEqual(should(value), 1 <= value <= 4)
+
+    def test_through_transformer(self):
+        should = Should([item.a >> EqualTo(1), item.a >> EqualTo(2),
+                         item.b >> EqualTo(3)])
+        self.assertEqual(should.matchers,
+                         (item.a >> IsIn([1, 2]), item.b >> EqualTo(3)))
+        self.assertTrue(should({'a': 2, 'b': 0}))
+        self.assertTrue(should({'a': 0, 'b': 3}))
+
+    def test_only_adjacent(self):
+        recorder = _Recorder()
+        should = Should([EqualTo(1), recorder, EqualTo(2), EqualTo(3)])
+        self.assertEqual(should.matchers,
+                         (EqualTo(1), recorder, IsIn([2, 3])))
+        self.assertTrue(should(2))
+        self.assertEqual(recorder._values, [2])
+        should = Should([EqualTo(1), gt(5), EqualTo(2)])
+        self.assertEqual(len(should.matchers), 3)
+
+    def test_or(self):
+        should = value_is == 0
+        for value in range(1, 100):
+            should = should | (value_is == value)
+        self.assertEqual(should.matchers, (IsIn(range(100)),))
+        should = should | gt(200) | (value_is == 100)
+        self.assertEqual(len(should.matchers), 3)
+        self.assertTrue(should(100))
+        self.assertTrue(should(201))
+        self.assertFalse(should(150))
+
+    def test_unhashable(self):
+        should = Should([EqualTo([1]), EqualTo(2), EqualTo([3])])
+        self.assertEqual(len(should.matchers), 3)
+        self.assertTrue(should([3]))
+
+
+class ValueIsMixinTest(unittest.TestCase):
+    def test_cached(self):
+        transformer = matcher_item.a
+        builder = transformer.value_is
+        self.assertIs(transformer.value_is, builder)
+        self.assertIs(builder.left, transformer)
+        self.assertTrue((transformer.value_is == 1)({'a': 1}))
+
+    def test_copied(self):
+        transformer = matcher_item.a
+        transformer.value_is
+        copied = pickle.loads(pickle.dumps(transformer))
+        self.assertIs(copied.value_is.left, copied)
+        self.assertIs(copied.value_is, copied.value_is)
+
+
+if __name__ == '__main__':
+    unittest.main()
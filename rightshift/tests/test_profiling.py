@@ -0,0 +1,175 @@
+import gc
+import itertools
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+from rightshift import tupling, Value, wrap
+from rightshift.cse import cse
+from rightshift.extractors import item
+from rightshift.profiling import (AllocationProfiler, AllocationReport,
+                                  NodeTimings, TimingProfiler, TimingReport)
+from rightshift.tests.helpers import Counter
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class _Retainer(object):
+    """
+    A callable retaining a buffer of size bytes per call.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.retained = []
+
+    def __call__(self, value):
+        self.retained.append(bytearray(self.size))
+        return value
+
+
+def _temporary(value):
+    bytearray(1000000)
+    return value
+
+
+class AllocationProfilerTest(unittest.TestCase):
+    """
+    Allocations are measured to within a few bytes per call, so the
+    assertions allow a small tolerance.
+    """
+    def setUp(self):
+        # Garbage collected during a call would be counted against it
+        gc.disable()
+        self.addCleanup(gc.enable)
+        self.retainer = _Retainer(100000)
+        self.profiler = AllocationProfiler()
+        self.instrumented = self.profiler.instrument(
+            item.a >> wrap(self.retainer) >> wrap(_temporary))
+
+    def _run(self, count):
+        with self.profiler:
+            for _ in range(count):
+                self.assertEqual(self.instrumented({'a': 1}), 1)
+
+    def test_nodes(self):
+        self._run(3)
+        report = self.profiler.report()
+        self.assertIsInstance(report, AllocationReport)
+        self.assertEqual(list(report.nodes), [
+            ('Chain',), ('Chain', "Item['a']"), ('Chain', 'Wrap'),
+            ('Chain', 'Wrap#2')])
+        for node in report.nodes.values():
+            self.assertEqual(node.calls, 3)
+        retained = report.nodes[('Chain', 'Wrap')]
+        self.assertGreaterEqual(retained.bytes, 300000)
+        self.assertLess(retained.bytes, 310000)
+        temporary = report.nodes[('Chain', 'Wrap#2')]
+        self.assertGreaterEqual(temporary.peak, 1000000)
+        self.assertLess(abs(temporary.bytes), 10000)
+        self.assertGreaterEqual(report.nodes[('Chain',)].peak, 1000000)
+
+    def test_own(self):
+        self._run(3)
+        report = self.profiler.report()
+        root = report.nodes[('Chain',)]
+        own = report.own(('Chain',))
+        children = [report.nodes[path] for path in report.children(('Chain',))]
+        self.assertEqual(own.calls, root.calls)
+        self.assertEqual(own.peak, root.peak)
+        self.assertEqual(own.bytes,
+                         root.bytes - sum(node.bytes for node in children))
+        self.assertEqual(own.blocks,
+                         root.blocks - sum(node.blocks for node in children))
+        self.assertLess(abs(own.bytes), 10000)
+        self.assertEqual(report.own(('Chain', 'Wrap')),
+                         report.nodes[('Chain', 'Wrap')])
+
+    def test_diff(self):
+        self._run(2)
+        baseline = self.profiler.report()
+        self._run(1)
+        report = self.profiler.report()
+        self.assertEqual(report.nodes[('Chain', 'Wrap')].calls, 3)
+        diff = report.diff(baseline)
+        self.assertIsInstance(diff, AllocationReport)
+        self.assertEqual(list(diff.nodes), list(report.nodes))
+        for node in diff.nodes.values():
+            self.assertEqual(node.calls, 1)
+        retained = diff.nodes[('Chain', 'Wrap')]
+        self.assertGreaterEqual(retained.bytes, 100000)
+        self.assertLess(retained.bytes, 110000)
+
+    def test_shared(self):
+        counter = Counter()
+        parse = item.body >> wrap(counter)
+        instrumented = self.profiler.instrument(
+            cse((parse >> item.a) & (parse >> item.b)))
+        with self.profiler:
+            self.assertEqual(list(instrumented({'body': {'a': 1, 'b': 2}})),
+                             [1, 2])
+        self.assertEqual(counter.calls, 1)
+        report = self.profiler.report()
+        shared = [path for path in report.nodes if path[-1] == 'Shared']
+        self.assertEqual(len(shared), 1)
+        self.assertEqual(report.nodes[shared[0]].calls, 2)
+        self.assertEqual(report.nodes[shared[0] + ('Chain',)].calls, 1)
+
+
+class TimingReportTest(unittest.TestCase):
+    """
+    The timer advances by a second per reading, so every call of a node
+    takes a second more than twice the number of calls below it.
+    """
+    def setUp(self):
+        profiler = TimingProfiler(timer=itertools.count().__next__)
+        instrumented = profiler.instrument(
+            tupling(item['x;y'] >> wrap(abs), Value(0)))
+        for value in (-1, -2):
+            instrumented({'x;y': value})
+        self.report = profiler.report()
+
+    def test_report(self):
+        self.assertIsInstance(self.report, TimingReport)
+        self.assertEqual(self.report.nodes[('Tupling',)], NodeTimings(2, 18))
+        self.assertEqual(self.report.own(('Tupling',)), NodeTimings(2, 6))
+        self.assertEqual(self.report.children(('Tupling',)),
+                         [('Tupling', 'Chain'), ('Tupling', 'Value(0)')])
+        self.assertEqual(self.report.children(('Tupling', 'Value(0)')), [])
+
+    def test_dump_stats(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        filename = os.path.join(directory, 'pipeline.prof')
+        self.report.dump_stats(filename)
+        stats = pstats.Stats(filename)
+        self.assertEqual(stats.total_calls, 10)
+        self.assertEqual(stats.total_tt, 18)
+        chain = ('rightshift', 0, 'Tupling>Chain')
+        self.assertEqual(stats.stats[chain][:4], (2, 2, 6, 10))
+        self.assertEqual(stats.stats[chain][4],
+                         {('rightshift', 0, 'Tupling'): (2, 2, 6, 10)})
+        self.assertEqual(
+            stats.stats[('rightshift', 0, "Tupling>Chain>Item['x;y']")][:4],
+            (2, 2, 2, 2))
+        self.assertEqual(stats.stats[('rightshift', 0, 'Tupling')][4], {})
+
+    def test_folded(self):
+        self.assertEqual(self.report.folded(scale=1).split('\n'), [
+            'Tupling 6', 'Tupling;Chain 6', "Tupling;Chain;Item['x,y'] 2",
+            'Tupling;Chain;Wrap 2', 'Tupling;Value(0) 2'])
+        self.assertEqual(self.report.folded().split('\n')[0],
+                         'Tupling 6000000')
+
+    def test_folded_omits_non_positive(self):
+        report = TimingReport([
+            (('a',), NodeTimings(1, 3.0)), (('a', 'b'), NodeTimings(1, 3.0)),
+            (('a', 'c'), NodeTimings(1, -1.0)),
+            (('a', 'd'), NodeTimings(1, 0.0))])
+        self.assertEqual(report.folded(scale=1), 'a 1\na;b 3')
+        self.assertEqual(self.report.diff(self.report).folded(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from rightshift import RightShiftException, wrap
+from rightshift.extractors import item
+from rightshift.matchers import gt
+from rightshift.runner import RunnerException, load_transformer, main, run
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+PIPELINE = item.name >> wrap(lambda name: name.upper())
+CHECKED = item.age >> wrap(int) >> gt(17)
+NOT_A_TRANSFORMER = 42
+
+
+class RunTest(unittest.TestCase):
+    """
+    run must write a result per record, in order, for any number of workers,
+    and write the records that fail to the rejects file.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _write(self, name, text):
+        with io.open(self._path(name), 'w', encoding='utf-8',
+                     newline='') as f:
+            f.write(text)
+        return self._path(name)
+
+    def _read(self, name, encoding='utf-8'):
+        with io.open(self._path(name), 'r', encoding=encoding,
+                     newline='') as f:
+            return f.read()
+
+    def _run(self, spec, input_path, **kwargs):
+        return run(spec, input_path, self._path('output.jsonl'),
+                   self._path('rejects.jsonl'), stats=None, **kwargs)
+
+    def test_jsonl(self):
+        names = [u'zoë', u'ålesund', u'tokyo'] * 5
+        input_path = self._write('input.jsonl', u''.join(
+            json.dumps({'name': name}, ensure_ascii=False) + u'\n'
+            for name in names) + u'\n')
+        for workers in (1, 2):
+            self.assertEqual(self._run(__name__ + ':PIPELINE', input_path,
+                                       workers=workers, chunk_size=4),
+                             (len(names), 0))
+            self.assertEqual(self._read('output.jsonl'), u''.join(
+                json.dumps(name.upper()) + u'\n' for name in names))
+
+    def test_rejects(self):
+        input_path = self._write('input.jsonl', u'{"name": "a"}\n'
+                                                u'{"other": 1}\n'
+                                                u'not json\n'
+                                                u'{"name": "b"}\n')
+        self.assertEqual(self._run(__name__ + ':PIPELINE', input_path),
+                         (2, 2))
+        self.assertEqual(self._read('output.jsonl'), u'"A"\n"B"\n')
+        rejects = [json.loads(line)
+                   for line in self._read('rejects.jsonl').splitlines()]
+        self.assertEqual([reject['record'] for reject in rejects],
+                         [u'{"other": 1}', u'not json'])
+
+    def test_csv(self):
+        input_path = self._write('input.csv', u'name,age\r\n'
+                                              u'"multi\nline",20\r\n'
+                                              u'zoë,12\r\n'
+                                              u'x,unknown\r\n')
+        self.assertEqual(self._run(__name__ + ':CHECKED', input_path),
+                         (2, 1))
+        self.assertEqual(self._read('output.jsonl'), u'true\nfalse\n')
+        self.assertEqual(self._run(__name__ + ':PIPELINE', input_path),
+                         (3, 0))
+        self.assertEqual(self._read('output.jsonl'),
+                         u'"MULTI\\nLINE"\n"ZO\\u00cb"\n"X"\n')
+
+    def test_encoding(self):
+        input_path = self._path('input.jsonl')
+        with io.open(input_path, 'w', encoding='utf-16') as f:
+            f.write(u'{"name": "zoë"}\n')
+        self.assertEqual(self._run(__name__ + ':PIPELINE', input_path,
+                                   encoding='utf-16'), (1, 0))
+        self.assertEqual(self._read('output.jsonl', 'utf-16'),
+                         u'"ZO\\u00cb"\n')
+
+    def test_load_transformer(self):
+        self.assertIs(load_transformer(__name__ + ':PIPELINE'), PIPELINE)
+        for spec in ('missing', __name__ + ':MISSING',
+                     __name__ + ':NOT_A_TRANSFORMER', 'missing.module:x'):
+            with self.assertRaises(RunnerException):
+                load_transformer(spec)
+        self.assertTrue(issubclass(RunnerException, RightShiftException))
+
+    def test_main(self):
+        input_path = self._write('input.jsonl', u'{"name": "a"}\n')
+        output_path = self._path('output.jsonl')
+        self.assertEqual(main(['run', __name__ + ':PIPELINE',
+                               '--input', input_path, '--output', output_path,
+                               '--encoding', 'utf-8']), 0)
+        self.assertEqual(self._read('output.jsonl'), u'"A"\n')
+        self.assertEqual(main(['run', 'missing', '--input', input_path,
+                               '--output', output_path]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
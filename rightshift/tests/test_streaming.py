@@ -0,0 +1,170 @@
+import io
+import json
+import mmap
+import tempfile
+import unittest
+
+from rightshift import TransformationException
+from rightshift.extractors import item, pattern_group
+from rightshift.streaming import (StreamException, _Reader, iter_records,
+                                  load_paths, stream, transform_json)
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+DOCUMENT = {
+    'meta': {'id': u'café \\ "quoted"', 'count': 3},
+    'records': [
+        {'id': 1, 'name': u'one', 'tags': [u'a', u'[b]', u'{c}']},
+        {'id': 2, 'name': u'x' * 500, 'values': [1.5, -2e3, None, True]},
+        {'id': 3, 'name': u'three'},
+    ],
+    'tail': [[[]], {}, u'', 0],
+}
+
+
+class _RecordingReader(_Reader):
+    """
+    A _Reader recording the largest buffer it held.
+    """
+    largest = 0
+
+    def fill(self):
+        filled = super(_RecordingReader, self).fill()
+        self.largest = max(self.largest, len(self.buffer))
+        return filled
+
+
+class LoadPathsTest(unittest.TestCase):
+    """
+    load_paths must return a document that behaves like the full document for
+    the paths requested, for any chunk size and for text and binary streams.
+    """
+    TEXT = json.dumps(DOCUMENT, ensure_ascii=False)
+
+    def _streams(self):
+        yield io.StringIO(self.TEXT)
+        yield io.BytesIO(self.TEXT.encode('utf-8'))
+
+    def _load(self, paths):
+        for chunk_size in (1, 2, 7, 65536):
+            for f in self._streams():
+                yield load_paths(f, paths, chunk_size)
+
+    def test_whole_document(self):
+        for document in self._load([()]):
+            self.assertEqual(document, DOCUMENT)
+
+    def test_sparse_object(self):
+        for document in self._load([('meta', 'id'), ('tail',)]):
+            self.assertEqual(document, {'meta': {'id': DOCUMENT['meta']['id']},
+                                        'tail': DOCUMENT['tail']})
+
+    def test_sparse_array(self):
+        for document in self._load([('records', 1, 'name')]):
+            self.assertEqual(document['records'][1]['name'], u'x' * 500)
+            self.assertEqual(len(document['records']), 2)
+            self.assertIsNone(document['records'][0])
+
+    def test_transform_json(self):
+        transformer = item.meta.count & item.records[2].name
+        for f in self._streams():
+            self.assertEqual(transform_json(transformer, f, chunk_size=3),
+                             [3, u'three'])
+
+    def test_errors(self):
+        for text in (u'{"a": 1', u'{"a": "b', u'[1, 2', u'{"a" 1}',
+                     u'{"a": 1} x', u'{"a": [1, "]}'):
+            with self.assertRaises(StreamException, msg=text):
+                load_paths(io.StringIO(text), [()], 4)
+
+
+class ReaderTest(unittest.TestCase):
+    """
+    Skipping a value must not hold more than a chunk of a long string in the
+    buffer as that would rescan the string after each fill.
+    """
+    def _reader(self, text, chunk_size=16):
+        return _RecordingReader(io.StringIO(text), chunk_size)
+
+    def test_skip_long_string_in_container(self):
+        text = u'[1, "{}", "a\\"b", 2] '.format(u'x' * 100000)
+        reader = self._reader(text)
+        reader.skip_value()
+        self.assertEqual(reader.peek(), u'')
+        self.assertLess(reader.largest, 64)
+
+    def test_skip_escape_at_chunk_boundary(self):
+        for padding in range(20):
+            text = u'{{"k": "{}\\\\", "x": "]"}} 5'.format(u'y' * padding)
+            reader = self._reader(text, 4)
+            reader.skip_value()
+            self.assertEqual(reader.peek(), u'5')
+
+    def test_read_long_string(self):
+        value = u'z' * 100000
+        reader = self._reader(json.dumps([value]))
+        self.assertEqual(reader.read_value(), [value])
+
+
+class StreamTest(unittest.TestCase):
+    """
+    stream yields results in order, falling back to calling the transformer
+    per value when a batch fails.
+    """
+    def test_order(self):
+        results = list(stream(item[0], ([i] for i in range(25)),
+                              batch_size=4))
+        self.assertEqual(results, list(range(25)))
+
+    def test_failure(self):
+        results = stream(item[0], [[1], [2], [], [4]], batch_size=10)
+        self.assertEqual(next(results), 1)
+        self.assertEqual(next(results), 2)
+        with self.assertRaises(TransformationException):
+            next(results)
+
+
+class IterRecordsTest(unittest.TestCase):
+    def test_records(self):
+        self.assertEqual([bytes(record) for record in iter_records(
+            b'a\nbc\n\nd')], [b'a', b'bc', b'', b'd'])
+        self.assertEqual([bytes(record) for record in iter_records(
+            bytearray(b'a\n'))], [b'a'])
+        self.assertEqual(list(iter_records(b'')), [])
+        self.assertEqual([bytes(record) for record in iter_records(
+            b'a\r\nb\r\n', separator=b'\r\n')], [b'a', b'b'])
+
+    def test_memoryviews(self):
+        buffer = bytearray(b'a\nb')
+        records = list(iter_records(buffer))
+        self.assertIsInstance(records[0], memoryview)
+        buffer[0:1] = b'x'
+        self.assertEqual(bytes(records[0]), b'x')
+
+    def test_mmap(self):
+        """
+        Records spanning the pages of an mmap are yielded whole.
+        """
+        lines = [u'{} caf\u00e9 {}'.format(index, 'x' * (index % 97))
+                 for index in range(2000)]
+        with tempfile.TemporaryFile() as f:
+            f.write('\n'.join(lines).encode('utf-8'))
+            f.flush()
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                self.assertGreater(len(buffer), 4 * mmap.PAGESIZE)
+                extract = pattern_group(br'^(\d+) (\S+)', group=2,
+                                        encoding='utf-8')
+                self.assertEqual(
+                    [extract(record) for record in iter_records(buffer)],
+                    [u'caf\u00e9'] * len(lines))
+                self.assertEqual(
+                    [bytes(record).decode('utf-8')
+                     for record in iter_records(buffer)], lines)
+            finally:
+                buffer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
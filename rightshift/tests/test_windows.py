@@ -0,0 +1,70 @@
+import unittest
+
+from rightshift import wrap, WrapBatch
+from rightshift.tests.helpers import Clock
+from rightshift.windows import session, sliding, window, WindowException
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class TumblingWindowTest(unittest.TestCase):
+    def test_size(self):
+        self.assertEqual(list(window(size=2)(range(5))), [[0, 1], [2, 3], [4]])
+
+    def test_seconds(self):
+        clock = Clock()
+        windower = window(seconds=5, clock=clock).open()
+        self.assertEqual(windower.push(1), [])
+        clock.now = 4
+        self.assertEqual(windower.push(2), [])
+        clock.now = 5
+        self.assertEqual(windower.tick(), [[1, 2]])
+        self.assertEqual(windower.push(3), [])
+        self.assertEqual(windower.flush(), [[3]])
+
+    def test_invalid(self):
+        for kwargs in ({}, {'size': 0}, {'seconds': 0}):
+            with self.assertRaises(WindowException):
+                window(**kwargs)
+
+
+class SlidingWindowTest(unittest.TestCase):
+    def test_sliding(self):
+        self.assertEqual(list(sliding(3, step=2)(range(6))),
+                         [[0, 1], [1, 2, 3], [3, 4, 5]])
+
+
+class SessionWindowTest(unittest.TestCase):
+    def test_session(self):
+        clock = Clock()
+        windower = session(gap=10, max_size=3, clock=clock).open()
+        for value in range(4):
+            windower.push(value)
+        clock.now = 10
+        self.assertEqual(windower.push(4), [[3]])
+        self.assertEqual(windower.flush(), [[4]])
+
+
+class TransformerTest(unittest.TestCase):
+    def test_transformer(self):
+        self.assertEqual(list(window(size=2, transformer=wrap(sum))(range(5))),
+                         [1, 5, 4])
+
+    def test_batched(self):
+        doubled = WrapBatch(lambda values: [value * 2 for value in values])
+        transformer = window(size=2, transformer=doubled, batched=True)
+        self.assertTrue(transformer.batched)
+        self.assertEqual(list(transformer(range(3))), [[0, 2], [4]])
+
+    def test_batch_method(self):
+        """
+        The batched option must not hide Transformer.batch.
+        """
+        transformer = window(size=2)
+        self.assertEqual([list(windows) for windows in
+                          transformer.batch([range(3), range(2)])],
+                         [[[0, 1], [2]], [[0, 1]]])
+
+
+if __name__ == '__main__':
+    unittest.main()
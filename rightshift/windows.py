@@ -0,0 +1,325 @@
+from collections import deque
+import time
+
+from rightshift import TransformationException, Transformer
+
+__author__ = 'adam.jorgensen.za@gmail.com'
+
+
+class WindowException(TransformationException):
+    """
+    WindowException is raised when a Window is instantiated with invalid
+    parameters.
+    """
+
+
+class Windower(object):
+    """
+    A Windower holds the state of a Window over a single stream. Values are
+    pushed into it one at a time, each push returning a list of the windows
+    closed by the value, which is usually empty. Windowers are created by
+    Window.open and are not thread-safe.
+
+    When the Window has a transformer each window is replaced by the result
+    of the transformer for it.
+    """
+    def __init__(self, window, flags):
+        self.window = window
+        self.flags = flags
+
+    def _results(self, windows):
+        transformer = self.window.transformer
+        if transformer is None or not windows:
+            return windows
+        if self.window.batched:
+            return [transformer.batch(values, **self.flags)
+                    for values in windows]
+        return [transformer(values, **self.flags) for values in windows]
+
+    def push(self, value):
+        """
+        :return: A list of the windows closed by value
+        """
+        return self._results(self._push(value))
+
+    def tick(self):
+        """
+        Close the windows that have expired according to the clock of the
+        Window without a value being pushed, such as from the timer of a
+        consumer whose source is idle.
+
+        :return: A list of the windows closed
+        """
+        return self._results(self._tick())
+
+    def flush(self):
+        """
+        Close the current windows, such as at the end of a stream.
+
+        :return: A list of the windows closed
+        """
+        return self._results(self._flush())
+
+    def _push(self, value):
+        raise NotImplementedError
+
+    def _tick(self):
+        return []
+
+    def _flush(self):
+        raise NotImplementedError
+
+
+class Window(Transformer):
+    """
+    A Window is called with an iterable, a stream of values, and returns a
+    generator of windows, each a list of consecutive values of the stream:
+
+    for events in stream >> window(size=1000):
+        ...
+
+    A window may be passed to an Aggregate in order to compute windowed
+    metrics, which the transformer parameter does for each window:
+
+    window(seconds=5, transformer=mean(item.latency))(events)
+
+    Windows may also be produced from values arriving one at a time, such as
+    from a consumer, using the Windower returned by open.
+
+    The values of a window are held in memory until it is closed, so windows
+    bounded only by time should be given a maximum size when the rate of the
+    stream is not bounded.
+
+    Sub-classes implement _windower, returning a Windower.
+    """
+    def __init__(self, transformer=None, batched=False, clock=time.time):
+        """
+        :param transformer: An optional Transformer which is called with each
+                            window, such as an Aggregate, the results of
+                            which replace the windows
+        :param batched: If True the batch method of transformer is called
+                        with each window instead, such as for a WrapBatch
+        :param clock: A callable returning the current time in seconds, used
+                      by windows bounded by time. Defaults to time.time.
+        """
+        if transformer is not None and not isinstance(transformer,
+                                                      Transformer):
+            raise WindowException('transformer parameter must be an instance '
+                                  'of rightshift.Transformer')
+        self.transformer = transformer
+        self.batched = batched
+        self.clock = clock
+
+    def _windower(self, flags):
+        raise NotImplementedError
+
+    def open(self, **flags):
+        """
+        :param flags: Flags to call the transformer with
+        :return: A Windower for a new stream
+        :rtype: Windower
+        """
+        return self._windower(flags)
+
+    def _windows(self, values, flags):
+        windower = self.open(**flags)
+        for value in values:
+            for window in windower.push(value):
+                yield window
+        for window in windower.flush():
+            yield window
+
+    def __call__(self, values, **flags):
+        return self._windows(values, flags)
+
+
+class _BatchWindower(Windower):
+    def __init__(self, window, flags):
+        super(_BatchWindower, self).__init__(window, flags)
+        self.values = []
+        self.start = None
+
+    def _expired(self, now):
+        seconds = self.window.seconds
+        return (self.values and seconds is not None and
+                now - self.start >= seconds)
+
+    def _push(self, value):
+        window = self.window
+        now = window.clock() if window.seconds is not None else None
+        closed = self._tick(now)
+        if not self.values:
+            self.start = now
+        self.values.append(value)
+        if window.size is not None and len(self.values) >= window.size:
+            closed.extend(self._flush())
+        return closed
+
+    def _tick(self, now=None):
+        if self.window.seconds is None:
+            return []
+        if self._expired(self.window.clock() if now is None else now):
+            return self._flush()
+        return []
+
+    def _flush(self):
+        if not self.values:
+            return []
+        values, self.values = self.values, []
+        return [values]
+
+
+class TumblingWindow(Window):
+    """
+    A TumblingWindow divides a stream into consecutive windows of at most
+    size values, or of the values arriving within seconds of the first value
+    of the window, or whichever limit is reached first if both are given.
+
+    Windows bounded by time are closed by the first value arriving after they
+    have expired, or by Windower.tick, and the final window of a stream may be
+    smaller than size.
+    """
+    def __init__(self, size=None, seconds=None, transformer=None,
+                 batched=False, clock=time.time):
+        """
+        :param size: The maximum number of values per window
+        :param seconds: The maximum number of seconds spanned by a window
+        :param transformer: See Window
+        :param batched: See Window
+        :param clock: See Window
+        """
+        if size is None and seconds is None:
+            raise WindowException('size or seconds must be given')
+        if size is not None and size < 1:
+            raise WindowException('size must be at least 1')
+        if seconds is not None and seconds <= 0:
+            raise WindowException('seconds must be greater than 0')
+        super(TumblingWindow, self).__init__(transformer, batched, clock)
+        self.size = size
+        self.seconds = seconds
+
+    def _windower(self, flags):
+        return _BatchWindower(self, flags)
+
+window = TumblingWindow
+"""
+window is an alias for the TumblingWindow class.
+"""
+
+
+class _SlidingWindower(Windower):
+    def __init__(self, window, flags):
+        super(_SlidingWindower, self).__init__(window, flags)
+        self.values = deque(maxlen=window.size)
+        self.pending = 0
+
+    def _push(self, value):
+        self.values.append(value)
+        self.pending += 1
+        if self.pending < self.window.step:
+            return []
+        self.pending = 0
+        return [list(self.values)]
+
+    def _flush(self):
+        if not self.pending:
+            return []
+        self.pending = 0
+        return [list(self.values)]
+
+
+class SlidingWindow(Window):
+    """
+    A SlidingWindow produces a window of the last size values of a stream
+    after every step values, so that consecutive windows overlap when step is
+    smaller than size. The values are held in a ring buffer of size values.
+
+    The windows produced before size values have arrived are smaller than
+    size, as is the final window of a stream, which is produced if values
+    have arrived since the previous window.
+    """
+    def __init__(self, size, step=1, transformer=None, batched=False):
+        """
+        :param size: The number of values per window
+        :param step: The number of values between windows. Defaults to 1.
+        :param transformer: See Window
+        :param batched: See Window
+        """
+        if size < 1:
+            raise WindowException('size must be at least 1')
+        if step < 1:
+            raise WindowException('step must be at least 1')
+        super(SlidingWindow, self).__init__(transformer, batched)
+        self.size = size
+        self.step = step
+
+    def _windower(self, flags):
+        return _SlidingWindower(self, flags)
+
+sliding = SlidingWindow
+"""
+sliding is an alias for the SlidingWindow class.
+"""
+
+
+class _SessionWindower(Windower):
+    def __init__(self, window, flags):
+        super(_SessionWindower, self).__init__(window, flags)
+        self.values = []
+        self.last = None
+
+    def _push(self, value):
+        now = self.window.clock()
+        closed = self._tick(now)
+        self.values.append(value)
+        self.last = now
+        max_size = self.window.max_size
+        if max_size is not None and len(self.values) >= max_size:
+            closed.extend(self._flush())
+        return closed
+
+    def _tick(self, now=None):
+        if now is None:
+            now = self.window.clock()
+        if self.values and now - self.last >= self.window.gap:
+            return self._flush()
+        return []
+
+    def _flush(self):
+        if not self.values:
+            return []
+        values, self.values = self.values, []
+        return [values]
+
+
+class SessionWindow(Window):
+    """
+    A SessionWindow groups the values of a stream into sessions, a session
+    being closed once gap seconds pass without a value arriving, by the
+    first value arriving after the gap or by Windower.tick. A session is
+    also closed once it contains max_size values, if given.
+    """
+    def __init__(self, gap, max_size=None, transformer=None, batched=False,
+                 clock=time.time):
+        """
+        :param gap: The number of seconds of inactivity closing a session
+        :param max_size: The optional maximum number of values per session
+        :param transformer: See Window
+        :param batched: See Window
+        :param clock: See Window
+        """
+        if gap <= 0:
+            raise WindowException('gap must be greater than 0')
+        if max_size is not None and max_size < 1:
+            raise WindowException('max_size must be at least 1')
+        super(SessionWindow, self).__init__(transformer, batched, clock)
+        self.gap = gap
+        self.max_size = max_size
+
+    def _windower(self, flags):
+        return _SessionWindower(self, flags)
+
+session = SessionWindow
+"""
+session is an alias for the SessionWindow class.
+"""